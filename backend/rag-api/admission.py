@@ -0,0 +1,248 @@
+"""Admission control for upstream calls: bounded concurrency, bounded waiting and retries with jitter."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+import random
+import time
+from contextlib import aclosing, asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+# Upstream statuses worth retrying: rate limited, or a transient server/gateway failure.
+RETRYABLE_STATUSES = frozenset({408, 409, 429, 500, 502, 503, 504})
+# Connection problems raised by the OpenAI and Pinecone clients (matched by name to avoid importing them here).
+RETRYABLE_ERROR_NAMES = frozenset({"APIConnectionError", "APITimeoutError", "ServiceException"})
+
+
+class Overloaded(Exception):
+    """An upstream has no capacity for this call; clients should retry after ``retry_after`` seconds."""
+
+    status_code = 503
+
+    def __init__(self, upstream: str, retry_after: float, reason: str = "busy"):
+        self.upstream = upstream
+        self.retry_after = retry_after
+        self.reason = reason
+        super().__init__(f"{upstream} is {reason}; retry after {self.retry_after_header()}s")
+
+    def retry_after_header(self) -> str:
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class AdmissionGate:
+    """
+    Limit concurrent calls to one upstream and bound the queue in front of it.
+
+    ``slot()`` admits up to ``max_concurrent`` callers at a time. Further callers
+    wait in FIFO order, but at most ``max_waiting`` of them and for at most
+    ``max_wait_seconds``; beyond either bound the call is rejected at once with
+    ``Overloaded`` instead of piling up behind the upstream. The suggested
+    ``retry_after`` is the expected time for the current queue to drain, from
+    a moving average of how long each call holds its slot.
+    """
+
+    def __init__(self, name: str, *, max_concurrent: int, max_waiting: int, max_wait_seconds: float):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_waiting = max_waiting
+        self.max_wait_seconds = max_wait_seconds
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self._active = 0
+        self._waiting = 0
+        self._hold_seconds = 0.0
+        self.stats = {"admitted": 0, "queued": 0, "rejected": 0, "timed_out": 0, "wait_seconds": 0.0}
+
+    def retry_after(self) -> float:
+        drain = self._hold_seconds * (self._waiting + 1) / self.max_concurrent
+        return min(max(drain, 1.0), 30.0)
+
+    def _reject(self, reason: str) -> Overloaded:
+        return Overloaded(self.name, self.retry_after(), reason)
+
+    def check(self) -> None:
+        """Raise ``Overloaded`` if a new call would be rejected right now (used before a response starts)."""
+        if self._semaphore.locked() and self._waiting >= self.max_waiting:
+            self.stats["rejected"] += 1
+            raise self._reject("overloaded")
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        waited = 0.0
+        if self._semaphore.locked():
+            self.check()
+            self.stats["queued"] += 1
+            self._waiting += 1
+            started = time.perf_counter()
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.max_wait_seconds)
+            except TimeoutError:
+                self.stats["timed_out"] += 1
+                raise self._reject("overloaded") from None
+            finally:
+                self._waiting -= 1
+                waited = time.perf_counter() - started
+        else:
+            await self._semaphore.acquire()
+
+        self.stats["admitted"] += 1
+        self.stats["wait_seconds"] += waited
+        self._active += 1
+        held_from = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._active -= 1
+            self._semaphore.release()
+            held = time.perf_counter() - held_from
+            self._hold_seconds = held if not self._hold_seconds else 0.9 * self._hold_seconds + 0.1 * held
+
+    def snapshot_stats(self) -> dict[str, Any]:
+        admitted = self.stats["admitted"]
+        return {
+            **{key: value for key, value in self.stats.items() if key != "wait_seconds"},
+            "active": self._active,
+            "waiting": self._waiting,
+            "max_concurrent": self.max_concurrent,
+            "max_waiting": self.max_waiting,
+            "avg_wait_ms": round(self.stats["wait_seconds"] / admitted * 1000, 2) if admitted else 0.0,
+            "avg_hold_ms": round(self._hold_seconds * 1000, 2),
+        }
+
+
+def _status(error: BaseException) -> int | None:
+    status = getattr(error, "status_code", None) or getattr(error, "status", None)
+    return status if isinstance(status, int) else None
+
+
+def is_retryable(error: BaseException) -> bool:
+    if isinstance(error, Overloaded):
+        return False
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    if type(error).__name__ in RETRYABLE_ERROR_NAMES:
+        return True
+    return _status(error) in RETRYABLE_STATUSES
+
+
+def server_retry_after(error: BaseException) -> float | None:
+    """Seconds the upstream asked us to wait (``retry-after-ms`` / ``retry-after`` headers), if it said."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or getattr(error, "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        return None
+    return None
+
+
+class RetryPolicy:
+    """
+    Exponential backoff with full jitter for transient upstream failures.
+
+    Each delay is drawn uniformly from ``[0, min(max_delay, base_delay * 2**attempt)]``
+    so that callers failing together do not retry together; a ``Retry-After``
+    sent by the upstream is used as the lower bound instead. A call that is
+    still rate limited after ``max_attempts``, or whose next wait would exceed
+    ``max_delay``, fails as ``Overloaded`` so the client gets a 503 with a
+    sensible ``Retry-After`` rather than a 500.
+    """
+
+    def __init__(self, upstream: str, *, max_attempts: int = 3, base_delay: float = 0.25, max_delay: float = 4.0):
+        self.upstream = upstream
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.stats = {"retries": 0, "gave_up": 0}
+
+    def _next_delay(self, error: BaseException, attempt: int) -> float | None:
+        """Seconds to wait before the next attempt, or None to stop retrying."""
+        if attempt + 1 >= self.max_attempts or not is_retryable(error):
+            return None
+        jittered = random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+        requested = server_retry_after(error)
+        if requested is not None:
+            if requested > self.max_delay:
+                return None
+            return requested + jittered * 0.1
+        return jittered
+
+    def _give_up(self, error: BaseException) -> None:
+        """Re-raise ``error``, as ``Overloaded`` when the upstream is still rate limiting us."""
+        if _status(error) == 429 or type(error).__name__ == "RateLimitError":
+            self.stats["gave_up"] += 1
+            raise Overloaded(self.upstream, server_retry_after(error) or self.max_delay, "rate limited") from error
+        raise error
+
+    async def call(self, fn: Callable[[], Awaitable[Any]]) -> Any:
+        attempt = 0
+        while True:
+            try:
+                return await fn()
+            except Exception as e:
+                delay = self._next_delay(e, attempt)
+                if delay is None:
+                    self._give_up(e)
+                self.stats["retries"] += 1
+                logger.warning(f"{self.upstream} call failed ({e}); retry {attempt + 1} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+                attempt += 1
+
+    async def stream(self, fn: Callable[[], AsyncIterator[Any]]) -> AsyncIterator[Any]:
+        """Iterate ``fn()``, retrying from scratch only while nothing has been yielded yet."""
+        attempt = 0
+        while True:
+            started = False
+            try:
+                async with aclosing(fn()) as items:
+                    async for item in items:
+                        started = True
+                        yield item
+                return
+            except Exception as e:
+                delay = self._next_delay(e, attempt)
+                if started:
+                    raise
+                if delay is None:
+                    self._give_up(e)
+                self.stats["retries"] += 1
+                logger.warning(f"{self.upstream} stream failed before its first item ({e}); retry {attempt + 1} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+                attempt += 1
+
+
+class Upstream:
+    """An ``AdmissionGate`` and a ``RetryPolicy`` for one upstream service; each attempt holds a slot."""
+
+    def __init__(self, gate: AdmissionGate, retry: RetryPolicy):
+        self.gate = gate
+        self.retry = retry
+
+    async def call(self, fn: Callable[[], Awaitable[Any]]) -> Any:
+        async def attempt():
+            async with self.gate.slot():
+                return await fn()
+
+        return await self.retry.call(attempt)
+
+    async def stream(self, fn: Callable[[], AsyncIterator[Any]]) -> AsyncIterator[Any]:
+        async def attempt():
+            # A token stream occupies the upstream until it ends, so the slot is held throughout.
+            async with self.gate.slot():
+                async with aclosing(fn()) as items:
+                    async for item in items:
+                        yield item
+
+        async with aclosing(self.retry.stream(attempt)) as items:
+            async for item in items:
+                yield item
+
+    def snapshot_stats(self) -> dict[str, Any]:
+        return {**self.gate.snapshot_stats(), **self.retry.stats}
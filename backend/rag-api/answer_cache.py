@@ -0,0 +1,420 @@
+"""Response cache for /api/ask with exact and embedding-similarity lookups."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Protocol
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_TRAILING_PUNCTUATION_RE = re.compile(r"[\s?.!]+$")
+_NUMBER_TOKEN_RE = re.compile(r"[a-z$]*\d[\d.,]*[a-z%]*")
+
+
+def normalize_question(question: str) -> str:
+    """Lower-case, collapse whitespace and drop trailing punctuation."""
+    collapsed = _WHITESPACE_RE.sub(" ", question.strip().lower())
+    return _TRAILING_PUNCTUATION_RE.sub("", collapsed)
+
+
+def question_numbers(question: str) -> list[str]:
+    """
+    The years, periods and figures written in a question ("2023", "fy24", "q3",
+    "$1.5"), in order; questions that differ only in these ask for different
+    answers however similar their embeddings are.
+    """
+    return list(dict.fromkeys(token.rstrip(".,") for token in _NUMBER_TOKEN_RE.findall(normalize_question(question))))
+
+
+def cache_key(question: str, scope: str, k: int) -> str:
+    """
+    Exact-match key over the normalized question, scope and k. ``scope`` is an
+    opaque partition chosen by the caller; entries in different scopes never
+    answer each other's lookups.
+    """
+    raw = f"{normalize_question(question)}\x1f{scope}\x1f{k}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class CacheEntry:
+    key: str
+    scope: str
+    k: int
+    question: str
+    value: dict[str, Any]
+    embedding: np.ndarray | None = None
+    created_at: float = field(default_factory=time.time)
+    size_bytes: int = field(init=False)
+
+    def __post_init__(self) -> None:
+        embedding_bytes = self.embedding.nbytes if self.embedding is not None else 0
+        self.size_bytes = len(json.dumps(self.value)) + len(self.question) + embedding_bytes
+
+    @property
+    def partition(self) -> tuple[str, int]:
+        return (self.scope, self.k)
+
+
+class CacheBackend(Protocol):
+    """Persistence for cache entries; eviction and lookups stay in AnswerCache."""
+
+    def load(self) -> list[CacheEntry]: ...
+
+    def save(self, entry: CacheEntry) -> None: ...
+
+    def delete(self, keys: list[str]) -> None: ...
+
+    def clear(self) -> None: ...
+
+    def close(self) -> None: ...
+
+
+class InMemoryBackend:
+    """Default backend: nothing is persisted, the cache lives and dies with the process."""
+
+    def load(self) -> list[CacheEntry]:
+        return []
+
+    def save(self, entry: CacheEntry) -> None:
+        pass
+
+    def delete(self, keys: list[str]) -> None:
+        pass
+
+    def clear(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class SQLiteBackend:
+    """Persist entries to a local SQLite file so the cache survives restarts."""
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(answer_cache)")}
+            if columns and "scope" not in columns:
+                # Files written before entries were keyed on scope; their keys no longer match.
+                self._conn.execute("DROP TABLE answer_cache")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS answer_cache (
+                    key TEXT PRIMARY KEY,
+                    scope TEXT NOT NULL,
+                    k INTEGER NOT NULL,
+                    question TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    embedding BLOB,
+                    created_at REAL NOT NULL
+                )
+                """
+            )
+
+    def load(self) -> list[CacheEntry]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, scope, k, question, value, embedding, created_at "
+                "FROM answer_cache ORDER BY created_at"
+            ).fetchall()
+        return [
+            CacheEntry(
+                key=key,
+                scope=scope,
+                k=k,
+                question=question,
+                value=json.loads(value),
+                embedding=np.frombuffer(embedding, dtype=np.float32) if embedding else None,
+                created_at=created_at,
+            )
+            for key, scope, k, question, value, embedding, created_at in rows
+        ]
+
+    def save(self, entry: CacheEntry) -> None:
+        embedding = entry.embedding.tobytes() if entry.embedding is not None else None
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO answer_cache "
+                "(key, scope, k, question, value, embedding, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    entry.key,
+                    entry.scope,
+                    entry.k,
+                    entry.question,
+                    json.dumps(entry.value),
+                    embedding,
+                    entry.created_at,
+                ),
+            )
+
+    def delete(self, keys: list[str]) -> None:
+        if not keys:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM answer_cache WHERE key = ?", [(key,) for key in keys])
+
+    def clear(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM answer_cache")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class _EmbeddingPartition:
+    """Unit-normalized embedding rows for one (scope, k) pair."""
+
+    def __init__(self, dim: int):
+        self.matrix = np.zeros((16, dim), dtype=np.float32)
+        self.keys: list[str | None] = []
+        self.rows: dict[str, int] = {}
+        self.free: list[int] = []
+
+    def add(self, key: str, vector: np.ndarray) -> None:
+        if key in self.rows:
+            self.matrix[self.rows[key]] = vector
+            return
+        if self.free:
+            row = self.free.pop()
+            self.keys[row] = key
+        else:
+            row = len(self.keys)
+            if row == self.matrix.shape[0]:
+                grown = np.zeros((row * 2, self.matrix.shape[1]), dtype=np.float32)
+                grown[:row] = self.matrix
+                self.matrix = grown
+            self.keys.append(key)
+        self.matrix[row] = vector
+        self.rows[key] = row
+
+    def remove(self, key: str) -> None:
+        row = self.rows.pop(key, None)
+        if row is None:
+            return
+        self.matrix[row] = 0.0
+        self.keys[row] = None
+        self.free.append(row)
+
+    def nearest(self, vector: np.ndarray) -> tuple[str | None, float]:
+        if not self.rows:
+            return None, 0.0
+        scores = self.matrix[: len(self.keys)] @ vector
+        best = int(np.argmax(scores))
+        return self.keys[best], float(scores[best])
+
+
+def _unit(vector: list[float] | np.ndarray) -> np.ndarray:
+    array = np.asarray(vector, dtype=np.float32)
+    norm = float(np.linalg.norm(array))
+    return array / norm if norm else array
+
+
+class AnswerCache:
+    """
+    TTL + LRU cache of /api/ask responses.
+
+    Lookups first try the exact key (normalized question, scope, k) and then the
+    most similar cached question embedding for the same scope and k, accepting
+    it when the cosine similarity reaches
+    ``similarity_threshold``. Entries are evicted least-recently-used first when
+    either ``max_entries`` or ``max_bytes`` is exceeded.
+    """
+
+    def __init__(
+        self,
+        backend: CacheBackend | None = None,
+        *,
+        ttl_seconds: float = 6 * 60 * 60,
+        max_entries: int = 1000,
+        max_bytes: int = 64 * 1024 * 1024,
+        similarity_threshold: float = 0.95,
+    ):
+        self.backend = backend or InMemoryBackend()
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.similarity_threshold = similarity_threshold
+        self._entries: OrderedDict[str, CacheEntry] = OrderedDict()
+        self._partitions: dict[tuple[str, int], _EmbeddingPartition] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "evictions": 0, "expired": 0}
+
+        for entry in self.backend.load():
+            if not self._is_expired(entry):
+                self._insert(entry)
+        evicted = self._evict_over_capacity()
+        self.backend.delete(evicted)
+
+    def _is_expired(self, entry: CacheEntry) -> bool:
+        return time.time() - entry.created_at > self.ttl_seconds
+
+    def _insert(self, entry: CacheEntry) -> None:
+        self._remove(entry.key)
+        self._entries[entry.key] = entry
+        self._bytes += entry.size_bytes
+        if entry.embedding is not None:
+            partition = self._partitions.get(entry.partition)
+            if partition is None or partition.matrix.shape[1] != entry.embedding.shape[0]:
+                partition = _EmbeddingPartition(entry.embedding.shape[0])
+                self._partitions[entry.partition] = partition
+            partition.add(entry.key, entry.embedding)
+
+    def _remove(self, key: str) -> CacheEntry | None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return None
+        self._bytes -= entry.size_bytes
+        partition = self._partitions.get(entry.partition)
+        if partition is not None:
+            partition.remove(key)
+        return entry
+
+    def _evict_over_capacity(self) -> list[str]:
+        evicted = []
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            key, _ = next(iter(self._entries.items()))
+            self._remove(key)
+            evicted.append(key)
+            self.stats["evictions"] += 1
+        return evicted
+
+    def _take_if_fresh(self, key: str) -> CacheEntry | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if self._is_expired(entry):
+            self._remove(key)
+            self.stats["expired"] += 1
+            self.backend.delete([key])
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def get_exact(self, question: str, scope: str, k: int) -> dict[str, Any] | None:
+        """Return the cached response for the same normalized question, or None."""
+        with self._lock:
+            entry = self._take_if_fresh(cache_key(question, scope, k))
+            if entry is None:
+                return None
+            self.stats["exact_hits"] += 1
+            return entry.value
+
+    def get_similar(
+        self,
+        embedding: list[float] | np.ndarray,
+        scope: str,
+        k: int,
+    ) -> dict[str, Any] | None:
+        """Return the response cached for the nearest question above the similarity threshold."""
+        vector = _unit(embedding)
+        with self._lock:
+            partition = self._partitions.get((scope, k))
+            if partition is not None and partition.matrix.shape[1] == vector.shape[0]:
+                key, score = partition.nearest(vector)
+                if key is not None and score >= self.similarity_threshold:
+                    entry = self._take_if_fresh(key)
+                    if entry is not None:
+                        self.stats["semantic_hits"] += 1
+                        logger.info(f"Semantic cache hit (cosine {score:.3f}) for cached question: {entry.question}")
+                        return entry.value
+            self.stats["misses"] += 1
+            return None
+
+    def record_miss(self) -> None:
+        """Count a lookup that could not reach the similarity stage (e.g. embedding failed)."""
+        with self._lock:
+            self.stats["misses"] += 1
+
+    def put(
+        self,
+        question: str,
+        scope: str,
+        k: int,
+        value: dict[str, Any],
+        embedding: list[float] | np.ndarray | None = None,
+    ) -> None:
+        """Store a response; persists through the backend and evicts LRU entries over capacity."""
+        entry = CacheEntry(
+            key=cache_key(question, scope, k),
+            scope=scope,
+            k=k,
+            question=question,
+            value=value,
+            embedding=_unit(embedding) if embedding is not None else None,
+        )
+        with self._lock:
+            self._insert(entry)
+            evicted = self._evict_over_capacity()
+        self.backend.save(entry)
+        self.backend.delete(evicted)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._partitions.clear()
+            self._bytes = 0
+        self.backend.clear()
+
+    def close(self) -> None:
+        """Close the backend; the cache must not be used afterwards."""
+        self.backend.close()
+
+    def snapshot_stats(self) -> dict[str, Any]:
+        with self._lock:
+            hits = self.stats["exact_hits"] + self.stats["semantic_hits"]
+            lookups = hits + self.stats["misses"]
+            return {
+                **self.stats,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+def create_answer_cache(
+    backend: str,
+    *,
+    path: str | None = None,
+    ttl_seconds: float,
+    max_entries: int,
+    max_bytes: int,
+    similarity_threshold: float,
+) -> AnswerCache:
+    """Build an AnswerCache with the named backend ('memory' or 'sqlite')."""
+    if backend == "sqlite":
+        if not path:
+            raise ValueError("A file path is required for the sqlite answer cache backend")
+        cache_backend: CacheBackend = SQLiteBackend(path)
+    elif backend == "memory":
+        cache_backend = InMemoryBackend()
+    else:
+        raise ValueError(f"Unknown answer cache backend: {backend}")
+
+    return AnswerCache(
+        cache_backend,
+        ttl_seconds=ttl_seconds,
+        max_entries=max_entries,
+        max_bytes=max_bytes,
+        similarity_threshold=similarity_threshold,
+    )
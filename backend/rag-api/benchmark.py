@@ -0,0 +1,640 @@
+"""Offline load test of the RAG API with deterministic stand-ins for OpenAI and Pinecone.
+
+The FastAPI ``app`` from ``main.py`` runs in-process (through its real lifespan,
+caches and retrieval code) with three stand-ins swapped in:
+
+- embeddings: hashed bag-of-words vectors, deterministic per text
+- chat model: scripted refinements, expansions and extractive answers, streamed
+  token by token
+- vector store: a ``LocalVectorStore`` built from ``backend/clean_10k_texts``
+  with the same chunking and metadata as ingestion, optionally searched through
+  int8 or binary codes (``--quantization``)
+
+Each stand-in sleeps for a configurable, jittered latency so the numbers reflect
+how the pipeline overlaps upstream calls rather than how fast the fakes are.
+Every ``retrieval_method`` is driven at each requested concurrency and the
+client-side latency percentiles, throughput and the per-stage ``timings`` the
+API reports are written to a JSON file that ``compare`` can diff.
+
+Requires ``httpx`` (``pip install httpx``). No API keys or network access.
+
+Usage::
+
+    python benchmark.py run --out benchmark_results/baseline.json
+    python benchmark.py run --methods similarity,hybrid --concurrency 1,8,32 --requests 200
+    python benchmark.py run --no-latency --out benchmark_results/overhead.json
+    python benchmark.py compare benchmark_results/baseline.json benchmark_results/candidate.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import csv
+import hashlib
+import json
+import logging
+import os
+import platform
+import random
+import re
+import statistics
+import subprocess
+import sys
+import time
+import zlib
+from contextlib import ExitStack
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, AsyncIterator
+from unittest import mock
+
+import numpy as np
+
+# main.py reads its settings at import time; the stand-ins need no real keys.
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+from langchain_core.embeddings import Embeddings  # noqa: E402
+from langchain_core.messages import AIMessage, AIMessageChunk  # noqa: E402
+
+from embedding_profiles import EmbeddingProfile  # noqa: E402
+from ingest_pipeline import chunk_filing, chunk_ids, discover_local_filings  # noqa: E402
+from lexical_index import build_lexical_index  # noqa: E402
+from local_vector_store import LocalVectorStore, convert_index  # noqa: E402
+from symbols import DEFAULT_COMPANIES_CSV, normalize_ticker  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CORPUS_DIR = Path(__file__).resolve().parent.parent / "clean_10k_texts"
+DEFAULT_WORK_DIR = Path(__file__).resolve().parent / ".benchmark"
+# The profile of HashingEmbeddings vectors, as recorded in the benchmark indexes.
+HASHING_PROFILE = "benchmark-hashing:256"
+METHODS = ("similarity", "mmr", "multi_query", "llm_enhanced", "hybrid", "lexical_hybrid")
+TOPICS = (
+    "revenue growth",
+    "operating margin",
+    "risk factors",
+    "competition",
+    "research and development spending",
+    "share repurchases",
+    "long-term debt",
+    "number of employees",
+    "supply chain",
+    "cybersecurity",
+    "segment results",
+    "capital expenditures",
+)
+QUESTION_TEMPLATES = (
+    "What did {name} report about {topic} in {year}?",
+    "How did {topic} change for {name} in fiscal {year}?",
+    "Summarize {name}'s {topic}",
+    "{name} {topic}",
+)
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+# ----------------------------------------------------------------------
+# Stand-ins
+# ----------------------------------------------------------------------
+@dataclass
+class LatencyProfile:
+    """Injected latencies in milliseconds; each sleep is scaled by a uniform factor in [1 - jitter, 1 + jitter]."""
+
+    embed_ms: float = 80.0
+    embed_per_text_ms: float = 0.5
+    search_ms: float = 40.0
+    llm_rewrite_ms: float = 450.0
+    llm_first_token_ms: float = 350.0
+    llm_token_ms: float = 12.0
+    answer_tokens: int = 80
+    jitter: float = 0.2
+
+    @classmethod
+    def none(cls) -> LatencyProfile:
+        return cls(0.0, 0.0, 0.0, 0.0, 0.0, 0.0, cls.answer_tokens, 0.0)
+
+
+class _Sleeper:
+    def __init__(self, jitter: float, seed: int):
+        self.jitter = jitter
+        self._random = random.Random(seed)
+
+    def seconds(self, ms: float) -> float:
+        if ms <= 0:
+            return 0.0
+        return ms / 1000 * self._random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def sync(self, ms: float) -> None:
+        delay = self.seconds(ms)
+        if delay:
+            time.sleep(delay)
+
+    async def wait(self, ms: float) -> None:
+        delay = self.seconds(ms)
+        if delay:
+            await asyncio.sleep(delay)
+
+
+class HashingEmbeddings(Embeddings):
+    """Deterministic unit vectors from hashed word counts; texts sharing words get similar vectors."""
+
+    def __init__(self, dim: int = 256, profile: LatencyProfile | None = None, sleeper: _Sleeper | None = None):
+        self.dim = dim
+        self.profile = profile
+        self.sleeper = sleeper
+
+    def _vector(self, text: str) -> list[float]:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for token in _TOKEN_RE.findall(text.lower()):
+            bucket = zlib.crc32(token.encode("utf-8"))
+            vector[bucket % self.dim] += 1.0 if bucket & 0x80000000 else -1.0
+        norm = float(np.linalg.norm(vector))
+        return (vector / norm if norm else vector).tolist()
+
+    def _delay_ms(self, count: int) -> float:
+        if self.profile is None:
+            return 0.0
+        return self.profile.embed_ms + self.profile.embed_per_text_ms * count
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        if self.sleeper is not None:
+            self.sleeper.sync(self._delay_ms(len(texts)))
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        if self.sleeper is not None:
+            await self.sleeper.wait(self._delay_ms(len(texts)))
+        return [self._vector(text) for text in texts]
+
+    async def aembed_query(self, text: str) -> list[float]:
+        return (await self.aembed_documents([text]))[0]
+
+
+class ScriptedChatModel:
+    """
+    Chat model stand-in with the ``ainvoke``/``astream`` surface main.py uses.
+
+    Refinement and expansion prompts get deterministic rewrites of the quoted
+    question; answer prompts get the first ``answer_tokens`` words of the
+    context, streamed one word at a time.
+    """
+
+    def __init__(self, profile: LatencyProfile, sleeper: _Sleeper):
+        self.profile = profile
+        self.sleeper = sleeper
+
+    @staticmethod
+    def _quoted(prompt: str, label: str) -> str:
+        match = re.search(rf"{label}:\s*(.+)", prompt)
+        return match.group(1).strip() if match else ""
+
+    def _respond(self, prompt: str) -> tuple[str, bool]:
+        """(response text, is a query rewrite)"""
+        if "Refine the following search query" in prompt:
+            return f"{self._quoted(prompt, 'Original query')} financial results annual report", True
+        if "alternative search queries" in prompt:
+            question = self._quoted(prompt, "Original question")
+            return f"{question} 10-K disclosure\n{question} year over year\n{question} management discussion", True
+        context = prompt.split("CONTEXT:", 1)[-1].split("QUESTION:", 1)[0]
+        words = context.split()[: self.profile.answer_tokens]
+        return " ".join(words) or "I could not find relevant information in the knowledge base.", False
+
+    async def ainvoke(self, prompt: str, *args: Any, **kwargs: Any) -> AIMessage:
+        text, rewrite = self._respond(prompt)
+        if rewrite:
+            await self.sleeper.wait(self.profile.llm_rewrite_ms)
+        else:
+            await self.sleeper.wait(self.profile.llm_first_token_ms)
+            await self.sleeper.wait(self.profile.llm_token_ms * len(text.split()))
+        return AIMessage(content=text)
+
+    async def astream(self, prompt: str, *args: Any, **kwargs: Any) -> AsyncIterator[AIMessageChunk]:
+        text, rewrite = self._respond(prompt)
+        if rewrite:
+            # Rewrites are short; model them as arriving after the full rewrite latency.
+            await self.sleeper.wait(self.profile.llm_rewrite_ms)
+            for line in text.split("\n"):
+                yield AIMessageChunk(content=line + "\n")
+            return
+        await self.sleeper.wait(self.profile.llm_first_token_ms)
+        for position, word in enumerate(text.split()):
+            if position:
+                await self.sleeper.wait(self.profile.llm_token_ms)
+            yield AIMessageChunk(content=word if not position else " " + word)
+
+
+class DelayedVectorStore:
+    """Proxy a vector store, sleeping before each search or fetch to model the round-trip to a hosted index."""
+
+    _SEARCH_PREFIXES = ("similarity_search", "max_marginal_relevance_search", "fetch_vectors")
+
+    def __init__(self, inner, profile: LatencyProfile, sleeper: _Sleeper):
+        self._inner = inner
+        self._profile = profile
+        self._sleeper = sleeper
+
+    def __getattr__(self, name: str):
+        attribute = getattr(self._inner, name)
+        if not callable(attribute) or not name.startswith(self._SEARCH_PREFIXES):
+            return attribute
+
+        def delayed(*args, **kwargs):
+            self._sleeper.sync(self._profile.search_ms)
+            return attribute(*args, **kwargs)
+
+        return delayed
+
+
+# ----------------------------------------------------------------------
+# Corpus and questions
+# ----------------------------------------------------------------------
+def build_indexes(
+    corpus_dir: Path,
+    work_dir: Path,
+    *,
+    max_filings: int,
+    tickers: list[str] | None = None,
+    chunk_size: int = 1200,
+    chunk_overlap: int = 150,
+    chunker: str = "sections",
+    quantization: str = "none",
+) -> tuple[Path, Path, list]:
+    """Build (or reuse) the vector and lexical indexes for the selected filings; returns their paths and sources."""
+    sources = discover_local_filings(corpus_dir, tickers)[:max_filings]
+    if not sources:
+        raise SystemExit(f"No {{TICKER}}_{{YEAR}}_10K.txt filings found in {corpus_dir}")
+
+    fingerprint = hashlib.sha256(
+        json.dumps(
+            [[s.ticker, s.year, os.path.getsize(s.uri)] for s in sources] + [chunk_size, chunk_overlap, chunker, "content-ids"]
+        ).encode("utf-8")
+    ).hexdigest()[:12]
+    index_dir = work_dir / f"index-{fingerprint}"
+    vector_path, lexical_path = index_dir / "vectors", index_dir / "lexical"
+
+    if not (vector_path / "manifest.json").exists():
+        started = time.perf_counter()
+        texts, ids, metadatas = [], [], []
+        for source in sources:
+            text = Path(source.uri).read_text(encoding="utf-8")
+            chunks = chunk_filing(text, chunk_size, chunk_overlap, chunker)
+            ids.extend(chunk_ids(source.ticker, source.year, chunks))
+            for chunk, (body, chunk_metadata) in enumerate(chunks):
+                texts.append(body)
+                metadatas.append(
+                    {
+                        "ticker": source.ticker,
+                        "year": source.year,
+                        "docType": "10-K",
+                        "chunk": chunk,
+                        "source": source.uri,
+                        **chunk_metadata,
+                    }
+                )
+        LocalVectorStore.from_texts(
+            texts, HashingEmbeddings(), metadatas, ids=ids, path=vector_path, profile=EmbeddingProfile.parse(HASHING_PROFILE)
+        )
+        logger.info(f"Vector index: {len(texts)} chunks from {len(sources)} filings in {time.perf_counter() - started:.1f}s")
+    if quantization != "none":
+        quantized_path = index_dir / f"vectors-{quantization}"
+        if not (quantized_path / "manifest.json").exists():
+            convert_index(vector_path, quantized_path, EmbeddingProfile.parse(f"{HASHING_PROFILE}:{quantization}"))
+        vector_path = quantized_path
+    build_lexical_index(lexical_path, sources, chunk_size=chunk_size, chunk_overlap=chunk_overlap, chunker=chunker)
+    return vector_path, lexical_path, sources
+
+
+def company_names(path: Path = DEFAULT_COMPANIES_CSV) -> dict[str, str]:
+    with open(path, newline="", encoding="utf-8") as f:
+        return {normalize_ticker(row["Symbol"]): row["Security"] for row in csv.DictReader(f) if row.get("Symbol")}
+
+
+def make_questions(sources: list, count: int, seed: int) -> list[str]:
+    """A deterministic pool of distinct questions about the indexed filings."""
+    names = company_names()
+    rng = random.Random(seed)
+    questions: dict[str, None] = {}
+    attempts = 0
+    while len(questions) < count and attempts < count * 20:
+        attempts += 1
+        source = rng.choice(sources)
+        template = rng.choice(QUESTION_TEMPLATES)
+        name = names.get(normalize_ticker(source.ticker), source.ticker)
+        questions[template.format(name=name, topic=rng.choice(TOPICS), year=source.year)] = None
+    return list(questions)
+
+
+# ----------------------------------------------------------------------
+# Load generation
+# ----------------------------------------------------------------------
+def percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    return round(float(np.percentile(values, q)), 2)
+
+
+def _stage_name(stage: str) -> str:
+    # expanded[0], expanded[1], ... vary with the rewrite; report them together.
+    return re.sub(r"\[\d+\]", "[*]", stage)
+
+
+@dataclass
+class RunResult:
+    method: str
+    concurrency: int
+    requests: int
+    errors: int
+    duration_s: float
+    throughput_rps: float
+    latency_ms: dict[str, float]
+    stages_ms: dict[str, dict[str, float]] = field(default_factory=dict)
+    status_counts: dict[str, int] = field(default_factory=dict)
+
+
+async def run_load(
+    client,
+    method: str,
+    questions: list[str],
+    *,
+    concurrency: int,
+    requests: int,
+    k: int,
+    seed: int,
+) -> RunResult:
+    """Send ``requests`` /api/ask calls with ``concurrency`` workers, sampling questions with a fixed seed."""
+    rng = random.Random(f"{seed}:{method}:{concurrency}")
+    work = [rng.choice(questions) for _ in range(requests)]
+    latencies: list[float] = []
+    stage_samples: dict[str, list[float]] = {}
+    statuses: dict[str, int] = {}
+
+    async def worker() -> None:
+        while work:
+            question = work.pop()
+            started = time.perf_counter()
+            response = await client.post(
+                "/api/ask",
+                json={"question": question, "retrieval_method": method, "k": k, "include_timings": True},
+            )
+            elapsed = (time.perf_counter() - started) * 1000
+            statuses[str(response.status_code)] = statuses.get(str(response.status_code), 0) + 1
+            if response.status_code != 200:
+                continue
+            latencies.append(elapsed)
+            timings: dict[str, float] = {}
+            for stage, ms in (response.json().get("timings") or {}).items():
+                name = _stage_name(stage)
+                timings[name] = timings.get(name, 0.0) + ms
+            for name, ms in timings.items():
+                stage_samples.setdefault(name, []).append(ms)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    duration = time.perf_counter() - started
+
+    return RunResult(
+        method=method,
+        concurrency=concurrency,
+        requests=requests,
+        errors=requests - len(latencies),
+        duration_s=round(duration, 3),
+        throughput_rps=round(len(latencies) / duration, 2) if duration else 0.0,
+        latency_ms={
+            "mean": round(statistics.fmean(latencies), 2) if latencies else 0.0,
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "max": round(max(latencies), 2) if latencies else 0.0,
+        },
+        stages_ms={
+            name: {
+                "mean": round(statistics.fmean(samples), 2),
+                "p50": percentile(samples, 50),
+                "p95": percentile(samples, 95),
+                "share": round(len(samples) / max(len(latencies), 1), 3),
+            }
+            for name, samples in sorted(stage_samples.items())
+        },
+        status_counts=statuses,
+    )
+
+
+def _configure_app(main, vector_path: Path, lexical_path: Path, args) -> None:
+    settings = main.settings
+    settings.vector_store_backend = "local"
+    settings.local_index_path = str(vector_path)
+    settings.embedding_profile = f"{HASHING_PROFILE}:{args.quantization}"
+    settings.lexical_index_path = str(lexical_path)
+    settings.rewrite_cache_backend = "memory"
+    settings.rewrite_cache_enabled = args.rewrite_cache
+    settings.answer_cache_enabled = args.answer_cache
+    settings.answer_cache_backend = "memory"
+    settings.rerank_enabled = args.rerank
+    # Build everything before the first request, and skip the connection warm-up queries.
+    settings.startup_mode = "eager"
+    settings.startup_warmup = False
+
+
+async def _run_all(args, vector_path: Path, lexical_path: Path, questions: list[str], profile: LatencyProfile):
+    import httpx
+
+    import main
+
+    _configure_app(main, vector_path, lexical_path, args)
+    sleeper = _Sleeper(profile.jitter, args.seed)
+    create_vector_store = main.create_vector_store
+    results = []
+    with ExitStack() as stack:
+        stack.enter_context(mock.patch.object(main, "create_embeddings", lambda: HashingEmbeddings(profile=profile, sleeper=sleeper)))
+        stack.enter_context(mock.patch.object(main, "create_llm", lambda: ScriptedChatModel(profile, sleeper)))
+        stack.enter_context(
+            mock.patch.object(
+                main,
+                "create_vector_store",
+                lambda embeddings: DelayedVectorStore(create_vector_store(embeddings), profile, sleeper),
+            )
+        )
+        # Ingestion reads are not benchmarked; skip credential discovery.
+        stack.enter_context(mock.patch.object(main, "create_firestore_client", lambda **_: None))
+        stack.enter_context(mock.patch.object(main, "create_async_firestore_client", lambda **_: None))
+
+        for method in args.methods:
+            for concurrency in args.concurrency:
+                # A fresh lifespan per run, so caches warmed by one run do not flatter the next.
+                async with main.lifespan(main.app):
+                    transport = httpx.ASGITransport(app=main.app)
+                    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+                        if args.warmup:
+                            await run_load(
+                                client, method, questions, concurrency=concurrency, requests=args.warmup, k=args.k, seed=args.seed + 1
+                            )
+                        result = await run_load(
+                            client, method, questions, concurrency=concurrency, requests=args.requests, k=args.k, seed=args.seed
+                        )
+                results.append(result)
+                print(_format_row(result), flush=True)
+    return results
+
+
+# ----------------------------------------------------------------------
+# Reporting
+# ----------------------------------------------------------------------
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=Path(__file__).resolve().parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+_HEADER = f"{'method':<15} {'conc':>4} {'rps':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'err':>4}  slowest stages (p50 ms)"
+
+
+def _format_row(result: RunResult) -> str:
+    slowest = sorted(
+        ((name, stats["p50"]) for name, stats in result.stages_ms.items() if name != "retrieval"),
+        key=lambda item: -item[1],
+    )[:3]
+    latency = result.latency_ms
+    return (
+        f"{result.method:<15} {result.concurrency:>4} {result.throughput_rps:>7.2f} {latency['p50']:>8.1f} "
+        f"{latency['p95']:>8.1f} {latency['p99']:>8.1f} {result.errors:>4}  "
+        + ", ".join(f"{name} {ms:.0f}" for name, ms in slowest)
+    )
+
+
+def compare(base_path: Path, candidate_path: Path) -> None:
+    """Print p50/p95/p99 and throughput changes for runs present in both result files."""
+    base, candidate = (json.loads(Path(path).read_text()) for path in (base_path, candidate_path))
+    print(f"base {base.get('commit')} ({base_path}) -> candidate {candidate.get('commit')} ({candidate_path})")
+    base_runs = {(run["method"], run["concurrency"]): run for run in base["results"]}
+    print(f"{'method':<15} {'conc':>4} {'rps':>16} {'p50':>20} {'p95':>20} {'p99':>20}")
+
+    def change(old: float, new: float) -> str:
+        delta = (new - old) / old * 100 if old else 0.0
+        return f"{new:.1f} ({delta:+.0f}%)"
+
+    for run in candidate["results"]:
+        old = base_runs.get((run["method"], run["concurrency"]))
+        if old is None:
+            continue
+        print(
+            f"{run['method']:<15} {run['concurrency']:>4} {change(old['throughput_rps'], run['throughput_rps']):>16} "
+            + " ".join(
+                f"{change(old['latency_ms'][q], run['latency_ms'][q]):>20}" for q in ("p50", "p95", "p99")
+            )
+        )
+
+
+def _int_list(value: str) -> list[int]:
+    return [int(item) for item in value.split(",") if item.strip()]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offline benchmark of the RAG API with stubbed upstream services.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="Run the benchmark and write a result file")
+    run.add_argument("--methods", default=",".join(METHODS), help="Comma separated retrieval methods")
+    run.add_argument("--concurrency", type=_int_list, default=[1, 8, 32], help="Comma separated concurrency levels")
+    run.add_argument("--requests", type=int, default=100, help="Measured requests per method and concurrency")
+    run.add_argument("--warmup", type=int, default=0, help="Unmeasured requests sent before each run")
+    run.add_argument("--k", type=int, default=5)
+    run.add_argument("--questions", type=int, default=150, help="Size of the question pool requests sample from")
+    run.add_argument("--corpus-dir", type=Path, default=DEFAULT_CORPUS_DIR)
+    run.add_argument("--tickers", help="Comma separated tickers to index (default: the first --max-filings filings)")
+    run.add_argument("--max-filings", type=int, default=20)
+    run.add_argument("--chunker", choices=("sections", "recursive"), default="sections")
+    run.add_argument(
+        "--quantization",
+        choices=("none", "int8", "binary"),
+        default="none",
+        help="Search the vector index through int8 or binary codes with full-precision rescoring",
+    )
+    run.add_argument("--work-dir", type=Path, default=DEFAULT_WORK_DIR, help="Where built indexes are cached")
+    run.add_argument("--out", type=Path, help="Result file (default: benchmark_results/<commit>-<time>.json)")
+    run.add_argument("--seed", type=int, default=7)
+    run.add_argument("--no-latency", action="store_true", help="Measure pipeline overhead with zero injected latency")
+    run.add_argument("--answer-cache", action="store_true", help="Enable the answer cache (off by default)")
+    run.add_argument("--no-rewrite-cache", dest="rewrite_cache", action="store_false")
+    run.add_argument("--rerank", action="store_true", help="Enable the rerank stage (RERANK_* settings apply)")
+    for name, default in asdict(LatencyProfile()).items():
+        run.add_argument(f"--{name.replace('_', '-')}", type=type(default), default=default)
+
+    diff = commands.add_parser("compare", help="Compare two result files")
+    diff.add_argument("base", type=Path)
+    diff.add_argument("candidate", type=Path)
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s %(name)s: %(message)s")
+    logger.setLevel(logging.INFO)
+
+    if args.command == "compare":
+        compare(args.base, args.candidate)
+        return
+
+    args.methods = [method.strip() for method in args.methods.split(",") if method.strip()]
+    unknown = set(args.methods) - set(METHODS)
+    if unknown:
+        parser.error(f"Unknown retrieval methods: {', '.join(sorted(unknown))}")
+    profile = LatencyProfile.none() if args.no_latency else LatencyProfile(
+        **{name: getattr(args, name) for name in asdict(LatencyProfile())}
+    )
+
+    tickers = [ticker.strip() for ticker in args.tickers.split(",")] if args.tickers else None
+    vector_path, lexical_path, sources = build_indexes(
+        args.corpus_dir,
+        args.work_dir,
+        max_filings=args.max_filings,
+        tickers=tickers,
+        chunker=args.chunker,
+        quantization=args.quantization,
+    )
+    questions = make_questions(sources, args.questions, args.seed)
+
+    print(_HEADER)
+    started = time.time()
+    results = asyncio.run(_run_all(args, vector_path, lexical_path, questions, profile))
+
+    commit = _git_commit()
+    out = args.out or Path("benchmark_results") / f"{commit or 'local'}-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(
+        json.dumps(
+            {
+                "commit": commit,
+                "started_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(started)),
+                "python": sys.version.split()[0],
+                "platform": platform.platform(),
+                "config": {
+                    "methods": args.methods,
+                    "concurrency": args.concurrency,
+                    "requests": args.requests,
+                    "warmup": args.warmup,
+                    "k": args.k,
+                    "questions": len(questions),
+                    "filings": [f"{source.ticker}_{source.year}" for source in sources],
+                    "chunker": args.chunker,
+                    "quantization": args.quantization,
+                    "seed": args.seed,
+                    "answer_cache": args.answer_cache,
+                    "rewrite_cache": args.rewrite_cache,
+                    "rerank": args.rerank,
+                    "latency": asdict(profile),
+                },
+                "results": [asdict(result) for result in results],
+            },
+            indent=2,
+        )
+    )
+    print(f"Results written to {out}")
+
+
+if __name__ == "__main__":
+    main()
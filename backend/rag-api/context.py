@@ -0,0 +1,254 @@
+"""Token-budgeted context assembly between retrieval and generation."""
+
+from __future__ import annotations
+
+import logging
+import re
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from langchain_core.documents import Document
+
+logger = logging.getLogger(__name__)
+
+# Separator placed between passages in the prompt.
+PASSAGE_SEPARATOR = "\n\n"
+# Upper bound on the text shared by two consecutive chunks; the ingestion
+# splitter uses chunk_overlap=150, so anything longer is real repeated content.
+MAX_CHUNK_OVERLAP_CHARS = 300
+# Shortest suffix/prefix match treated as splitter overlap rather than coincidence.
+MIN_CHUNK_OVERLAP_CHARS = 20
+# A truncated passage shorter than this is not worth adding to the prompt.
+MIN_PASSAGE_TOKENS = 64
+
+_WORD_RE = re.compile(r"\w+")
+
+
+class TokenCounter:
+    """
+    Count tokens with the tiktoken encoding for ``model``.
+
+    The encoding is loaded on first use. When tiktoken (or its encoding file) is
+    unavailable, a four-characters-per-token estimate is used instead so context
+    assembly keeps working.
+    """
+
+    def __init__(self, model: str):
+        self.model = model
+        self._encoding = None
+        self._loaded = False
+
+    def _load(self):
+        if not self._loaded:
+            self._loaded = True
+            try:
+                import tiktoken
+
+                try:
+                    self._encoding = tiktoken.encoding_for_model(self.model)
+                except KeyError:
+                    self._encoding = tiktoken.get_encoding("o200k_base")
+            except Exception as e:
+                logger.warning(f"tiktoken unavailable for {self.model} ({e}); estimating tokens from characters")
+        return self._encoding
+
+    def count(self, text: str) -> int:
+        encoding = self._load()
+        if encoding is None:
+            return (len(text) + 3) // 4
+        return len(encoding.encode(text, disallowed_special=()))
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Return the longest prefix of ``text`` that fits in ``max_tokens``."""
+        encoding = self._load()
+        if encoding is None:
+            return text[: max_tokens * 4]
+        tokens = encoding.encode(text, disallowed_special=())
+        return encoding.decode(tokens[:max_tokens])
+
+
+@dataclass
+class Passage:
+    """One or more consecutive chunks of the same filing, merged into a single block of text."""
+
+    text: str
+    rank: int
+    ids: list[str] = field(default_factory=list)
+    metadata: dict[str, Any] = field(default_factory=dict)
+    tokens: int = 0
+
+
+@dataclass
+class AssembledContext:
+    text: str
+    passages: list[Passage]
+    tokens: int
+    merged_chunks: int = 0
+    dropped_duplicates: int = 0
+    dropped_over_budget: int = 0
+
+
+def _chunk_position(doc: Document) -> tuple[tuple, int] | None:
+    """
+    (filing key, chunk index) for a chunk, from its metadata or, failing that, a
+    positional vector ID. Content-keyed IDs carry no position, and a hex key can
+    happen to be all digits, so the metadata comes first.
+    """
+    metadata = doc.metadata or {}
+    chunk = metadata.get("chunk")
+    if metadata.get("ticker") is not None and metadata.get("year") is not None and chunk is not None:
+        try:
+            return (str(metadata["ticker"]), str(metadata["year"]), "10K"), int(chunk)
+        except (TypeError, ValueError):
+            pass
+
+    if doc.id and doc.id.count(":") == 3:
+        ticker, year, doc_type, chunk = doc.id.split(":")
+        if chunk.isdigit():
+            return (ticker, year, doc_type), int(chunk)
+    return None
+
+
+def strip_overlap(previous: str, following: str, max_overlap: int = MAX_CHUNK_OVERLAP_CHARS) -> str:
+    """Remove the prefix of ``following`` that repeats the end of ``previous``."""
+    longest = min(len(previous), len(following), max_overlap)
+    for size in range(longest, MIN_CHUNK_OVERLAP_CHARS - 1, -1):
+        if previous.endswith(following[:size]):
+            return following[size:]
+    return following
+
+
+def merge_adjacent_chunks(docs: list[Document]) -> list[Passage]:
+    """
+    Merge retrieved chunks that are consecutive in the same filing.
+
+    ``docs`` is in relevance order. Each run of consecutive chunk indices becomes
+    one passage in document order with the splitter overlap removed, ranked by its
+    most relevant chunk. Chunks without a recognizable position stay on their own.
+    """
+    positioned: dict[tuple, dict[int, tuple[int, Document]]] = {}
+    passages: list[Passage] = []
+    for rank, doc in enumerate(docs):
+        position = _chunk_position(doc)
+        if position is None:
+            passages.append(Passage(text=doc.page_content, rank=rank, ids=[doc.id] if doc.id else [], metadata=doc.metadata))
+            continue
+        filing, index = position
+        # Keep the first (most relevant) copy when the same chunk was retrieved twice.
+        positioned.setdefault(filing, {}).setdefault(index, (rank, doc))
+
+    for chunks in positioned.values():
+        run: list[tuple[int, Document]] = []
+        previous_index = None
+        for index in sorted(chunks):
+            if run and index != previous_index + 1:
+                passages.append(_merge_run(run))
+                run = []
+            run.append(chunks[index])
+            previous_index = index
+        passages.append(_merge_run(run))
+
+    passages.sort(key=lambda passage: passage.rank)
+    return passages
+
+
+def _merge_run(run: list[tuple[int, Document]]) -> Passage:
+    text = run[0][1].page_content
+    for (_, previous), (_, following) in zip(run, run[1:]):
+        remainder = strip_overlap(previous.page_content, following.page_content)
+        # The splitter trims whitespace at chunk boundaries; restore one when nothing overlapped.
+        text += remainder if remainder != following.page_content else "\n" + remainder
+    return Passage(
+        text=text,
+        rank=min(rank for rank, _ in run),
+        ids=[doc.id for _, doc in run if doc.id],
+        metadata=run[0][1].metadata,
+    )
+
+
+def _shingles(text: str, size: int = 3) -> set[tuple[str, ...]]:
+    words = _WORD_RE.findall(text.lower())
+    if len(words) <= size:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i : i + size]) for i in range(len(words) - size + 1)}
+
+
+def drop_near_duplicates(passages: list[Passage], threshold: float) -> tuple[list[Passage], int]:
+    """
+    Drop passages whose word-trigram set is mostly covered by a more relevant one.
+
+    A passage is a duplicate when the shingles it shares with an already-kept
+    passage make up at least ``threshold`` of the smaller of the two sets, which
+    also catches a short passage fully contained in a longer one.
+    """
+    kept: list[Passage] = []
+    kept_shingles: list[set] = []
+    dropped = 0
+    for passage in passages:
+        shingles = _shingles(passage.text)
+        is_duplicate = False
+        for other in kept_shingles:
+            smaller = min(len(shingles), len(other))
+            if smaller and len(shingles & other) / smaller >= threshold:
+                is_duplicate = True
+                break
+        if is_duplicate:
+            dropped += 1
+            continue
+        kept.append(passage)
+        kept_shingles.append(shingles)
+    return kept, dropped
+
+
+def assemble_context(
+    docs: list[Document],
+    *,
+    budget_tokens: int,
+    count_tokens: Callable[[str], int],
+    truncate: Callable[[str, int], str] | None = None,
+    duplicate_threshold: float = 0.85,
+) -> AssembledContext:
+    """
+    Build the prompt context from relevance-ordered chunks within a token budget.
+
+    Adjacent chunks of the same filing are merged without their overlap,
+    near-duplicate passages are dropped, and passages are added in relevance
+    order until the next one no longer fits. The passage that crosses the budget
+    is truncated to fill the remainder when ``truncate`` is given and at least
+    ``MIN_PASSAGE_TOKENS`` tokens are left.
+    """
+    passages = merge_adjacent_chunks([doc for doc in docs if doc.page_content and doc.page_content.strip()])
+    merged_chunks = sum(max(len(passage.ids) - 1, 0) for passage in passages)
+    passages, dropped_duplicates = drop_near_duplicates(passages, duplicate_threshold)
+
+    separator_tokens = count_tokens(PASSAGE_SEPARATOR)
+    selected: list[Passage] = []
+    used = 0
+    for position, passage in enumerate(passages):
+        passage.tokens = count_tokens(passage.text)
+        cost = passage.tokens + (separator_tokens if selected else 0)
+        if used + cost <= budget_tokens:
+            selected.append(passage)
+            used += cost
+            continue
+
+        remaining = budget_tokens - used - (separator_tokens if selected else 0)
+        if truncate is not None and remaining >= MIN_PASSAGE_TOKENS:
+            passage.text = truncate(passage.text, remaining)
+            passage.tokens = count_tokens(passage.text)
+            selected.append(passage)
+            used += passage.tokens + (separator_tokens if len(selected) > 1 else 0)
+            position += 1
+        dropped_over_budget = len(passages) - position
+        break
+    else:
+        dropped_over_budget = 0
+
+    return AssembledContext(
+        text=PASSAGE_SEPARATOR.join(passage.text for passage in selected),
+        passages=selected,
+        tokens=used,
+        merged_chunks=merged_chunks,
+        dropped_duplicates=dropped_duplicates,
+        dropped_over_budget=dropped_over_budget,
+    )
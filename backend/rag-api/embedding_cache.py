@@ -0,0 +1,198 @@
+"""Caching, micro-batching wrapper around the query embedding model."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from telemetry import span
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Cache key for a text: surrounding whitespace stripped and inner runs collapsed."""
+    return _WHITESPACE_RE.sub(" ", text.strip())
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wrap an ``Embeddings`` model with an LRU vector cache and request batching.
+
+    Vectors are cached as float32 arrays keyed on the normalized text. Misses are
+    queued and sent to the wrapped model together: the first queued text opens a
+    ``batch_window_ms`` window and every text requested in that window (from any
+    thread or coroutine) goes out in the same ``embed_documents`` call. Concurrent
+    requests for a text that is already being embedded wait for that call instead
+    of issuing another one.
+
+    Sync methods block the calling thread (vector stores call ``embed_query`` from
+    the threadpool); async methods await the same futures without blocking the
+    event loop.
+    """
+
+    def __init__(
+        self,
+        inner: Embeddings,
+        *,
+        max_entries: int = 2000,
+        batch_window_ms: float = 5.0,
+        max_batch_size: int = 256,
+        max_concurrent_batches: int = 4,
+    ):
+        self.inner = inner
+        self.max_entries = max_entries
+        self.batch_window = batch_window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self._cache: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._inflight: dict[str, Future] = {}
+        self._queue: list[tuple[str, str, Future]] = []
+        self._lock = threading.Lock()
+        self._queued = threading.Condition(self._lock)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent_batches, thread_name_prefix="embed-batch")
+        self._worker: threading.Thread | None = None
+        self._closed = False
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0, "api_calls": 0, "embedded_texts": 0}
+
+    # ------------------------------------------------------------------
+    # Cache and queue
+    # ------------------------------------------------------------------
+    def _resolve(self, texts: list[str]) -> list[np.ndarray | Future]:
+        """Cached vector or pending future per text; misses are queued for the next batch."""
+        resolved: list[np.ndarray | Future] = []
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("CachedEmbeddings is closed")
+            for text in texts:
+                key = normalize_text(text)
+                vector = self._cache.get(key)
+                if vector is not None:
+                    self._cache.move_to_end(key)
+                    self.stats["hits"] += 1
+                    resolved.append(vector)
+                    continue
+                future = self._inflight.get(key)
+                if future is not None:
+                    self.stats["coalesced"] += 1
+                else:
+                    self.stats["misses"] += 1
+                    future = Future()
+                    self._inflight[key] = future
+                    self._queue.append((key, text, future))
+                resolved.append(future)
+            if self._queue:
+                self._ensure_worker()
+                self._queued.notify()
+        return resolved
+
+    def _ensure_worker(self) -> None:
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._collect_batches, name="embed-batcher", daemon=True)
+            self._worker.start()
+
+    def _collect_batches(self) -> None:
+        while True:
+            with self._lock:
+                while not self._queue and not self._closed:
+                    self._queued.wait()
+                if self._closed:
+                    return
+                deadline = time.monotonic() + self.batch_window
+                while len(self._queue) < self.max_batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._queued.wait(remaining)
+                batch = self._queue[: self.max_batch_size]
+                del self._queue[: self.max_batch_size]
+            self._executor.submit(self._embed_batch, batch)
+
+    def _embed_batch(self, batch: list[tuple[str, str, Future]]) -> None:
+        try:
+            vectors = self.inner.embed_documents([text for _, text, _ in batch])
+        except Exception as e:
+            logger.warning(f"Embedding batch of {len(batch)} texts failed: {e}")
+            with self._lock:
+                for key, _, _ in batch:
+                    self._inflight.pop(key, None)
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+
+        arrays = [np.asarray(vector, dtype=np.float32) for vector in vectors]
+        with self._lock:
+            self.stats["api_calls"] += 1
+            self.stats["embedded_texts"] += len(batch)
+            for (key, _, _), array in zip(batch, arrays):
+                self._inflight.pop(key, None)
+                self._cache[key] = array
+                self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        for (_, _, future), array in zip(batch, arrays):
+            future.set_result(array)
+
+    # ------------------------------------------------------------------
+    # Embeddings interface
+    # ------------------------------------------------------------------
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        with span("embedding", texts=len(texts)) as counts:
+            resolved = self._resolve(list(texts))
+            counts["cache_hits"] = sum(not isinstance(item, Future) for item in resolved)
+            return [(item.result() if isinstance(item, Future) else item).tolist() for item in resolved]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        with span("embedding", texts=len(texts)) as counts:
+            resolved = self._resolve(list(texts))
+            counts["cache_hits"] = sum(not isinstance(item, Future) for item in resolved)
+            vectors = []
+            for item in resolved:
+                if isinstance(item, Future):
+                    item = await asyncio.wrap_future(item)
+                vectors.append(item.tolist())
+            return vectors
+
+    async def aembed_query(self, text: str) -> list[float]:
+        return (await self.aembed_documents([text]))[0]
+
+    # ------------------------------------------------------------------
+    # Lifecycle and stats
+    # ------------------------------------------------------------------
+    def close(self) -> None:
+        """Stop batching; texts still waiting for a batch fail instead of hanging their callers."""
+        with self._lock:
+            self._closed = True
+            abandoned = self._queue
+            self._queue = []
+            self._inflight.clear()
+            self._queued.notify_all()
+        for _, _, future in abandoned:
+            future.set_exception(RuntimeError("CachedEmbeddings closed before the text was embedded"))
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def snapshot_stats(self) -> dict[str, Any]:
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"] + self.stats["coalesced"]
+            return {
+                **self.stats,
+                "entries": len(self._cache),
+                "bytes": sum(vector.nbytes for vector in self._cache.values()),
+                "hit_rate": round(self.stats["hits"] / lookups, 4) if lookups else 0.0,
+                "avg_batch_size": (
+                    round(self.stats["embedded_texts"] / self.stats["api_calls"], 2) if self.stats["api_calls"] else 0.0
+                ),
+            }
@@ -0,0 +1,188 @@
+"""Embedding profiles: the model, width and first-pass quantization behind a vector index.
+
+A profile is written ``model[:dimensions[:quantization]]``, for example::
+
+    text-embedding-3-large                  3072 dimensions, float vectors
+    text-embedding-3-large:1024             Matryoshka prefix of 1024 dimensions
+    text-embedding-3-large:1024:int8        ... searched through int8 codes
+    text-embedding-3-large:3072:binary      ... searched through sign bits
+
+``dimensions`` keeps the leading components of each vector and re-normalizes
+them; OpenAI's ``text-embedding-3`` models are trained for this and return the
+same vectors when asked for fewer ``dimensions``. ``quantization`` only
+changes the first pass of the local index: candidates are ranked on compact
+codes (1 byte or 1 bit per dimension instead of 4), and a shortlist of
+``rescore_factor * k`` of them is rescored against the full-precision vectors.
+
+The local index records its profile in ``manifest.json`` and ingestion records
+it in each filing's manifest, so the API can refuse to start when the query
+embeddings it is configured for do not match the stored vectors.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Callable
+
+import numpy as np
+
+from mmr import truncate_vectors
+
+NATIVE_DIMENSIONS = {
+    "text-embedding-3-large": 3072,
+    "text-embedding-3-small": 1536,
+    "text-embedding-ada-002": 1536,
+}
+# Models whose vectors stay meaningful when cut to a prefix and re-normalized.
+MATRYOSHKA_MODELS = frozenset({"text-embedding-3-large", "text-embedding-3-small"})
+QUANTIZATIONS = ("none", "int8", "binary")
+# Shortlist size per result, as a multiple of k, rescored at full precision.
+DEFAULT_RESCORE_FACTORS = {"none": 1, "int8": 4, "binary": 10}
+DEFAULT_PROFILE = "text-embedding-3-large"
+
+
+class EmbeddingProfileMismatch(ValueError):
+    """The configured embedding profile does not match the vectors in the index."""
+
+
+@dataclass(frozen=True)
+class EmbeddingProfile:
+    model: str
+    dimensions: int
+    quantization: str = "none"
+
+    @classmethod
+    def parse(cls, spec: str) -> EmbeddingProfile:
+        """Read ``model[:dimensions[:quantization]]``; dimensions default to the model's native width."""
+        model, _, rest = spec.strip().partition(":")
+        dimensions, _, quantization = rest.partition(":")
+        if not model:
+            raise ValueError(f"Embedding profile {spec!r} names no model")
+        if dimensions:
+            width = int(dimensions)
+        elif model in NATIVE_DIMENSIONS:
+            width = NATIVE_DIMENSIONS[model]
+        else:
+            raise ValueError(f"Embedding profile {spec!r} needs dimensions for model {model}")
+        return cls(model, width, quantization or "none")
+
+    def __post_init__(self) -> None:
+        if self.quantization not in QUANTIZATIONS:
+            raise ValueError(f"Unknown quantization {self.quantization!r}; expected one of {QUANTIZATIONS}")
+        native = NATIVE_DIMENSIONS.get(self.model)
+        if self.dimensions <= 0 or (native and self.dimensions > native):
+            raise ValueError(f"{self.model} cannot produce {self.dimensions} dimensions")
+        if native and self.dimensions < native and self.model not in MATRYOSHKA_MODELS:
+            raise ValueError(f"{self.model} vectors cannot be truncated to {self.dimensions} dimensions")
+
+    def __str__(self) -> str:
+        return f"{self.model}:{self.dimensions}:{self.quantization}"
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> EmbeddingProfile:
+        return cls(data["model"], int(data["dimensions"]), data.get("quantization", "none"))
+
+    def as_dict(self) -> dict[str, Any]:
+        return {"model": self.model, "dimensions": self.dimensions, "quantization": self.quantization}
+
+    @property
+    def truncated(self) -> bool:
+        native = NATIVE_DIMENSIONS.get(self.model)
+        return bool(native) and self.dimensions < native
+
+    @property
+    def rescore_factor(self) -> int:
+        return DEFAULT_RESCORE_FACTORS[self.quantization]
+
+    def embedding_kwargs(self) -> dict[str, Any]:
+        """Keyword arguments for ``OpenAIEmbeddings`` that return vectors of this profile's width."""
+        kwargs: dict[str, Any] = {"model": self.model}
+        if self.truncated:
+            kwargs["dimensions"] = self.dimensions
+        return kwargs
+
+    def prepare(self, vectors: np.ndarray | list[list[float]]) -> np.ndarray:
+        """Unit-length float32 rows cut to this profile's width."""
+        matrix = truncate_vectors(vectors, self.dimensions)
+        if matrix.shape[1] != self.dimensions:
+            raise EmbeddingProfileMismatch(
+                f"Embeddings have {matrix.shape[1]} dimensions, profile {self} needs {self.dimensions}"
+            )
+        return matrix
+
+
+def check_index_profile(expected: EmbeddingProfile, stored: EmbeddingProfile | None, dimensions: int, index: str) -> None:
+    """
+    Raise EmbeddingProfileMismatch unless an index written with ``stored`` (or, for
+    indexes that record no profile, ``dimensions`` wide vectors) can serve queries
+    embedded with ``expected``.
+    """
+    if stored is not None:
+        if stored != expected:
+            raise EmbeddingProfileMismatch(
+                f"{index} was built with embedding profile {stored}, but EMBEDDING_PROFILE is {expected}"
+            )
+        return
+    if dimensions != expected.dimensions:
+        raise EmbeddingProfileMismatch(
+            f"{index} holds {dimensions}-dimension vectors, but EMBEDDING_PROFILE {expected} "
+            f"embeds queries with {expected.dimensions}"
+        )
+    if expected.quantization != "none":
+        raise EmbeddingProfileMismatch(f"{index} has no {expected.quantization} codes for EMBEDDING_PROFILE {expected}")
+
+
+class Quantizer:
+    """
+    First-pass codes for unit vectors, and the approximate scorer that ranks them.
+
+    ``int8`` scales each dimension by its largest absolute value across the index,
+    so scores are dot products up to rounding. ``binary`` keeps the sign of each
+    component, packed 8 per byte; the query stays in float and is dotted with the
+    +1/-1 signs through a per-byte lookup table, which ranks noticeably better than
+    comparing sign bits with the query's.
+    """
+
+    def __init__(self, quantization: str, dimensions: int, scales: np.ndarray | None = None):
+        self.quantization = quantization
+        self.dimensions = dimensions
+        self.scales = scales
+
+    @classmethod
+    def fit(cls, quantization: str, matrix: np.ndarray) -> Quantizer:
+        scales = None
+        if quantization == "int8":
+            scales = np.abs(np.asarray(matrix, dtype=np.float32)).max(axis=0) / 127.0
+            scales[scales == 0] = 1.0
+        return cls(quantization, matrix.shape[1], scales)
+
+    def encode(self, matrix: np.ndarray) -> np.ndarray:
+        matrix = np.asarray(matrix, dtype=np.float32)
+        if self.quantization == "int8":
+            return np.clip(np.rint(matrix / self.scales), -127, 127).astype(np.int8)
+        if self.quantization == "binary":
+            return np.packbits(matrix > 0, axis=1)
+        raise ValueError(f"Quantization {self.quantization!r} has no codes")
+
+    def scorer(self, query: np.ndarray) -> Callable[[np.ndarray], np.ndarray]:
+        """A function from a block of codes to approximate query similarities (float32)."""
+        if self.quantization == "int8":
+            weights = (query * self.scales).astype(np.float32)
+            return lambda codes: codes.astype(np.float32) @ weights
+
+        # table[j, byte] = sum of the query components at byte j's set bits.
+        code_width = (self.dimensions + 7) // 8
+        padded = np.zeros(code_width * 8, dtype=np.float32)
+        padded[: self.dimensions] = query
+        table = padded.reshape(code_width, 8) @ _BYTE_BITS.T
+        positions = np.arange(code_width)
+        query_sum = np.float32(padded.sum())
+
+        def signed_dot(codes: np.ndarray) -> np.ndarray:
+            # q . (2b - 1) = 2 (q . b) - sum(q)
+            return 2 * table[positions, codes].sum(axis=1, dtype=np.float32) - query_sum
+
+        return signed_dot
+
+
+_BYTE_BITS = np.unpackbits(np.arange(256, dtype=np.uint8)[:, np.newaxis], axis=1).astype(np.float32)
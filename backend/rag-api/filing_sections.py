@@ -0,0 +1,316 @@
+"""Clean converted 10-K text and split it into SEC items with a compact section offset index.
+
+The filings in ``clean_10k_texts`` are HTML converted to text, so every table
+became pipe-delimited rows padded with empty cells (``| | |``) and
+``---|---|---`` separator lines, and page breaks left ``* * *`` markers and
+running footers. ``parse_filing`` makes one pass over the lines of a filing:
+
+- table rows keep only their non-empty cells (``$`` and ``%`` cells are joined
+  to their numbers), and separator rows, page breaks, footers and repeated
+  blank lines are dropped
+- ``Item N.`` headings (Item 1 Business, 1A Risk Factors, 7 MD&A, 8 Financial
+  Statements, ...) start a new section. Table-of-contents rows (ending in a page
+  number) and headings that would go backwards (running headers, cross
+  references) are ignored.
+
+A filing in which Items 1A, 7 and 8 are not all found (filings organized
+around a cross-reference index rather than the item order) is kept as a
+single ``filing`` section instead of being split on the few items it does label.
+
+Each section keeps its cleaned text and the character range it covers in the
+original file. ``section_index`` turns the ranges into a small JSON document,
+so a section can be sliced out of the source file without parsing it again.
+
+Write the index for every filing with::
+
+    python filing_sections.py --dir ../clean_10k_texts --out ../clean_10k_sections
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterable
+
+logger = logging.getLogger(__name__)
+
+INDEX_VERSION = 1
+COVER_SECTION = "cover"
+# The whole text of a filing in which the core items were not all found.
+UNSECTIONED = "filing"
+# Items every 10-K has; a filing in which any is missing is kept unsectioned.
+CORE_ITEMS = ("1A", "7", "8")
+
+# Form 10-K items in filing order.
+ITEM_TITLES = {
+    "1": "Business",
+    "1A": "Risk Factors",
+    "1B": "Unresolved Staff Comments",
+    "1C": "Cybersecurity",
+    "2": "Properties",
+    "3": "Legal Proceedings",
+    "4": "Mine Safety Disclosures",
+    "5": "Market for Registrant's Common Equity, Related Stockholder Matters and Issuer Purchases of Equity Securities",
+    "6": "[Reserved]",
+    "7": "Management's Discussion and Analysis of Financial Condition and Results of Operations",
+    "7A": "Quantitative and Qualitative Disclosures About Market Risk",
+    "8": "Financial Statements and Supplementary Data",
+    "9": "Changes in and Disagreements with Accountants on Accounting and Financial Disclosure",
+    "9A": "Controls and Procedures",
+    "9B": "Other Information",
+    "9C": "Disclosure Regarding Foreign Jurisdictions that Prevent Inspections",
+    "10": "Directors, Executive Officers and Corporate Governance",
+    "11": "Executive Compensation",
+    "12": "Security Ownership of Certain Beneficial Owners and Management and Related Stockholder Matters",
+    "13": "Certain Relationships and Related Transactions, and Director Independence",
+    "14": "Principal Accountant Fees and Services",
+    "15": "Exhibit and Financial Statement Schedules",
+    "16": "Form 10-K Summary",
+}
+_ITEM_RANK = {item: rank for rank, item in enumerate(ITEM_TITLES)}
+
+# "Item 1A.", "Item 1.A.", "Item 1(a).", "ITEM 7 -", "PART II, Item 8", "Items 1 and 2.", "Item 1" alone;
+# not "Item 7 of Part II" or "Item 8.01".
+_HEADING_RE = re.compile(
+    r"^(?:[Pp][Aa][Rr][Tt]\s+[IVXivx]+\s*[.,:|\-–—]?\s*)?[Ii][Tt][Ee][Mm][Ss]?\s*"
+    r"(\d{1,2}(?:\.?[A-Ca-c](?![A-Za-z])|\([A-Ca-c]\))?)(?![\d.]\d)"
+    r"(?:\s*(?:and|&|,)\s*\d{1,2}[A-Ca-c]?)?\s*(?:[.:|\-–—]\s*|\s+(?=[A-Z“\"\[])|$)(?P<title>.*)$"
+)
+_PAGE_REF_RE = re.compile(r"^(?:\d{1,3}(?:\s*[-–]\s*\d{1,3})?|[ivxlc]{1,6})$", re.IGNORECASE)
+_TRAILING_PAGE_RE = re.compile(r"\s\d{1,3}(?:\s*[-–]\s*\d{1,3})?$")
+_FOOTER_RE = re.compile(r"form 10-k\s*(?:\|\s*)?(?:page\s*)?\d{1,3}$", re.IGNORECASE)
+_PAGE_BREAK = "* * *"
+# Some converted tables pad empty cells with zero-width spaces.
+_ZERO_WIDTH_SPACE = "\u200b"
+_MAX_HEADING_CHARS = 250
+# Text after its heading that makes a section more than a table-of-contents entry.
+_MIN_BODY_CHARS = 60
+# A heading line seen this often is a running page header, not a section start.
+_RUNNING_HEADER_REPEATS = 3
+
+
+def normalize_item(code: str) -> str | None:
+    """Canonical item code for '1a', 'Item 7A', 'ITEM 7.' and the like; None if it is not a 10-K item."""
+    code = code.strip().upper()
+    if code.startswith("ITEM"):
+        code = code[4:]
+    code = code.strip(" .:")
+    if code.lower() in (COVER_SECTION, UNSECTIONED):
+        return code.lower()
+    return code if code in ITEM_TITLES else None
+
+
+def clean_line(line: str) -> str:
+    """
+    A line with table padding removed: '' for separator rows, empty rows, page
+    breaks and page footers; table rows as their non-empty cells joined by ' | '.
+    """
+    line = line.replace(_ZERO_WIDTH_SPACE, "").strip()
+    if not line or line == _PAGE_BREAK:
+        return ""
+    if "|" in line:
+        cells: list[str] = []
+        for cell in line.split("|"):
+            cell = cell.strip()
+            if not cell or set(cell) <= set("-: "):
+                continue
+            if cells and cells[-1] == "$":
+                cells[-1] = "$" + cell
+            elif cell in ("%", ")", "%)") and cells:
+                cells[-1] += cell
+            else:
+                cells.append(cell)
+        line = " | ".join(cells)
+    if _FOOTER_RE.search(line) or (line.isdigit() and len(line) <= 3):
+        return ""
+    return line
+
+
+def _heading_item(line: str) -> str | None:
+    """The item a cleaned line is the heading of, or None (also for table-of-contents rows)."""
+    if len(line) > _MAX_HEADING_CHARS:
+        return None
+    match = _HEADING_RE.match(line.strip("*#_ "))
+    if not match:
+        return None
+    item = re.sub(r"[.()]", "", match.group(1)).upper()
+    if item not in ITEM_TITLES:
+        return None
+    title = match.group("title").strip()
+    cells = [cell.strip() for cell in title.split("|")]
+    if len(cells) > 1 and _PAGE_REF_RE.match(cells[-1]):
+        return None
+    if _TRAILING_PAGE_RE.search(title):
+        return None
+    return item
+
+
+@dataclass
+class Section:
+    item: str
+    title: str
+    start: int
+    end: int
+    text: str = field(default="", repr=False)
+
+
+@dataclass
+class ParsedFiling:
+    sections: list[Section]
+    raw_chars: int
+    clean_chars: int
+
+    def section(self, item: str) -> Section | None:
+        return next((section for section in self.sections if section.item == item), None)
+
+
+def _select_headings(candidates: list[tuple[int, str, int, int]], clean_end: int) -> list[int]:
+    """
+    Pick which candidate headings start sections: items in filing order, chosen
+    so that as many sections as possible have a body (table-of-contents entries
+    without page numbers are followed directly by the next entry). Ties go to
+    more sections, then to earlier headings. O(n^2) over the few dozen
+    candidates of a filing.
+
+    ``candidates`` are (line number, item, position in the cleaned text, heading length).
+    """
+    ranks = [_ITEM_RANK[item] for _, item, *_ in candidates]
+    positions = [position for _, _, position, _ in candidates]
+
+    lengths = [length for *_, length in candidates]
+
+    def weight(i: int, next_position: int) -> tuple[int, int, int]:
+        has_body = int(next_position - positions[i] - lengths[i] >= _MIN_BODY_CHARS)
+        return has_body, 1, -positions[i]
+
+    # best[j]: score of the best selection ending with candidate j (the section
+    # started by j is scored once its end, the next selected heading, is known).
+    best: list[tuple[int, int, int]] = []
+    previous: list[int | None] = []
+    for j in range(len(candidates)):
+        best_score, best_previous = (0, 0, 0), None
+        for i in range(j):
+            if ranks[i] < ranks[j] and positions[i] < positions[j]:
+                step = weight(i, positions[j])
+                score = tuple(a + b for a, b in zip(best[i], step))
+                if score > best_score:
+                    best_score, best_previous = score, i
+        best.append(best_score)
+        previous.append(best_previous)
+
+    final, last = (0, 0, 0), None
+    for j in range(len(candidates)):
+        score = tuple(a + b for a, b in zip(best[j], weight(j, clean_end)))
+        if score > final:
+            final, last = score, j
+    selected = []
+    while last is not None:
+        selected.append(candidates[last][0])
+        last = previous[last]
+    return selected[::-1]
+
+
+def parse_filing(lines: Iterable[str]) -> ParsedFiling:
+    """
+    Clean and sectionize a filing in one pass over its lines (as read from the
+    file, with line endings). Offsets are character positions in the original text.
+    """
+    cleaned: list[str] = []
+    offsets: list[int] = []
+    candidates: list[tuple[int, str, int, int]] = []
+    offset = 0
+    clean_position = 0
+    for raw in lines:
+        line = clean_line(raw)
+        offset += len(raw)
+        if not line and (not cleaned or not cleaned[-1]):
+            # Keep at most one blank line as a paragraph break.
+            continue
+        item = _heading_item(line) if line else None
+        if item is not None:
+            candidates.append((len(cleaned), item, clean_position, len(line)))
+        cleaned.append(line)
+        offsets.append(offset - len(raw))
+        clean_position += len(line) + 1
+
+    repeats = Counter(cleaned[number] for number, *_ in candidates)
+    candidates = [candidate for candidate in candidates if repeats[cleaned[candidate[0]]] < _RUNNING_HEADER_REPEATS]
+    starts = _select_headings(candidates, clean_position)
+    if not set(CORE_ITEMS) <= {item for number, item, *_ in candidates if number in starts}:
+        starts = []
+    offsets.append(offset)
+    items = {number: item for number, item, *_ in candidates}
+    bounds = [0] + starts + [len(cleaned)] if not starts or starts[0] > 0 else starts + [len(cleaned)]
+    sections = []
+    for begin, end in zip(bounds, bounds[1:]):
+        if begin in items and begin in starts:
+            item, title = items[begin], ITEM_TITLES[items[begin]]
+        elif starts:
+            item, title = COVER_SECTION, "Cover page and table of contents"
+        else:
+            item, title = UNSECTIONED, "Full filing"
+        text = "\n".join(cleaned[begin:end]).strip()
+        if text or item != COVER_SECTION:
+            sections.append(Section(item, title, offsets[begin] if begin else 0, offsets[end], text))
+    return ParsedFiling(sections, offset, sum(len(section.text) for section in sections))
+
+
+def section_index(parsed: ParsedFiling, *, ticker: str, year: int, sha256: str) -> dict:
+    """Compact, JSON-ready section offset index: [item, start, end] per section."""
+    return {
+        "version": INDEX_VERSION,
+        "ticker": ticker,
+        "year": year,
+        "sha256": sha256,
+        "chars": parsed.raw_chars,
+        "cleanChars": parsed.clean_chars,
+        "sections": [[section.item, section.start, section.end] for section in parsed.sections],
+    }
+
+
+def read_section(path: str | Path, index: dict, item: str) -> str | None:
+    """The original text of one item of a filing, sliced by its section index."""
+    for section_item, start, end in index["sections"]:
+        if section_item == item:
+            with open(path, encoding="utf-8") as file:
+                return file.read(end)[start:]
+    return None
+
+
+def main() -> None:
+    from ingest_pipeline import chunk_filing, chunk_text, discover_local_filings, sha256_text
+
+    parser = argparse.ArgumentParser(description="Write section offset indexes for 10-K text files.")
+    parser.add_argument("--dir", required=True, help="Directory of {TICKER}_{YEAR}_10K.txt files")
+    parser.add_argument("--out", required=True, help="Directory for {TICKER}_{YEAR}_10K.sections.json files")
+    parser.add_argument("--tickers", default=None, help="Comma-separated tickers")
+    parser.add_argument("--stats", action="store_true", help="Also compare chunk counts with the plain splitter")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    out = Path(args.out)
+    out.mkdir(parents=True, exist_ok=True)
+    totals = {"raw_chars": 0, "clean_chars": 0, "plain_chunks": 0, "section_chunks": 0, "without_items": 0}
+    for source in discover_local_filings(args.dir, args.tickers.split(",") if args.tickers else None):
+        text = Path(source.uri).read_text(encoding="utf-8")
+        parsed = parse_filing(text.splitlines(keepends=True))
+        index = section_index(parsed, ticker=source.ticker, year=source.year, sha256=sha256_text(text))
+        (out / f"{Path(source.uri).stem}.sections.json").write_text(json.dumps(index, separators=(",", ":")))
+        totals["raw_chars"] += parsed.raw_chars
+        totals["clean_chars"] += parsed.clean_chars
+        if len(parsed.sections) <= 1:
+            totals["without_items"] += 1
+            logger.warning(f"{source.ticker} {source.year}: items {', '.join(CORE_ITEMS)} not all found; kept unsectioned")
+        if args.stats:
+            totals["plain_chunks"] += len(chunk_text(text))
+            totals["section_chunks"] += len(chunk_filing(text))
+    logger.info(f"Section indexes written to {out}: {totals}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,950 @@
+"""Financial statement facts extracted from 10-K tables, with an in-memory lookup for metric questions.
+
+Questions such as "What was AAPL's revenue in 2025?" are answered by a single
+number in the income statement, balance sheet or cash flow statement of a
+filing. ``extract_facts`` finds those three statements among the tables of a
+converted filing (by the line items they contain, since statement headings are
+inconsistent or missing), reads the fiscal year of every column from the table
+header and the scale from the "(In millions ...)" note, and returns one fact per
+line item and column. Common metrics (revenue, net income, diluted EPS, total
+assets, operating cash flow, ...) are tagged with a concept name.
+
+Index directory layout (one row per fact, written in full on every build)::
+
+    manifest.json           format version, filings (sha256 + rows) and the string tables
+    ticker.npy              uint16 code into manifest "tickers"
+    year.npy                int16 fiscal year of the filing
+    period.npy              int16 fiscal year of the column
+    statement.npy           uint8 code into STATEMENTS
+    concept.npy             int16 code into CONCEPTS, -1 for other line items
+    unit.npy                uint8 code into UNITS
+    scale.npy               int8 power of ten the value is reported in (6 = millions, -1 = not stated)
+    value.npy               float64 value as reported
+    line_item.npy           int32 row into labels.bin
+    labels.bin / label_offsets.npy   distinct line-item labels, UTF-8 back to back
+
+``FinancialFacts`` loads the columns into memory and keeps a dict from
+(ticker, concept, fiscal year) to the fact from the latest filing, so a lookup
+is a dictionary access. Build the index with::
+
+    python financial_facts.py build --dir clean_10k_texts --out facts_index
+    python financial_facts.py lookup --out facts_index --ticker AAPL --concept revenue
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator
+
+import numpy as np
+
+from filing_sections import UNSECTIONED, clean_line, parse_filing
+from local_vector_store import StringColumn, write_strings
+from symbols import normalize_ticker
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = "manifest.json"
+FORMAT_VERSION = 1
+
+STATEMENTS = ("income", "balance", "cash_flow")
+STATEMENT_NAMES = {"income": "income statement", "balance": "balance sheet", "cash_flow": "cash flow statement"}
+UNITS = ("usd", "usd_per_share", "shares")
+_SCALE_WORDS = {3: " thousand", 6: " million", 9: " billion"}
+_SCALES = {"thousands": 3, "millions": 6, "billions": 9}
+_UNKNOWN_SCALE = -1
+# Plausibility bounds checked before a fact answers a question on its own (see FinancialFacts.check).
+_MAX_REVENUE_MULTIPLE = 2.0
+_MAX_NET_INCOME_RATIO = 2.0
+
+
+@dataclass(frozen=True)
+class Concept:
+    """A metric people ask about, the line items that report it and the phrases that name it in a question."""
+
+    name: str
+    statement: str
+    title: str
+    labels: tuple[re.Pattern, ...]
+    phrases: tuple[str, ...]
+    # Reported as an outflow (in parentheses) but asked about as a positive amount.
+    outflow: bool = False
+
+
+def _patterns(*patterns: str) -> tuple[re.Pattern, ...]:
+    return tuple(re.compile(pattern) for pattern in patterns)
+
+
+_NET_INCOME = r"net (?:\((?:loss|income|earnings)\) )?(?:income|earnings|loss)(?: \((?:loss|income|earnings)\))?"
+_PER_SHARE = r"(?:per (?:common |ordinary )?share|\beps\b)"
+
+# Line-item patterns are matched against normalized labels (lower case, no apostrophes or
+# footnote markers) in priority order; the first pattern that matches a row wins.
+CONCEPTS = (
+    Concept(
+        "revenue",
+        "income",
+        "revenue",
+        _patterns(
+            r"^total (?:net |operating )*(?:revenues?|sales|sales and (?:other )?(?:operating )?revenues?)(?:,? net)?$",
+            r"^(?:total )?(?:net )?revenues?,? net of interest expense$",
+            r"^(?:net )?(?:operating )?(?:revenues?|sales)(?:,? net)?$",
+            r"^(?:net )?sales and (?:other )?operating revenues?$",
+            r"^sales to customers$",
+            r"^total (?:net )?revenues? and other income$",
+        ),
+        ("revenue", "revenues", "sales", "net sales", "total revenue", "total revenues", "total net sales",
+         "net revenue", "net revenues", "top line", "turnover"),
+    ),
+    Concept(
+        "gross_profit",
+        "income",
+        "gross profit",
+        _patterns(r"^(?:total )?gross (?:profit|margin)$"),
+        ("gross profit", "gross margin"),
+    ),
+    Concept(
+        "operating_income",
+        "income",
+        "operating income",
+        _patterns(
+            r"^(?:total )?operating (?:income|profit|earnings)(?: \(loss\))?$",
+            r"^(?:income|earnings|profit)(?: \(loss\))? from operations$",
+            r"^operating \(loss\) income$",
+        ),
+        ("operating income", "operating profit", "operating earnings", "income from operations"),
+    ),
+    Concept(
+        "research_development",
+        "income",
+        "research and development expense",
+        _patterns(r"^research,? and development(?: expenses?| costs?)?$"),
+        ("research and development", "r&d"),
+    ),
+    Concept(
+        "income_tax",
+        "income",
+        "income tax expense",
+        _patterns(
+            r"^(?:\(benefit\) )?provision (?:\(benefit\) )?for (?:\(benefit from\) )?(?:income )?taxes(?: on income)?$",
+            r"^income tax(?:es)? (?:expense|provision)(?: \(benefit\))?$",
+            r"^(?:provision for|benefit from) income taxes$",
+        ),
+        ("income tax expense", "income taxes", "income tax", "tax expense", "provision for income taxes",
+         "tax provision"),
+    ),
+    Concept(
+        "net_income",
+        "income",
+        "net income",
+        _patterns(
+            rf"^{_NET_INCOME} attributable to (?!.*(?:non-?controlling|minority|redeemable)).+$",
+            rf"^{_NET_INCOME}$",
+            # "Citigroup's net income", with the apostrophe normalized away.
+            rf"^[a-z0-9.&-]+s {_NET_INCOME}$",
+            r"^profit(?: \(loss\))?(?: attributable to common (?:stock|share)holders)?$",
+        ),
+        ("net income", "net earnings", "net profit", "net loss", "profit", "earnings", "bottom line"),
+    ),
+    Concept(
+        "eps_diluted",
+        "income",
+        "diluted earnings per share",
+        _patterns(
+            rf"^(?!.*(?:continuing|discontinued))(?=.*\bdiluted\b)(?=.*{_PER_SHARE}).*$",
+            rf"^(?=.*\bdiluted\b)(?=.*{_PER_SHARE}).*$",
+            # "Diluted: Net income" in a table of per-share amounts.
+            rf"^diluted: {_NET_INCOME}$",
+        ),
+        ("diluted eps", "diluted earnings per share", "eps", "earnings per share", "diluted earnings"),
+    ),
+    Concept(
+        "eps_basic",
+        "income",
+        "basic earnings per share",
+        _patterns(
+            rf"^(?!.*(?:continuing|discontinued))(?=.*\bbasic\b)(?=.*{_PER_SHARE}).*$",
+            rf"^(?=.*\bbasic\b)(?=.*{_PER_SHARE}).*$",
+            rf"^basic: {_NET_INCOME}$",
+        ),
+        ("basic eps", "basic earnings per share", "basic earnings"),
+    ),
+    Concept(
+        "cash",
+        "balance",
+        "cash and cash equivalents",
+        _patterns(r"^(?:total )?cash and (?:cash )?equivalents$"),
+        ("cash and cash equivalents", "cash and equivalents", "cash balance", "cash on hand", "cash"),
+    ),
+    Concept(
+        "total_assets",
+        "balance",
+        "total assets",
+        _patterns(r"^total assets$"),
+        ("total assets", "assets"),
+    ),
+    Concept(
+        "total_liabilities",
+        "balance",
+        "total liabilities",
+        _patterns(r"^total liabilities$"),
+        ("total liabilities", "liabilities"),
+    ),
+    Concept(
+        "shareholders_equity",
+        "balance",
+        "shareholders' equity",
+        _patterns(
+            r"^total (?:stockholders|shareholders|shareowners|share owners) equity(?: \(deficit\))?$",
+            r"^total (?!liabilities).+ (?:stockholders|shareholders|shareowners) equity(?: \(deficit\))?$",
+            r"^total equity(?: \(deficit\))?$",
+        ),
+        ("shareholders equity", "stockholders equity", "shareowners equity", "total equity", "book value"),
+    ),
+    Concept(
+        "operating_cash_flow",
+        "cash_flow",
+        "operating cash flow",
+        _patterns(
+            r"^(?!.*discontinued)(?:net |total )?cash (?:flows? )?(?:provided|generated|from|\(used|used)[a-z()/, ]*operating activities(?: of continuing operations)?$",
+        ),
+        ("operating cash flow", "cash flow from operations", "cash flows from operations", "cash from operations",
+         "cash flow from operating activities", "cash from operating activities", "cash generated by operations"),
+    ),
+    Concept(
+        "capex",
+        "cash_flow",
+        "capital expenditures",
+        _patterns(
+            r"^capital expenditures.*$",
+            r"^(?:payments for (?:acquisition of )?|purchases? of |additions to |acquisitions? of |expenditures for )property,? (?:plant )?(?:and )?equipment.*$",
+        ),
+        ("capex", "capital expenditures", "capital expenditure", "capital spending"),
+        outflow=True,
+    ),
+)
+CONCEPTS_BY_NAME = {concept.name: concept for concept in CONCEPTS}
+_CONCEPT_CODES = {concept.name: code for code, concept in enumerate(CONCEPTS)}
+
+# Number cells: "416,161", "$(2,007)", "(321)", "7.46", "—" (nil).
+_NUMBER_RE = re.compile(r"^\$?\s*(\()?\s*\$?\s*(-)?\s*(\d[\d,]*(?:\.\d+)?|\.\d+)\s*(\))?$")
+_NIL_CELLS = {"—", "–", "-", "$—", "$–", "$-", "— ", "$ —"}
+_YEAR_RE = re.compile(r"(?<![\d,.$])((?:19[89]|20\d)\d)(?![\d,]|\.\d)")
+_BARE_YEAR_RE = re.compile(r"^(?:19[89]|20\d)\d$")
+_SEPARATOR_RE = re.compile(r"^\s*-{3,}(?:\s*\|\s*-{3,})+\s*\|?\s*$")
+_SCALE_RE = re.compile(r"\b(thousands|millions|billions)\b", re.IGNORECASE)
+_SHARE_SCALE_RE = re.compile(
+    r"shares?\b[^.;]{0,60}?\bin (thousands|millions)|(thousands|millions) of shares", re.IGNORECASE
+)
+_FOOTNOTE_RE = re.compile(r"\s*(?:\(notes? \d+[a-z]?\)|\((?:\d{1,2}|[a-z])\)|\[\d{1,2}\]|\*+|(?<=[a-z)])\s?\d(?:,\s?\d)*)\s*$")
+_SHARES_UNIT_RE = re.compile(r"^(?:weighted|average|shares|number of|basic shares|diluted shares)|shares outstanding")
+_PER_SHARE_RE = re.compile(_PER_SHARE)
+# Groups of per-share amounts ("Earnings per share:", "Diluted:"); amounts in them are never totals in dollars.
+_PER_SHARE_GROUP_RE = re.compile(rf"{_PER_SHARE}|^(?:basic|diluted)$|^basic and diluted$|^diluted and basic$")
+# Groups a statement's own line items sit in. Any other group (a segment, a note's sub-table)
+# means a "Total assets" or "Revenues" row is not the company's.
+_STATEMENT_GROUP_RE = re.compile(
+    r"^(?:"
+    r".*statements? of .*|.*balance sheets?|.*(?:thousands|millions|billions) of dollars.*|.*in (?:thousands|millions).*|"
+    r"[^(]*\)|"  # the tail of a header note cut at its line break: "share amounts)"
+    r"(?:net |total )?(?:revenues?|sales)(?: and (?:other )?(?:operating )?revenues?)?|net sales and revenues|"
+    r"(?:operating |total )?(?:costs?|expenses)(?: and expenses)?(?: \(\d\)\(\d\))?|operating expenses.*|"
+    r"other \(?(?:income|expense).*|interest and other.*|non-?operating.*|"
+    r"assets|current assets|(?:current )?liabilities.*|.*equity.*|"
+    r"(?:commitments and contingencies|contingencies and commitments).*|"
+    r".*(?:operating|investing|financing) activities.*|operating|investing|financing|"
+    r"adjustments.*|changes? in(?: .*)?|working capital.*"
+    r")$"
+)
+_PARENT_ONLY_RE = re.compile(r"parent company|registrant|\(parent\)")
+_STATEMENT_TITLES = {
+    "income": re.compile(r"statements? of (?:consolidated )?(?:income|operations|earnings)"),
+    "balance": re.compile(r"balance sheets?|statements? of (?:consolidated )?financial (?:condition|position)"),
+    "cash_flow": re.compile(r"statements? of (?:consolidated )?cash flows?"),
+}
+# Section priority for the primary statements: Item 8, then the F-pages after Items 15/16.
+_SECTION_PRIORITY = {"8": 0, "15": 1, "16": 1, UNSECTIONED: 1, "6": 3, "7": 3, "7A": 3}
+_CONTEXT_LINES = 6
+# Header cells that describe the columns rather than start a group of line items.
+_HEADER_TEXT_RE = re.compile(
+    r"\b(?:years?|months|weeks|ended|ending|as of|fiscal|in (?:millions|thousands|billions)|except|"
+    r"january|february|march|april|may|june|july|august|september|october|november|december)\b",
+    re.IGNORECASE,
+)
+
+
+def _parse_number(cell: str) -> float | None:
+    """The value of a number cell (parentheses are negative, a dash is zero); None for anything else."""
+    cell = cell.strip()
+    if cell in _NIL_CELLS:
+        return 0.0
+    match = _NUMBER_RE.match(cell)
+    if not match:
+        return None
+    value = float(match.group(3).replace(",", ""))
+    return -value if match.group(1) or match.group(2) else value
+
+
+def normalize_label(label: str) -> str:
+    """Line-item label for matching: lower case, '&' as 'and', no apostrophes, footnote markers or colons."""
+    label = label.replace("’", "'").replace("'", "").replace("\\", "").replace("&", " and ").replace("/", " ")
+    label = _FOOTNOTE_RE.sub("", label.lower().strip("*_ :"))
+    return " ".join(label.rstrip(":").split())
+
+
+@dataclass
+class _Row:
+    label: str
+    line_item: str
+    values: list[float]
+
+
+@dataclass
+class _Table:
+    start: int
+    context: str
+    periods: list[int]
+    rows: list[_Row]
+    scale: int
+    share_scale: int
+
+
+def _parse_table(body: list[str], context: list[str], start: int) -> _Table | None:
+    header: list[str] = []
+    rows: list[_Row] = []
+    # Label of the group the following rows belong to ("Earnings per share:" for "Basic" and "Diluted");
+    # consecutive group labels nest.
+    parent = ""
+    parent_open = False
+    group_rows = 0
+    for raw in body:
+        line = clean_line(raw)
+        if not line:
+            parent = ""
+            parent_open = False
+            continue
+        cells = [cell.strip("*_ ") for cell in line.split(" | ")]
+        label = cells[0]
+        values = [_parse_number(cell) for cell in cells[1:]]
+        is_data = (
+            _parse_number(cells[0]) is None
+            and bool(values)
+            and None not in values
+            and not all(_BARE_YEAR_RE.match(cell) for cell in cells[1:])
+        )
+        if not is_data:
+            if not rows and (len(cells) > 1 or _HEADER_TEXT_RE.search(label) or _YEAR_RE.search(label)):
+                header.append(line)
+            elif len(cells) == 1 and _parse_number(label) is None:
+                label = label.rstrip(":").strip()
+                parent = f"{parent}: {label}" if parent_open and parent else label
+                parent_open = True
+                group_rows = 0
+            continue
+        parent_open = False
+        group_rows += 1
+        words = set(normalize_label(label).split())
+        parent_words = set(normalize_label(parent).split())
+        qualified = parent and not words & parent_words
+        rows.append(_Row(label, f"{parent}: {label}" if qualified else label, values))
+        subtotal = ("total", "net ") if group_rows > 1 else ("total",)
+        if words & parent_words and normalize_label(label).startswith(subtotal):
+            # A subtotal of the group closes it ("Impairment losses:" ... "Net impairment losses").
+            parent = ""
+    context_text = "\n".join(context)
+    header_text = "\n".join(header)
+    periods = [int(year) for year in _YEAR_RE.findall(header_text)]
+    if not periods:
+        periods = [int(year) for year in _YEAR_RE.findall(context[-1] if context else "")]
+    periods = list(dict.fromkeys(periods))
+    # Rows with another number of values belong to other column groups (quarters, segments).
+    rows = [row for row in rows if len(row.values) == len(periods)]
+    if not rows:
+        return None
+    scale_match = _SCALE_RE.search(header_text) or _SCALE_RE.search(context_text)
+    scale = _SCALES[scale_match.group(1).lower()] if scale_match else _UNKNOWN_SCALE
+    share_match = _SHARE_SCALE_RE.search(header_text) or _SHARE_SCALE_RE.search(context_text)
+    share_scale = _SCALES[(share_match.group(1) or share_match.group(2)).lower()] if share_match else scale
+    return _Table(start, context_text, periods, rows, scale, share_scale)
+
+
+def _tables(lines: list[str]) -> Iterator[tuple[int, _Table]]:
+    """(character offset, table) for every pipe table with a header of fiscal years."""
+    offsets = np.zeros(len(lines) + 1, dtype=np.int64)
+    np.cumsum([len(line) for line in lines], out=offsets[1:])
+    position = 0
+    while position < len(lines):
+        if not _SEPARATOR_RE.match(lines[position]):
+            position += 1
+            continue
+        end = position + 1
+        while end < len(lines):
+            if lines[end].strip():
+                end += 1
+                continue
+            # Blank lines inside a table are spacers unless the next table starts after them.
+            following = end + 1
+            while following < len(lines) and not lines[following].strip():
+                following += 1
+            if (
+                following >= len(lines)
+                or "|" not in lines[following]
+                or (following + 1 < len(lines) and _SEPARATOR_RE.match(lines[following + 1]))
+            ):
+                break
+            end = following
+        context = []
+        cursor = position - 2
+        while cursor >= 0 and len(context) < _CONTEXT_LINES and not _SEPARATOR_RE.match(lines[cursor]):
+            text = clean_line(lines[cursor])
+            if text.count(" | ") > 1:
+                break
+            if text:
+                context.append(text)
+            cursor -= 1
+        # The line above the separator is the table's first (header) row.
+        body = lines[max(position - 1, 0):position] + lines[position + 1:end]
+        table = _parse_table(body, context[::-1], int(offsets[position]))
+        if table is not None:
+            yield table.start, table
+        position = end
+
+
+def _match_label(row: _Row) -> str:
+    """Normalized label to match concepts on; a bare "Total" is named after its group ("Total revenues")."""
+    label = normalize_label(row.label)
+    if label in ("total", "total, net") and ": " in row.line_item:
+        return f"total {normalize_label(row.line_item.rsplit(': ', 2)[-2])}"
+    return label
+
+
+def _classify(table: _Table) -> tuple[str, int] | None:
+    """
+    Which primary statement a table is, judged by its line items, and 0 for a
+    complete statement or 1 for a partial one (net income and EPS without
+    revenue, as in an earnings-per-share note); None for any other table.
+    """
+    labels = {_match_label(row) for row in table.rows}
+    text = "\n".join(labels)
+    if "total assets" in labels and re.search(r"^total (?:liabilities|.*equity)", text, re.MULTILINE):
+        return "balance", 0
+    if re.search(r"operating activities", text) and re.search(r"investing activities", text):
+        return "cash_flow", 0
+    if "comprehensive" in table.context.lower()[-200:]:
+        return None
+    if not any(pattern.match(label) for pattern in CONCEPTS_BY_NAME["net_income"].labels for label in labels):
+        return None
+    if any(pattern.match(label) for pattern in CONCEPTS_BY_NAME["revenue"].labels for label in labels):
+        return "income", 0
+    if any(_PER_SHARE_RE.search(normalize_label(row.line_item)) for row in table.rows):
+        return "income", 1
+    return None
+
+
+def _groups(line_item: str) -> list[str]:
+    """The normalized group labels a line item sits under, outermost first."""
+    return [normalize_label(group) for group in line_item.split(": ")[:-1]]
+
+
+def _unit(line_item: str) -> str:
+    normalized = normalize_label(line_item)
+    if _SHARES_UNIT_RE.search(normalized) or re.search(r"\bshares\b.*: (?:basic|diluted)$", normalized):
+        return "shares"
+    if _PER_SHARE_RE.search(normalized):
+        return "usd_per_share"
+    if re.search(r"income|earnings|loss", normalized.rsplit(": ", 1)[-1]) and any(
+        _PER_SHARE_GROUP_RE.search(group) for group in _groups(line_item)
+    ):
+        # "Diluted: Net income" under "Earnings per share:"
+        return "usd_per_share"
+    return "usd"
+
+
+def _concept_candidate(concept: Concept, row: _Row) -> bool:
+    """Whether a row may report ``concept`` at all, whatever its label: the right unit, and the company's own line item."""
+    if re.search(r"dividend|numerator|denominator", normalize_label(row.line_item)):
+        return False
+    per_share = concept.name.startswith("eps")
+    if (_unit(row.line_item) == "usd_per_share") != per_share:
+        return False
+    # Per-share amounts are grouped under the income they divide ("Net income attributable to ...: Diluted").
+    return per_share or all(_STATEMENT_GROUP_RE.match(group) for group in _groups(row.line_item))
+
+
+@dataclass(frozen=True)
+class FactRow:
+    """One extracted fact, before it is encoded into the index columns."""
+
+    period: int
+    statement: str
+    concept: str | None
+    line_item: str
+    value: float
+    unit: str
+    scale: int
+
+
+def _concept_rows(statement: str, rows: list[_Row]) -> dict[int, str]:
+    """Row index -> concept name, the first row matching each concept's patterns in priority order."""
+    assigned: dict[int, str] = {}
+    for concept in CONCEPTS:
+        if concept.statement != statement:
+            continue
+        for pattern in concept.labels:
+            match = next(
+                (
+                    i for i, row in enumerate(rows)
+                    if i not in assigned
+                    and pattern.match(normalize_label(row.line_item) if concept.name.startswith("eps") else _match_label(row))
+                    and _concept_candidate(concept, row)
+                ),
+                None,
+            )
+            if match is not None:
+                assigned[match] = concept.name
+                break
+    return assigned
+
+
+def extract_facts(text: str) -> list[FactRow]:
+    """Facts from the income statement, balance sheet and cash flow statement of one converted 10-K."""
+    lines = text.splitlines(keepends=True)
+    parsed = parse_filing(lines)
+    boundaries = [(section.start, section.item) for section in parsed.sections]
+
+    def priority(offset: int) -> int:
+        item = UNSECTIONED
+        for start, section_item in boundaries:
+            if start > offset:
+                break
+            item = section_item
+        return _SECTION_PRIORITY.get(item, 2)
+
+    # Per statement: the best (section priority, completeness) seen, and its table plus continuations.
+    chosen: dict[str, tuple[tuple[int, int, int], list[_Table]]] = {}
+    previous: tuple[str, _Table] | None = None
+    for offset, table in _tables(lines):
+        classified = _classify(table)
+        if classified is None:
+            # "Consolidated Balance Sheets (Continued)" carries on the table before it.
+            if previous and "(continued)" in table.context.lower() and previous[1].periods == table.periods:
+                statement, last = previous
+                if chosen[statement][1][-1] is last:
+                    chosen[statement][1].append(table)
+                    previous = (statement, table)
+            continue
+        statement, partial = classified
+        # Within a section, the statement itself beats summaries of it (selected financial data),
+        # and both beat the registrant-only statements of a holding company.
+        context = table.context.lower().splitlines()
+        # Headings only: notes mention "the consolidated statements of income" in their prose.
+        titles = [i for i, line in enumerate(context) if len(line) < 100 and _STATEMENT_TITLES[statement].search(line)]
+        if not titles:
+            title_rank = 1
+        else:
+            heading = " ".join(context[max(titles[-1] - 1, 0):titles[-1] + 1])
+            title_rank = 2 if _PARENT_ONLY_RE.search(heading) else 0
+        key = (priority(offset), partial, title_rank)
+        if statement not in chosen or key < chosen[statement][0]:
+            chosen[statement] = (key, [table])
+        previous = (statement, table)
+
+    facts: list[FactRow] = []
+    for statement, (_, tables) in chosen.items():
+        rows = [(row, table) for table in tables for row in table.rows]
+        concepts = _concept_rows(statement, [row for row, _ in rows])
+        for i, (row, table) in enumerate(rows):
+            unit = _unit(row.line_item)
+            scale = 0 if unit == "usd_per_share" else table.share_scale if unit == "shares" else table.scale
+            for period, value in zip(table.periods, row.values):
+                facts.append(FactRow(period, statement, concepts.get(i), row.line_item, value, unit, scale))
+    return facts
+
+
+@dataclass(frozen=True)
+class Fact:
+    """A fact read back from the index."""
+
+    ticker: str
+    year: int
+    period: int
+    statement: str
+    concept: str | None
+    line_item: str
+    value: float
+    unit: str
+    scale: int
+
+    def format_value(self, absolute: bool = False) -> str:
+        value = abs(self.value) if absolute else self.value
+        number = f"{abs(value):,.2f}".rstrip("0").rstrip(".")
+        sign = "-" if value < 0 else ""
+        if self.unit == "usd_per_share":
+            return f"{sign}${number} per share"
+        if self.unit == "shares":
+            return f"{sign}{number}{_SCALE_WORDS.get(self.scale, '')} shares"
+        if self.scale == _UNKNOWN_SCALE:
+            return f"{sign}${number} (units as reported)"
+        return f"{sign}${number}{_SCALE_WORDS.get(self.scale, '')}"
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "ticker": self.ticker,
+            "year": self.year,
+            "period": self.period,
+            "statement": self.statement,
+            "concept": self.concept,
+            "lineItem": self.line_item,
+            "value": self.value,
+            "unit": self.unit,
+            "scale": self.scale,
+        }
+
+
+# ---------------------------------------------
+# Question parsing
+# ---------------------------------------------
+@dataclass(frozen=True)
+class MetricQuestion:
+    concept: Concept
+    years: tuple[int, ...]
+
+
+_QUESTION_TOKEN_RE = re.compile(r"[a-z0-9&$%]+")
+_FISCAL_YEAR_RE = re.compile(r"^fy(\d{2}|\d{4})$")
+# Words that may surround a metric lookup without changing what is asked.
+_FILLER_WORDS = {
+    "a", "according", "amount", "an", "and", "annual", "as", "at", "company", "did", "do", "does", "during",
+    "end", "expense", "expenses", "figure", "filing", "fiscal", "for", "from", "full", "fy", "give", "had", "has",
+    "have", "held", "hold", "how", "in", "is", "it", "its", "last", "latest", "me", "most", "much", "of", "on",
+    "please", "recent", "report", "reported", "reports", "show", "spend", "spending", "tell", "the", "their", "to",
+    "total", "us", "value", "was", "were", "what", "whats", "year", "10k",
+}
+_PHRASES = sorted(
+    ((tuple(_QUESTION_TOKEN_RE.findall(phrase)), concept) for concept in CONCEPTS for phrase in concept.phrases),
+    key=lambda item: -len(item[0]),
+)
+_MAX_PHRASE_WORDS = max(len(words) for words, _ in _PHRASES)
+_PHRASE_INDEX = {words: concept for words, concept in _PHRASES}
+
+
+def _question_tokens(question: str) -> list[str]:
+    text = question.lower().replace("’", "'").replace("10-k", "10k")
+    text = re.sub(r"'s\b", "", text).replace("'", "")
+    return [token.lstrip("$") or token for token in _QUESTION_TOKEN_RE.findall(text)]
+
+
+def parse_metric_question(question: str, ignore_words: Iterable[str] = ()) -> MetricQuestion | None:
+    """
+    The metric and fiscal years a question asks for, or None unless the question
+    is nothing but a metric lookup ("What was AAPL's revenue in fiscal 2024?").
+
+    ``ignore_words`` are the company and ticker words already recognized in the
+    question. Any other word outside a short list of filler words means the
+    question asks for more than one number (a trend, an explanation, a
+    segment), and it is left to retrieval.
+    """
+    ignore = set(ignore_words) | _FILLER_WORDS
+    tokens = _question_tokens(question)
+    concepts: set[Concept] = set()
+    years: list[int] = []
+    position = 0
+    while position < len(tokens):
+        token = tokens[position]
+        for size in range(min(_MAX_PHRASE_WORDS, len(tokens) - position), 0, -1):
+            concept = _PHRASE_INDEX.get(tuple(tokens[position:position + size]))
+            if concept is not None:
+                concepts.add(concept)
+                position += size
+                break
+        else:
+            fiscal = _FISCAL_YEAR_RE.match(token)
+            if _BARE_YEAR_RE.match(token):
+                years.append(int(token))
+            elif fiscal:
+                years.append(int(fiscal.group(1)) + (2000 if len(fiscal.group(1)) == 2 else 0))
+            elif token not in ignore:
+                return None
+            position += 1
+    if len(concepts) != 1:
+        return None
+    return MetricQuestion(concepts.pop(), tuple(dict.fromkeys(years)))
+
+
+# ---------------------------------------------
+# Index
+# ---------------------------------------------
+_COLUMN_TYPES = {
+    "ticker": np.uint16,
+    "year": np.int16,
+    "period": np.int16,
+    "statement": np.uint8,
+    "concept": np.int16,
+    "unit": np.uint8,
+    "scale": np.int8,
+    "value": np.float64,
+    "line_item": np.int32,
+}
+
+
+def build_facts_index(
+    path: str | Path,
+    sources: Iterable[Any],
+    *,
+    read: Callable[[str], str] | None = None,
+) -> FinancialFacts:
+    """Extract the facts of every filing and write the index from scratch."""
+    from ingest_pipeline import make_reader, sha256_text
+
+    read = read or make_reader()
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    tickers: dict[str, int] = {}
+    labels: dict[str, int] = {}
+    columns: dict[str, list] = {name: [] for name in _COLUMN_TYPES}
+    files: dict[str, dict] = {}
+
+    for source in sources:
+        text = read(source.uri)
+        ticker = normalize_ticker(source.ticker)
+        facts = extract_facts(text)
+        files[f"{ticker}_{source.year}"] = {"sha256": sha256_text(text), "rows": len(facts)}
+        if not facts:
+            logger.warning(f"{ticker} {source.year}: no financial statements found")
+        found = {fact.statement for fact in facts}
+        for statement in STATEMENTS:
+            if statement not in found and facts:
+                logger.info(f"{ticker} {source.year}: no {STATEMENT_NAMES[statement]} found")
+        for fact in facts:
+            columns["ticker"].append(tickers.setdefault(ticker, len(tickers)))
+            columns["year"].append(source.year)
+            columns["period"].append(fact.period)
+            columns["statement"].append(STATEMENTS.index(fact.statement))
+            columns["concept"].append(_CONCEPT_CODES[fact.concept] if fact.concept else -1)
+            columns["unit"].append(UNITS.index(fact.unit))
+            columns["scale"].append(fact.scale)
+            columns["value"].append(fact.value)
+            columns["line_item"].append(labels.setdefault(fact.line_item, len(labels)))
+
+    for name, dtype in _COLUMN_TYPES.items():
+        np.save(path / f"{name}.npy", np.array(columns[name], dtype=dtype))
+    write_strings(path / "labels.bin", path / "label_offsets.npy", list(labels))
+    manifest = {
+        "version": FORMAT_VERSION,
+        "tickers": list(tickers),
+        "statements": list(STATEMENTS),
+        "concepts": [concept.name for concept in CONCEPTS],
+        "units": list(UNITS),
+        "files": files,
+    }
+    (path / MANIFEST_FILE).write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    logger.info(f"Wrote {len(columns['value'])} facts from {len(files)} filings to {path}")
+    return FinancialFacts.open(path)
+
+
+class FinancialFacts:
+    """
+    The facts index held in memory, with a (ticker, concept, fiscal year) lookup.
+
+    A fiscal year reported by several filings (each 10-K repeats the prior years)
+    resolves to the latest filing, which carries any restatement.
+
+    ``answer`` only serves facts that pass ``check``: a stated scale, and agreement
+    with the other figures of the same filing (net income within a multiple of
+    revenue and matching the cash flow statement, balance sheet items within
+    total assets, diluted EPS not above basic EPS).
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.manifest = json.loads((self.path / MANIFEST_FILE).read_text(encoding="utf-8"))
+        if self.manifest.get("version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported facts index version {self.manifest.get('version')} in {self.path}")
+        self.columns = {name: np.load(self.path / f"{name}.npy") for name in _COLUMN_TYPES}
+        labels = StringColumn(self.path / "labels.bin", self.path / "label_offsets.npy")
+        self.labels = [labels[i] for i in range(len(labels.offsets) - 1)]
+        self.tickers: list[str] = self.manifest["tickers"]
+        self.concepts: list[str] = self.manifest["concepts"]
+        self._rows: dict[tuple[str, str, int], int] = {}
+        self._latest: dict[tuple[str, str], int] = {}
+        # (ticker code, filing year, concept, period) -> row, for checks within one filing.
+        self._filing_rows: dict[tuple[int, int, str, int], int] = {}
+        years = self.columns["year"]
+        for row in np.flatnonzero(self.columns["concept"] >= 0):
+            ticker = self.tickers[self.columns["ticker"][row]]
+            concept = self.concepts[self.columns["concept"][row]]
+            period = int(self.columns["period"][row])
+            key = (ticker, concept, period)
+            current = self._rows.get(key)
+            if current is None or years[row] > years[current]:
+                self._rows[key] = int(row)
+            if period > self._latest.get((ticker, concept), 0):
+                self._latest[(ticker, concept)] = period
+            self._filing_rows.setdefault((int(self.columns["ticker"][row]), int(years[row]), concept, period), int(row))
+        # The net income a cash flow statement starts from, per (ticker code, filing year, period).
+        net_income = CONCEPTS_BY_NAME["net_income"].labels
+        cash_flow = STATEMENTS.index("cash_flow")
+        for row in np.flatnonzero((self.columns["concept"] < 0) & (self.columns["statement"] == cash_flow)):
+            label = normalize_label(self.labels[self.columns["line_item"][row]].rsplit(": ", 1)[-1])
+            if any(pattern.match(label) for pattern in net_income):
+                period = int(self.columns["period"][row])
+                key = (int(self.columns["ticker"][row]), int(years[row]), "cash_flow_net_income", period)
+                self._filing_rows.setdefault(key, int(row))
+        self.stats = {"lookups": 0, "hits": 0, "misses": 0, "implausible": 0}
+
+    @classmethod
+    def open(cls, path: str | Path) -> FinancialFacts:
+        if not (Path(path) / MANIFEST_FILE).exists():
+            raise FileNotFoundError(f"No facts index at {path}")
+        return cls(path)
+
+    def _fact(self, row: int) -> Fact:
+        columns = self.columns
+        concept = int(columns["concept"][row])
+        return Fact(
+            ticker=self.tickers[columns["ticker"][row]],
+            year=int(columns["year"][row]),
+            period=int(columns["period"][row]),
+            statement=STATEMENTS[columns["statement"][row]],
+            concept=self.concepts[concept] if concept >= 0 else None,
+            line_item=self.labels[columns["line_item"][row]],
+            value=float(columns["value"][row]),
+            unit=UNITS[columns["unit"][row]],
+            scale=int(columns["scale"][row]),
+        )
+
+    def _amount(self, row: int) -> float:
+        return float(self.columns["value"][row]) * 10.0 ** max(int(self.columns["scale"][row]), 0)
+
+    def _related(self, row: int, concept: str) -> int | None:
+        """Row of ``concept`` for the same period in the same filing as ``row``."""
+        columns = self.columns
+        return self._filing_rows.get(
+            (int(columns["ticker"][row]), int(columns["year"][row]), concept, int(columns["period"][row]))
+        )
+
+    def check(self, row: int) -> bool:
+        """Whether the fact in ``row`` is safe to state without retrieval: a known scale, consistent with its filing."""
+        columns = self.columns
+        concept = self.concepts[columns["concept"][row]]
+        unit = UNITS[columns["unit"][row]]
+        if unit != "usd_per_share" and int(columns["scale"][row]) == _UNKNOWN_SCALE:
+            return False
+        if unit == "usd_per_share":
+            # Diluted EPS never exceeds basic EPS in size.
+            basic = self._related(row, "eps_basic")
+            diluted = self._related(row, "eps_diluted")
+            if basic is None or diluted is None:
+                return True
+            return abs(columns["value"][diluted]) <= abs(columns["value"][basic]) * 1.05 + 0.01
+        amount = abs(self._amount(row))
+        statement = STATEMENTS[columns["statement"][row]]
+        if statement == "balance":
+            # Liabilities can exceed assets (negative equity); cash and equity cannot.
+            assets = self._related(row, "total_assets")
+            if assets is None or concept not in ("cash", "shareholders_equity"):
+                return True
+            return amount <= abs(self._amount(assets)) * 1.001
+        if concept == "revenue" or concept == "operating_cash_flow":
+            return True
+        revenue = self._related(row, "revenue")
+        if revenue is not None and amount > abs(self._amount(revenue)) * _MAX_REVENUE_MULTIPLE:
+            return False
+        if concept == "net_income":
+            reported = self._related(row, "cash_flow_net_income")
+            if reported is not None and amount:
+                other = self._amount(reported)
+                same_sign = (other >= 0) == (self._amount(row) >= 0)
+                if not same_sign or not 1 / _MAX_NET_INCOME_RATIO <= abs(other) / amount <= _MAX_NET_INCOME_RATIO:
+                    return False
+        return True
+
+    def lookup(self, ticker: str, concept: str, period: int | None = None) -> Fact | None:
+        """The fact for a concept in one fiscal year (the latest reported year when ``period`` is None)."""
+        ticker = normalize_ticker(ticker)
+        self.stats["lookups"] += 1
+        if period is None:
+            period = self._latest.get((ticker, concept))
+        row = self._rows.get((ticker, concept, period)) if period is not None else None
+        if row is None:
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        return self._fact(row)
+
+    def answer(self, question: MetricQuestion, ticker: str) -> tuple[str, list[Fact]] | None:
+        """A one-sentence answer and the facts behind it, or None if any requested year is missing."""
+        concept = question.concept
+        facts = []
+        for period in question.years or (None,):
+            fact = self.lookup(ticker, concept.name, period)
+            if fact is None:
+                return None
+            if not self.check(self._rows[(fact.ticker, concept.name, fact.period)]):
+                self.stats["implausible"] += 1
+                logger.info(f"Facts index: {fact.ticker} {concept.name} FY{fact.period} fails its checks, using retrieval")
+                return None
+            facts.append(fact)
+
+        when = "at the end of fiscal" if concept.statement == "balance" else "for fiscal"
+        amounts = " and ".join(f"{fact.format_value(concept.outflow)} {when} {fact.period}" for fact in facts)
+        filings = ", ".join(f"FY{year}" for year in sorted({fact.year for fact in facts}, reverse=True))
+        items = ", ".join(dict.fromkeys(f"“{fact.line_item}”" for fact in facts))
+        text = (
+            f"{facts[0].ticker} reported {concept.title} of {amounts}. "
+            f"Source: {items} in the {STATEMENT_NAMES[concept.statement]} of the {filings} 10-K."
+        )
+        return text, facts
+
+    def snapshot_stats(self) -> dict[str, Any]:
+        lookups = self.stats["lookups"]
+        return {
+            **self.stats,
+            "facts": int(len(self.columns["value"])),
+            "indexed": len(self._rows),
+            "filings": len(self.manifest["files"]),
+            "tickers": len(self.tickers),
+            "hit_rate": round(self.stats["hits"] / lookups, 4) if lookups else 0.0,
+        }
+
+
+def main() -> None:
+    from ingest_pipeline import discover_local_filings
+
+    parser = argparse.ArgumentParser(description="Build or query the financial facts index for the RAG API.")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    build = subcommands.add_parser("build", help="Extract statement facts from every filing")
+    build.add_argument("--dir", required=True, help="Directory of {TICKER}_{YEAR}_10K.txt files")
+    build.add_argument("--out", default="facts_index", help="Index directory")
+    build.add_argument("--tickers", default=None, help="Comma-separated tickers to index")
+
+    lookup = subcommands.add_parser("lookup", help="Print the facts of one company")
+    lookup.add_argument("--out", default="facts_index", help="Index directory")
+    lookup.add_argument("--ticker", required=True)
+    lookup.add_argument("--concept", default=None, choices=sorted(CONCEPTS_BY_NAME))
+    lookup.add_argument("--period", type=int, default=None)
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.command == "build":
+        tickers = args.tickers.split(",") if args.tickers else None
+        index = build_facts_index(args.out, discover_local_filings(args.dir, tickers))
+        logger.info(f"Facts index: {index.snapshot_stats()}")
+        return
+
+    index = FinancialFacts.open(args.out)
+    for concept in [args.concept] if args.concept else sorted(CONCEPTS_BY_NAME):
+        fact = index.lookup(args.ticker, concept, args.period)
+        if fact is not None:
+            print(f"{concept:22} FY{fact.period} {fact.format_value():>28}  {fact.line_item} ({fact.year} 10-K)")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,9 +6,11 @@ import base64
 import json
 import os
 from pathlib import Path
+from typing import TYPE_CHECKING
 
-from google.cloud import firestore
-from google.oauth2 import service_account
+# The Google client libraries are slow to import; they load with the first client.
+if TYPE_CHECKING:
+    from google.cloud import firestore
 
 
 def _load_service_account_info(raw_value: str) -> dict:
@@ -28,6 +30,23 @@ def _load_service_account_info(raw_value: str) -> dict:
     return json.loads(decoded)
 
 
+def _client_kwargs(service_account_value: str | None, project_id: str | None) -> dict:
+    raw = service_account_value or os.getenv("FIREBASE_SERVICE_ACCOUNT_JSON")
+    resolved_project = project_id or os.getenv("GCP_PROJECT_ID")
+
+    if raw:
+        from google.oauth2 import service_account
+
+        info = _load_service_account_info(raw)
+        credentials = service_account.Credentials.from_service_account_info(info)
+        return {"project": resolved_project or info.get("project_id"), "credentials": credentials}
+
+    if resolved_project:
+        return {"project": resolved_project}
+
+    return {}
+
+
 def create_firestore_client(
     service_account_value: str | None = None,
     project_id: str | None = None,
@@ -40,18 +59,16 @@ def create_firestore_client(
     2. FIREBASE_SERVICE_ACCOUNT_JSON environment variable
     3. Application default credentials
     """
-    raw = service_account_value or os.getenv("FIREBASE_SERVICE_ACCOUNT_JSON")
-    resolved_project = project_id or os.getenv("GCP_PROJECT_ID")
+    from google.cloud import firestore
 
-    if raw:
-        info = _load_service_account_info(raw)
-        credentials = service_account.Credentials.from_service_account_info(info)
-        return firestore.Client(
-            project=resolved_project or info.get("project_id"),
-            credentials=credentials,
-        )
+    return firestore.Client(**_client_kwargs(service_account_value, project_id))
 
-    if resolved_project:
-        return firestore.Client(project=resolved_project)
 
-    return firestore.Client()
+def create_async_firestore_client(
+    service_account_value: str | None = None,
+    project_id: str | None = None,
+) -> firestore.AsyncClient:
+    """Create a Firestore AsyncClient, resolving credentials like create_firestore_client."""
+    from google.cloud import firestore
+
+    return firestore.AsyncClient(**_client_kwargs(service_account_value, project_id))
@@ -0,0 +1,771 @@
+"""Parallel, resumable bulk ingestion of 10-K filings into the vector index.
+
+The pipeline streams filings through bounded queues, each stage with its own
+worker pool::
+
+    read + hash  ->  manifest check  ->  chunk  ->  embed  ->  upsert  ->  manifest update
+     (threads)         (threads)      (processes)  (async)    (threads)
+
+Filings whose manifest already shows a successful ingest of the same file hash
+are skipped.
+
+Vector IDs are content keys by default (``TICKER:YEAR:10K:<hash of the chunk
+text and section>``), and the keys of each filing are recorded next to its
+manifest. When a filing changes, only chunks with new keys are embedded; chunks
+that merely moved have their stored vectors re-upserted with the new ``chunk``
+position, and keys no longer produced are deleted in batches. An interrupted
+run keeps the keys it already upserted. With ``--chunk-ids position`` IDs are
+``TICKER:YEAR:10K:i`` as before: a changed filing is embedded in full, and an
+interrupted one resumes from the ``upsertedChunks`` count in its manifest.
+
+By default each filing is cleaned of table padding and chunked per SEC item
+(see ``filing_sections.py``), and every chunk records its ``section``;
+``--chunker recursive`` splits the raw text instead.
+
+Chunks are embedded with ``--embedding-profile`` (see ``embedding_profiles.py``),
+which must match the width of the Pinecone index and the API's ``EMBEDDING_PROFILE``.
+
+Usage::
+
+    python ingest_pipeline.py --dir ../clean_10k_texts
+    python ingest_pipeline.py --dir ../clean_10k_texts --tickers AAPL,MSFT,NFLX
+    python ingest_pipeline.py --gcs-bucket my-bucket --tickers AAPL,MSFT
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from functools import partial
+from pathlib import Path
+from typing import Any, Callable, Iterable
+
+from embedding_profiles import DEFAULT_PROFILE, EmbeddingProfile, check_index_profile
+from filing_sections import parse_filing
+from ingestion import (
+    add_upserted_chunk_keys,
+    delete_chunk_keys,
+    get_chunk_keys,
+    get_ingestion_record,
+    known_chunk_keys,
+    mark_ingestion_failed,
+    mark_ingestion_progress,
+    mark_ingestion_running,
+    mark_ingestion_success,
+    reset_chunk_keys,
+    set_chunk_keys,
+)
+
+logger = logging.getLogger(__name__)
+
+FILENAME_RE = re.compile(r"^(?P<ticker>[A-Z0-9.\-]+)_(?P<year>\d{4})_10K\.txt$")
+GCS_OBJECT_RE = re.compile(r"^filings/(?P<ticker>[^/]+)/(?P<year>\d{4})/10K\.txt$")
+CHUNK_ID_SCHEMES = ("content", "position")
+_DELETE_BATCH_SIZE = 1000
+_DONE = object()
+
+
+@dataclass(frozen=True)
+class FilingSource:
+    ticker: str
+    year: int
+    uri: str
+
+
+@dataclass
+class PipelineConfig:
+    namespace: str = ""
+    chunk_size: int = 1200
+    chunk_overlap: int = 150
+    embed_batch_size: int = 100
+    embed_concurrency: int = 4
+    upsert_batch_size: int = 100
+    upsert_workers: int = 4
+    read_workers: int = 8
+    chunk_workers: int = max(1, (os.cpu_count() or 2) - 1)
+    file_queue_size: int = 8
+    batch_queue_size: int = 32
+    chunker: str = "sections"
+    chunk_ids: str = "content"
+    embedding_profile: str = DEFAULT_PROFILE
+    force: bool = False
+    report_interval: float = 10.0
+
+    @property
+    def chunking(self) -> dict[str, Any]:
+        return chunking_config(
+            self.chunk_size, self.chunk_overlap, self.chunker, self.embedding_profile, chunk_ids=self.chunk_ids
+        )
+
+
+@dataclass
+class PipelineStats:
+    files_total: int = 0
+    files_skipped: int = 0
+    files_ingested: int = 0
+    files_failed: int = 0
+    chunks_embedded: int = 0
+    chunks_upserted: int = 0
+    chunks_reused: int = 0
+    chunks_relocated: int = 0
+    chunks_deleted: int = 0
+    started: float = field(default_factory=time.perf_counter)
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    @property
+    def chunks_per_second(self) -> float:
+        return self.chunks_upserted / self.elapsed if self.elapsed else 0.0
+
+    def summary(self) -> str:
+        return (
+            f"{self.files_ingested} ingested, {self.files_skipped} skipped, "
+            f"{self.files_failed} failed of {self.files_total} filings; "
+            f"{self.chunks_upserted} chunks upserted in {self.elapsed:.1f}s "
+            f"({self.chunks_per_second:.1f} chunks/s); {self.chunks_embedded} embedded, "
+            f"{self.chunks_relocated} moved, {self.chunks_reused} unchanged, {self.chunks_deleted} deleted"
+        )
+
+
+@dataclass
+class _FilingJob:
+    source: FilingSource
+    text: str | None = None
+    sha256: str = ""
+    chunk_count: int = 0
+    previous_chunk_count: int = 0
+    # Content keys with vectors in the index, and the chunk position each one stores (None: orphan).
+    known_keys: dict[str, int | None] = field(default_factory=dict)
+    reusable_keys: dict[str, int] = field(default_factory=dict)
+    keys: list[str] = field(default_factory=list)
+    ids: list[str] = field(default_factory=list)
+    unchanged: int = 0
+    upserted: int = 0
+    resume_from: int = 0
+    batch_starts: list[int] = field(default_factory=list)
+    batches_done: set[int] = field(default_factory=set)
+    contiguous_batches: int = 0
+    failed: bool = False
+
+    @property
+    def upserted_prefix(self) -> int:
+        """Chunks [0, n) known to be upserted: everything before the first unfinished batch."""
+        if self.contiguous_batches < len(self.batch_starts):
+            return self.batch_starts[self.contiguous_batches]
+        return self.chunk_count
+
+
+@dataclass
+class _Batch:
+    job: _FilingJob
+    index: int
+    positions: list[int]
+    ids: list[str]
+    texts: list[str]
+    metadatas: list[dict[str, Any]]
+    vectors: list[list[float]] | None = None
+    # Unchanged chunks at a new position: their stored vectors are fetched rather than embedded.
+    relocate: bool = False
+
+
+def sha256_text(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def chunk_text(text: str, chunk_size: int = 1200, chunk_overlap: int = 150) -> list[str]:
+    """Split a filing the same way the ingestion notebook does."""
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        separators=["\n\n", "\n", " ", ""],
+    )
+    return splitter.split_text(text)
+
+
+def chunk_filing(
+    text: str, chunk_size: int = 1200, chunk_overlap: int = 150, chunker: str = "sections"
+) -> list[tuple[str, dict[str, Any]]]:
+    """
+    Chunks of a filing with the metadata they add, for the given chunker.
+
+    ``sections`` cleans table padding and splits each SEC item separately, so no
+    chunk spans two items and every chunk carries ``section`` and ``sectionTitle``;
+    ``recursive`` splits the raw text as ``chunk_text`` does.
+    """
+    if chunker == "recursive":
+        return [(chunk, {}) for chunk in chunk_text(text, chunk_size, chunk_overlap)]
+    if chunker != "sections":
+        raise ValueError(f"Unknown chunker: {chunker}")
+    chunks = []
+    for section in parse_filing(text.splitlines(keepends=True)).sections:
+        metadata = {"section": section.item, "sectionTitle": section.title}
+        chunks.extend((chunk, metadata) for chunk in chunk_text(section.text, chunk_size, chunk_overlap))
+    return chunks
+
+
+def chunking_config(
+    chunk_size: int,
+    chunk_overlap: int,
+    chunker: str,
+    embedding_profile: str = DEFAULT_PROFILE,
+    *,
+    chunk_ids: str = "content",
+) -> dict[str, Any]:
+    """Chunking settings as recorded in manifests; a filing chunked or embedded differently is re-ingested."""
+    chunking: dict[str, Any] = {"chunkSize": chunk_size, "chunkOverlap": chunk_overlap}
+    if chunker != "recursive":
+        # Recorded only for the section chunker so filings ingested before it existed still match.
+        chunking["chunker"] = chunker
+    profile = EmbeddingProfile.parse(embedding_profile)
+    if profile != EmbeddingProfile.parse(DEFAULT_PROFILE):
+        # Likewise recorded only when it differs from the profile every earlier ingest used.
+        chunking["embeddingProfile"] = str(profile)
+    if chunk_ids != "position":
+        chunking["chunkIds"] = chunk_ids
+    return chunking
+
+
+def vector_id(ticker: str, year: int, chunk: int | str) -> str:
+    """``TICKER:YEAR:10K:`` followed by the chunk's position or content key."""
+    return f"{ticker}:{year}:10K:{chunk}"
+
+
+def chunk_keys(chunks: list[tuple[str, dict[str, Any]]]) -> list[str]:
+    """
+    Content keys of a filing's chunks: a hash of the text and the metadata chunking
+    added (its section), so an unchanged chunk keeps its key wherever it moves.
+    A repeated chunk gets ``-2``, ``-3``, ... after its key.
+    """
+    seen: dict[str, int] = {}
+    keys = []
+    for text, metadata in chunks:
+        digest = hashlib.sha256()
+        digest.update(json.dumps(metadata, sort_keys=True).encode("utf-8"))
+        digest.update(b"\n")
+        digest.update(text.encode("utf-8"))
+        key = digest.hexdigest()[:16]
+        seen[key] = seen.get(key, 0) + 1
+        keys.append(key if seen[key] == 1 else f"{key}-{seen[key]}")
+    return keys
+
+
+def chunk_ids(ticker: str, year: int, chunks: list[tuple[str, dict[str, Any]]], scheme: str = "content") -> list[str]:
+    """Vector IDs of a filing's chunks under ``scheme`` ('content' keys or 'position')."""
+    if scheme == "position":
+        return [vector_id(ticker, year, position) for position in range(len(chunks))]
+    if scheme != "content":
+        raise ValueError(f"Unknown chunk ID scheme: {scheme}")
+    return [vector_id(ticker, year, key) for key in chunk_keys(chunks)]
+
+
+def discover_local_filings(directory: str | Path, tickers: Iterable[str] | None = None) -> list[FilingSource]:
+    """Find {TICKER}_{YEAR}_10K.txt files, optionally restricted to a ticker list."""
+    wanted = {ticker.strip().upper() for ticker in tickers} if tickers else None
+    sources = []
+    for path in sorted(Path(directory).iterdir()):
+        match = FILENAME_RE.match(path.name)
+        if not match:
+            continue
+        ticker = match.group("ticker")
+        if wanted is not None and ticker not in wanted:
+            continue
+        sources.append(FilingSource(ticker=ticker, year=int(match.group("year")), uri=str(path)))
+    return sources
+
+
+def discover_gcs_filings(storage_client, bucket_name: str, tickers: Iterable[str]) -> list[FilingSource]:
+    """Find filings/{TICKER}/{YEAR}/10K.txt objects for each ticker in a GCS bucket."""
+    sources = []
+    for ticker in tickers:
+        normalized = ticker.strip().upper()
+        for blob in storage_client.list_blobs(bucket_name, prefix=f"filings/{normalized}/"):
+            match = GCS_OBJECT_RE.match(blob.name)
+            if match:
+                sources.append(
+                    FilingSource(
+                        ticker=normalized,
+                        year=int(match.group("year")),
+                        uri=f"gs://{bucket_name}/{blob.name}",
+                    )
+                )
+    return sources
+
+
+def make_reader(storage_client=None) -> Callable[[str], str]:
+    """Return a function that reads a local path or a gs:// URI as UTF-8 text."""
+
+    def read(uri: str) -> str:
+        if uri.startswith("gs://"):
+            if storage_client is None:
+                raise ValueError(f"A storage client is required to read {uri}")
+            bucket_name, _, object_path = uri[len("gs://"):].partition("/")
+            return storage_client.bucket(bucket_name).blob(object_path).download_as_text(encoding="utf-8")
+        return Path(uri).read_text(encoding="utf-8")
+
+    return read
+
+
+async def _run_stage(
+    name: str,
+    in_queue: asyncio.Queue,
+    out_queue: asyncio.Queue | None,
+    workers: int,
+    handle: Callable[[Any], Any],
+) -> None:
+    async def worker() -> None:
+        while True:
+            item = await in_queue.get()
+            if item is _DONE:
+                # Put the sentinel back so sibling workers also stop.
+                await in_queue.put(_DONE)
+                return
+            try:
+                await handle(item)
+            except Exception:
+                logger.exception(f"Unhandled error in {name} stage")
+
+    await asyncio.gather(*(worker() for _ in range(workers)))
+    if out_queue is not None:
+        await out_queue.put(_DONE)
+
+
+async def run_pipeline(
+    sources: list[FilingSource],
+    *,
+    index,
+    embeddings,
+    db=None,
+    read: Callable[[str], str] | None = None,
+    config: PipelineConfig | None = None,
+) -> PipelineStats:
+    """
+    Ingest filings into ``index`` (a Pinecone index handle) using ``embeddings``.
+
+    ``db`` is the Firestore client holding the ingestion manifest; without it the
+    pipeline neither skips nor resumes and records nothing.
+    """
+    config = config or PipelineConfig()
+    read = read or make_reader()
+    stats = PipelineStats(files_total=len(sources))
+    loop = asyncio.get_running_loop()
+
+    io_pool = ThreadPoolExecutor(max_workers=config.read_workers, thread_name_prefix="ingest-io")
+    upsert_pool = ThreadPoolExecutor(max_workers=config.upsert_workers, thread_name_prefix="ingest-upsert")
+    chunk_pool = ProcessPoolExecutor(max_workers=config.chunk_workers)
+
+    source_queue: asyncio.Queue = asyncio.Queue(maxsize=config.file_queue_size)
+    manifest_queue: asyncio.Queue = asyncio.Queue(maxsize=config.file_queue_size)
+    chunk_queue: asyncio.Queue = asyncio.Queue(maxsize=config.file_queue_size)
+    embed_queue: asyncio.Queue = asyncio.Queue(maxsize=config.batch_queue_size)
+    upsert_queue: asyncio.Queue = asyncio.Queue(maxsize=config.batch_queue_size)
+
+    def io(fn, *args, **kwargs):
+        return loop.run_in_executor(io_pool, partial(fn, *args, **kwargs))
+
+    async def fail(job: _FilingJob, stage: str, error: Exception) -> None:
+        if job.failed:
+            return
+        job.failed = True
+        stats.files_failed += 1
+        logger.error(f"{job.source.ticker} {job.source.year}: {stage} failed: {error}")
+        if db is not None:
+            try:
+                await io(mark_ingestion_failed, db, job.source.ticker, job.source.year, error=f"{stage}: {error}")
+            except Exception as e:
+                logger.warning(f"Could not record failure for {job.source.ticker} {job.source.year}: {e}")
+
+    async def delete_orphans(job: _FilingJob) -> list[str]:
+        """Delete vectors the filing no longer produces; returns the keys that could not be deleted."""
+        source = job.source
+        # Positional IDs of an earlier ingest, and content keys of earlier or interrupted runs.
+        previous = {vector_id(source.ticker, source.year, i): str(i) for i in range(job.previous_chunk_count)}
+        previous.update({vector_id(source.ticker, source.year, key): key for key in job.known_keys})
+        current = set(job.ids)
+        orphans = [orphan for orphan in previous if orphan not in current]
+        failed: list[str] = []
+        for start in range(0, len(orphans), _DELETE_BATCH_SIZE):
+            batch = orphans[start:start + _DELETE_BATCH_SIZE]
+            try:
+                await loop.run_in_executor(upsert_pool, partial(index.delete, ids=batch, namespace=config.namespace))
+                stats.chunks_deleted += len(batch)
+            except Exception as e:
+                logger.warning(f"Could not delete {len(batch)} stale chunks of {source.ticker} {source.year}: {e}")
+                failed.extend(previous[orphan] for orphan in batch)
+        return failed
+
+    async def complete(job: _FilingJob) -> None:
+        source = job.source
+        failed = await delete_orphans(job)
+        if db is not None:
+            if config.chunk_ids == "content":
+                await io(
+                    set_chunk_keys, db, source.ticker, source.year, chunking=config.chunking, keys=job.keys, orphans=failed
+                )
+            elif job.known_keys:
+                # Back to positional IDs: keep only the content keys still to delete.
+                if failed:
+                    await io(reset_chunk_keys, db, source.ticker, source.year, chunking=config.chunking, orphans=failed)
+                else:
+                    await io(delete_chunk_keys, db, source.ticker, source.year)
+            await io(mark_ingestion_success, db, source.ticker, source.year, chunk_count=job.chunk_count)
+        stats.files_ingested += 1
+        logger.info(f"Ingested {source.ticker} {source.year}: {job.chunk_count} chunks")
+
+    async def read_and_hash(source: FilingSource) -> None:
+        job = _FilingJob(source=source)
+        try:
+            job.text = await io(read, source.uri)
+            job.sha256 = await io(sha256_text, job.text)
+        except Exception as e:
+            await fail(job, "read", e)
+            return
+        await manifest_queue.put(job)
+
+    async def check_manifest(job: _FilingJob) -> None:
+        source = job.source
+        if db is not None:
+            try:
+                record = await io(get_ingestion_record, db, source.ticker, source.year)
+                recorded_chunking = (record or {}).get("chunking")
+                if not recorded_chunking and config.chunk_ids == "position":
+                    # Manifests written before chunking was recorded used positional IDs.
+                    recorded_chunking = config.chunking
+                same_input = (
+                    record is not None
+                    and record.get("sha256") == job.sha256
+                    and recorded_chunking == config.chunking
+                )
+                if same_input and record.get("status") == "success" and not config.force:
+                    stats.files_skipped += 1
+                    logger.info(f"Skip {source.ticker} {source.year}: already ingested (same hash)")
+                    return
+                if record is not None and (record.get("chunking") or {}).get("chunkIds") != "content":
+                    job.previous_chunk_count = int(record.get("chunkCount") or 0)
+                stored_keys = await io(get_chunk_keys, db, source.ticker, source.year)
+                job.known_keys = known_chunk_keys(stored_keys)
+                if config.chunk_ids == "content":
+                    if stored_keys is not None and stored_keys.get("chunking") == config.chunking:
+                        if not config.force:
+                            job.reusable_keys = {
+                                key: position for key, position in job.known_keys.items() if position is not None
+                            }
+                    else:
+                        # Vectors embedded under other settings are only kept as keys to delete, so a
+                        # run interrupted from here on never mistakes them for reusable ones.
+                        await io(
+                            reset_chunk_keys,
+                            db,
+                            source.ticker,
+                            source.year,
+                            chunking=config.chunking,
+                            orphans=sorted(
+                                set(job.known_keys) | {str(i) for i in range(job.previous_chunk_count)}
+                            ),
+                        )
+                elif same_input and not config.force:
+                    job.resume_from = int(record.get("upsertedChunks") or 0)
+                await io(
+                    mark_ingestion_running,
+                    db,
+                    source.ticker,
+                    source.year,
+                    file_hash=job.sha256,
+                    source=source.uri,
+                    chunking=config.chunking,
+                )
+            except Exception as e:
+                await fail(job, "manifest", e)
+                return
+        await chunk_queue.put(job)
+
+    async def chunk(job: _FilingJob) -> None:
+        source = job.source
+        try:
+            chunks = await loop.run_in_executor(
+                chunk_pool, chunk_filing, job.text, config.chunk_size, config.chunk_overlap, config.chunker
+            )
+        except Exception as e:
+            await fail(job, "chunk", e)
+            return
+        job.text = None
+        job.chunk_count = len(chunks)
+        job.ids = chunk_ids(source.ticker, source.year, chunks, config.chunk_ids)
+
+        relocate: list[int] = []
+        if config.chunk_ids == "content":
+            job.keys = [chunk_id.rsplit(":", 1)[1] for chunk_id in job.ids]
+            embed_positions = []
+            for position, key in enumerate(job.keys):
+                if key not in job.reusable_keys:
+                    embed_positions.append(position)
+                elif job.reusable_keys[key] != position:
+                    relocate.append(position)
+            job.unchanged = job.chunk_count - len(embed_positions) - len(relocate)
+            stats.chunks_reused += job.unchanged
+            if job.reusable_keys:
+                logger.info(
+                    f"{source.ticker} {source.year}: {len(embed_positions)} new or changed, "
+                    f"{len(relocate)} moved, {job.unchanged} unchanged of {job.chunk_count} chunks"
+                )
+        else:
+            job.resume_from = min(job.resume_from, job.chunk_count)
+            if job.resume_from:
+                logger.info(f"Resuming {source.ticker} {source.year} from chunk {job.resume_from}/{job.chunk_count}")
+            embed_positions = list(range(job.resume_from, job.chunk_count))
+
+        def metadata(i: int) -> dict[str, Any]:
+            metadata = {
+                "ticker": source.ticker,
+                "year": source.year,
+                "docType": "10-K",
+                "chunk": i,
+                "source": source.uri,
+            }
+            if config.chunk_ids == "position":
+                # Chunks kept from an earlier version of the filing would carry a stale file hash.
+                metadata["sha256"] = job.sha256
+            return {**metadata, **chunks[i][1], "text": chunks[i][0]}
+
+        batches = [
+            (positions[start:start + config.embed_batch_size], moved)
+            for positions, moved in ((embed_positions, False), (relocate, True))
+            for start in range(0, len(positions), config.embed_batch_size)
+        ]
+        job.batch_starts = [positions[0] for positions, _ in batches]
+        if not batches:
+            await complete(job)
+            return
+
+        for batch_index, (positions, moved) in enumerate(batches):
+            await embed_queue.put(
+                _Batch(
+                    job=job,
+                    index=batch_index,
+                    positions=positions,
+                    ids=[job.ids[i] for i in positions],
+                    texts=[chunks[i][0] for i in positions],
+                    metadatas=[metadata(i) for i in positions],
+                    relocate=moved,
+                )
+            )
+
+    async def fetch_stored(batch: _Batch) -> list[list[float] | None]:
+        response = await loop.run_in_executor(
+            upsert_pool, partial(index.fetch, ids=batch.ids, namespace=config.namespace)
+        )
+        return [vector.values if vector is not None else None for vector in map(response.vectors.get, batch.ids)]
+
+    async def embed(batch: _Batch) -> None:
+        if batch.job.failed:
+            return
+        try:
+            vectors = await fetch_stored(batch) if batch.relocate else [None] * len(batch.ids)
+            missing = [i for i, vector in enumerate(vectors) if vector is None]
+            if missing:
+                embedded = await embeddings.aembed_documents([batch.texts[i] for i in missing])
+                for i, vector in zip(missing, embedded):
+                    vectors[i] = vector
+            batch.vectors = vectors
+        except Exception as e:
+            await fail(batch.job, "embed", e)
+            return
+        stats.chunks_embedded += len(missing)
+        stats.chunks_relocated += len(batch.ids) - len(missing)
+        await upsert_queue.put(batch)
+
+    async def upsert(batch: _Batch) -> None:
+        job = batch.job
+        if job.failed:
+            return
+        vectors = list(zip(batch.ids, batch.vectors, batch.metadatas))
+        try:
+            for start in range(0, len(vectors), config.upsert_batch_size):
+                await loop.run_in_executor(
+                    upsert_pool,
+                    partial(
+                        index.upsert,
+                        vectors=vectors[start:start + config.upsert_batch_size],
+                        namespace=config.namespace,
+                    ),
+                )
+        except Exception as e:
+            await fail(job, "upsert", e)
+            return
+        stats.chunks_upserted += len(vectors)
+        job.upserted += len(vectors)
+
+        job.batches_done.add(batch.index)
+        # Only the contiguous run of finished batches counts as positional progress,
+        # so a resumed ingest never skips a batch that was still in flight.
+        advanced = False
+        while job.contiguous_batches in job.batches_done:
+            job.contiguous_batches += 1
+            advanced = True
+
+        if len(job.batches_done) == len(job.batch_starts):
+            await complete(job)
+        elif db is not None and (advanced or config.chunk_ids == "content"):
+            try:
+                if config.chunk_ids == "content":
+                    # Any finished batch counts: a resumed run skips exactly the keys recorded here.
+                    entries = [f"{job.keys[i]}@{i}" for i in batch.positions]
+                    await io(add_upserted_chunk_keys, db, job.source.ticker, job.source.year, entries)
+                await io(
+                    mark_ingestion_progress,
+                    db,
+                    job.source.ticker,
+                    job.source.year,
+                    chunk_count=job.chunk_count,
+                    upserted_chunks=(
+                        job.unchanged + job.upserted if config.chunk_ids == "content" else job.upserted_prefix
+                    ),
+                )
+            except Exception as e:
+                logger.warning(f"Could not record progress for {job.source.ticker} {job.source.year}: {e}")
+
+    async def report() -> None:
+        while True:
+            await asyncio.sleep(config.report_interval)
+            logger.info(
+                f"Progress: {stats.files_ingested + stats.files_skipped + stats.files_failed}/{stats.files_total} "
+                f"filings, {stats.chunks_upserted} chunks upserted ({stats.chunks_per_second:.1f} chunks/s)"
+            )
+
+    async def feed() -> None:
+        for source in sources:
+            await source_queue.put(source)
+        await source_queue.put(_DONE)
+
+    reporter = asyncio.create_task(report())
+    try:
+        await asyncio.gather(
+            feed(),
+            _run_stage("read", source_queue, manifest_queue, config.read_workers, read_and_hash),
+            _run_stage("manifest", manifest_queue, chunk_queue, config.read_workers, check_manifest),
+            _run_stage("chunk", chunk_queue, embed_queue, config.chunk_workers, chunk),
+            _run_stage("embed", embed_queue, upsert_queue, config.embed_concurrency, embed),
+            _run_stage("upsert", upsert_queue, None, config.upsert_workers, upsert),
+        )
+    finally:
+        reporter.cancel()
+        io_pool.shutdown(wait=False)
+        upsert_pool.shutdown(wait=False)
+        chunk_pool.shutdown(wait=False)
+
+    logger.info(stats.summary())
+    return stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Bulk-ingest 10-K filings into the Pinecone index.")
+    source_group = parser.add_mutually_exclusive_group(required=True)
+    source_group.add_argument("--dir", help="Directory of {TICKER}_{YEAR}_10K.txt files")
+    source_group.add_argument("--gcs-bucket", help="GCS bucket holding filings/{TICKER}/{YEAR}/10K.txt")
+    parser.add_argument("--tickers", help="Comma separated tickers to ingest (required with --gcs-bucket)")
+    parser.add_argument("--namespace", default="", help="Pinecone namespace (default: the API's default namespace)")
+    parser.add_argument(
+        "--embedding-profile",
+        type=EmbeddingProfile.parse,
+        default=DEFAULT_PROFILE,
+        help="model[:dimensions] to embed with, e.g. text-embedding-3-large:1024 (must match the Pinecone index)",
+    )
+    parser.add_argument("--chunk-size", type=int, default=1200)
+    parser.add_argument("--chunk-overlap", type=int, default=150)
+    parser.add_argument(
+        "--chunker",
+        choices=("sections", "recursive"),
+        default="sections",
+        help="'sections' cleans tables and chunks each SEC item separately; 'recursive' splits the raw text",
+    )
+    parser.add_argument(
+        "--chunk-ids",
+        choices=CHUNK_ID_SCHEMES,
+        default="content",
+        help="'content' keys let a changed filing re-embed only its changed chunks; 'position' numbers them",
+    )
+    parser.add_argument("--embed-batch-size", type=int, default=100)
+    parser.add_argument("--embed-concurrency", type=int, default=4)
+    parser.add_argument("--upsert-workers", type=int, default=4)
+    parser.add_argument("--chunk-workers", type=int, default=PipelineConfig.chunk_workers)
+    parser.add_argument("--force", action="store_true", help="Re-ingest even when the manifest shows success")
+    parser.add_argument("--no-manifest", action="store_true", help="Do not read or write the Firestore manifest")
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+    from langchain_openai import OpenAIEmbeddings
+    from pinecone import Pinecone
+
+    from firebase_client import create_firestore_client
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    tickers = [ticker for ticker in (args.tickers or "").split(",") if ticker.strip()]
+    storage_client = None
+    if args.gcs_bucket:
+        if not tickers:
+            parser.error("--tickers is required with --gcs-bucket")
+        from google.cloud import storage
+
+        storage_client = storage.Client()
+        sources = discover_gcs_filings(storage_client, args.gcs_bucket, tickers)
+    else:
+        sources = discover_local_filings(args.dir, tickers or None)
+    logger.info(f"Found {len(sources)} filings to consider")
+
+    db = None if args.no_manifest else create_firestore_client()
+    index = Pinecone(api_key=os.environ["PINECONE_API_KEY"]).Index(os.environ["PINECONE_INDEX_NAME"])
+    if args.embedding_profile.quantization != "none":
+        parser.error("--embedding-profile: Pinecone stores full-precision vectors; quantize a local index instead")
+    check_index_profile(
+        args.embedding_profile,
+        None,
+        index.describe_index_stats().dimension,
+        f"Pinecone index {os.environ['PINECONE_INDEX_NAME']}",
+    )
+    embeddings = OpenAIEmbeddings(
+        **args.embedding_profile.embedding_kwargs(),
+        openai_api_key=os.environ["OPENAI_API_KEY"],
+        chunk_size=args.embed_batch_size,
+    )
+    config = PipelineConfig(
+        namespace=args.namespace,
+        chunk_size=args.chunk_size,
+        chunk_overlap=args.chunk_overlap,
+        chunker=args.chunker,
+        chunk_ids=args.chunk_ids,
+        embedding_profile=str(args.embedding_profile),
+        embed_batch_size=args.embed_batch_size,
+        embed_concurrency=args.embed_concurrency,
+        upsert_workers=args.upsert_workers,
+        chunk_workers=args.chunk_workers,
+        force=args.force,
+    )
+
+    stats = asyncio.run(
+        run_pipeline(
+            sources,
+            index=index,
+            embeddings=embeddings,
+            db=db,
+            read=make_reader(storage_client),
+            config=config,
+        )
+    )
+    print(stats.summary())
+
+
+if __name__ == "__main__":
+    main()
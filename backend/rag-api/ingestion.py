@@ -1,29 +1,67 @@
-"""Read helpers for the Firestore ingestion manifest collection."""
+"""Firestore ingestion manifests (``ingestion/{doc_type}/files``) and per-filing chunk keys.
+
+- read helpers, sync and async, used by the /api/ingestion endpoints
+- ``ManifestIndex``, an in-memory copy of the manifests kept current by a
+  listener or by polling
+- write helpers the ingestion pipeline uses to record a filing's status and progress
+- chunk-key helpers for ``ingestion/{doc_type}/chunkKeys``, the content keys
+  already upserted for each filing, which let a changed filing re-embed only its new chunks
+"""
 
 from __future__ import annotations
 
+import asyncio
+import hashlib
+import json
+import logging
+import threading
 from datetime import datetime, timezone
-from typing import Any
+from typing import TYPE_CHECKING, Any, Iterable
+
+# google.cloud.firestore takes a noticeable part of API startup; it is imported where it is used.
+if TYPE_CHECKING:
+    from google.cloud import firestore
 
-from google.cloud import firestore
-from google.cloud.firestore_v1.base_query import FieldFilter
+logger = logging.getLogger(__name__)
 
 INGESTION_DOC_TYPE = "10k"
 FILES_COLLECTION = "files"
+CHUNK_KEYS_COLLECTION = "chunkKeys"
+
+
+def files_collection(db: firestore.Client | firestore.AsyncClient, doc_type: str = INGESTION_DOC_TYPE):
+    """Return the ingestion/{doc_type}/files collection."""
+    return db.collection("ingestion").document(doc_type).collection(FILES_COLLECTION)
 
 
 def manifest_doc_ref(
-    db: firestore.Client,
+    db: firestore.Client | firestore.AsyncClient,
     ticker: str,
     year: int,
     doc_type: str = INGESTION_DOC_TYPE,
 ) -> firestore.DocumentReference:
     """Return ingestion/{doc_type}/files/{TICKER}_{year}."""
     normalized_ticker = ticker.strip().upper()
+    return files_collection(db, doc_type).document(f"{normalized_ticker}_{year}")
+
+
+def chunk_keys_ref(
+    db: firestore.Client,
+    ticker: str,
+    year: int,
+    doc_type: str = INGESTION_DOC_TYPE,
+) -> firestore.DocumentReference:
+    """
+    Return ingestion/{doc_type}/chunkKeys/{TICKER}_{year}.
+
+    The per-chunk content keys of a filing live next to its manifest rather than
+    in it, so the manifest endpoints and the manifest listener stay small.
+    """
+    normalized_ticker = ticker.strip().upper()
     return (
         db.collection("ingestion")
         .document(doc_type)
-        .collection(FILES_COLLECTION)
+        .collection(CHUNK_KEYS_COLLECTION)
         .document(f"{normalized_ticker}_{year}")
     )
 
@@ -71,6 +109,48 @@ def get_ingestion_record(
     return serialize_ingestion_doc(doc.id, doc.to_dict())
 
 
+async def aget_ingestion_record(
+    db: firestore.AsyncClient,
+    ticker: str,
+    year: int,
+    doc_type: str = INGESTION_DOC_TYPE,
+) -> dict[str, Any] | None:
+    """Fetch a single ingestion manifest by ticker and year with a Firestore AsyncClient."""
+    doc = await manifest_doc_ref(db, ticker, year, doc_type).get()
+    if not doc.exists:
+        return None
+    return serialize_ingestion_doc(doc.id, doc.to_dict())
+
+
+def _manifest_query(
+    db: firestore.Client | firestore.AsyncClient,
+    ticker: str | None,
+    status: str | None,
+    doc_type: str,
+    limit: int,
+):
+    from google.cloud.firestore_v1.base_query import FieldFilter
+
+    query = files_collection(db, doc_type)
+
+    if ticker:
+        query = query.where(filter=FieldFilter("ticker", "==", ticker.strip().upper()))
+
+    if status:
+        query = query.where(filter=FieldFilter("status", "==", status.strip().lower()))
+
+    return query.limit(limit)
+
+
+def _record_sort_key(record: dict[str, Any]) -> tuple:
+    return (record.get("ticker") or "", record.get("year") or 0)
+
+
+def _sort_records(records: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    records.sort(key=_record_sort_key, reverse=True)
+    return records
+
+
 def list_ingestion_records(
     db: firestore.Client,
     *,
@@ -80,20 +160,214 @@ def list_ingestion_records(
     limit: int = 100,
 ) -> list[dict[str, Any]]:
     """List ingestion manifest documents with optional ticker/status filters."""
-    query = db.collection("ingestion").document(doc_type).collection(FILES_COLLECTION)
+    docs = _manifest_query(db, ticker, status, doc_type, limit).stream()
+    return _sort_records([serialize_ingestion_doc(doc.id, doc.to_dict()) for doc in docs])
 
-    if ticker:
-        query = query.where(filter=FieldFilter("ticker", "==", ticker.strip().upper()))
 
-    if status:
-        query = query.where(filter=FieldFilter("status", "==", status.strip().lower()))
+async def alist_ingestion_records(
+    db: firestore.AsyncClient,
+    *,
+    ticker: str | None = None,
+    status: str | None = None,
+    doc_type: str = INGESTION_DOC_TYPE,
+    limit: int = 100,
+) -> list[dict[str, Any]]:
+    """List ingestion manifest documents with a Firestore AsyncClient."""
+    docs = _manifest_query(db, ticker, status, doc_type, limit).stream()
+    return _sort_records([serialize_ingestion_doc(doc.id, doc.to_dict()) async for doc in docs])
 
-    query = query.limit(limit)
-    docs = query.stream()
 
-    records = [serialize_ingestion_doc(doc.id, doc.to_dict()) for doc in docs]
-    records.sort(key=lambda record: (record.get("ticker") or "", record.get("year") or 0), reverse=True)
-    return records
+class ManifestIndex:
+    """
+    In-memory copy of the ingestion manifest collection, indexed by ticker and status.
+
+    Filled from Firestore once and then kept current, either by an ``on_snapshot``
+    listener (``listen``) or by polling for documents whose ``updatedAt`` moved
+    past the newest one seen (``poll``), so reads never touch the network. Until
+    the first load completes ``ready`` is False and callers should query
+    Firestore directly.
+
+    ``etag`` is a fingerprint of every record and changes whenever any manifest
+    does, so clients can revalidate listings with ``If-None-Match``.
+    """
+
+    def __init__(self, doc_type: str = INGESTION_DOC_TYPE):
+        self.doc_type = doc_type
+        self._records: dict[str, dict[str, Any]] = {}
+        self._by_ticker: dict[str, set[str]] = {}
+        self._by_status: dict[str, set[str]] = {}
+        self._sorted_ids: list[str] | None = None
+        self._etag: str | None = None
+        self._newest_update: datetime | None = None
+        self._lock = threading.Lock()
+        self._watch = None
+        self.ready = False
+        self.stats = {"loads": 0, "updates": 0, "removals": 0, "reads": 0}
+
+    # ------------------------------------------------------------------
+    # Updates
+    # ------------------------------------------------------------------
+    def _unindex(self, doc_id: str) -> None:
+        record = self._records.pop(doc_id, None)
+        if record is None:
+            return
+        for index, key in ((self._by_ticker, record.get("ticker")), (self._by_status, record.get("status"))):
+            ids = index.get(key)
+            if ids is not None:
+                ids.discard(doc_id)
+                if not ids:
+                    del index[key]
+
+    def _index(self, doc_id: str, data: dict[str, Any] | None) -> None:
+        self._unindex(doc_id)
+        record = serialize_ingestion_doc(doc_id, data)
+        self._records[doc_id] = record
+        self._by_ticker.setdefault(record.get("ticker"), set()).add(doc_id)
+        self._by_status.setdefault(record.get("status"), set()).add(doc_id)
+        updated_at = (data or {}).get("updatedAt")
+        if isinstance(updated_at, datetime) and (self._newest_update is None or updated_at > self._newest_update):
+            self._newest_update = updated_at
+
+    def _changed(self) -> None:
+        self._sorted_ids = None
+        self._etag = None
+
+    def load(self, docs: Iterable) -> None:
+        """Replace the index with a full set of manifest snapshots."""
+        with self._lock:
+            self._records.clear()
+            self._by_ticker.clear()
+            self._by_status.clear()
+            self._newest_update = None
+            for doc in docs:
+                self._index(doc.id, doc.to_dict())
+            self._changed()
+            self.stats["loads"] += 1
+            self.ready = True
+        logger.info(f"Manifest index loaded: {len(self._records)} records")
+
+    def apply(self, updated: Iterable = (), removed_ids: Iterable[str] = ()) -> None:
+        """Add or replace the given snapshots and drop the removed document ids."""
+        with self._lock:
+            for doc in updated:
+                self._index(doc.id, doc.to_dict())
+                self.stats["updates"] += 1
+            for doc_id in removed_ids:
+                self._unindex(doc_id)
+                self.stats["removals"] += 1
+            self._changed()
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+    @property
+    def etag(self) -> str:
+        with self._lock:
+            if self._etag is None:
+                digest = hashlib.sha256()
+                for doc_id in sorted(self._records):
+                    digest.update(json.dumps(self._records[doc_id], sort_keys=True, default=str).encode("utf-8"))
+                self._etag = f'"{digest.hexdigest()[:32]}"'
+            return self._etag
+
+    def get(self, ticker: str, year: int) -> dict[str, Any] | None:
+        with self._lock:
+            self.stats["reads"] += 1
+            record = self._records.get(f"{ticker.strip().upper()}_{year}")
+            return dict(record) if record is not None else None
+
+    def list(self, *, ticker: str | None = None, status: str | None = None, limit: int = 100) -> list[dict[str, Any]]:
+        """Records matching the filters, sorted like list_ingestion_records (ticker, then year, descending)."""
+        with self._lock:
+            self.stats["reads"] += 1
+            if self._sorted_ids is None:
+                self._sorted_ids = sorted(
+                    self._records, key=lambda doc_id: _record_sort_key(self._records[doc_id]), reverse=True
+                )
+            ids = None
+            if ticker:
+                ids = self._by_ticker.get(ticker.strip().upper(), set())
+            if status:
+                by_status = self._by_status.get(status.strip().lower(), set())
+                ids = by_status if ids is None else ids & by_status
+            if ids is None:
+                selected = self._sorted_ids[:limit]
+            else:
+                selected = [doc_id for doc_id in self._sorted_ids if doc_id in ids][:limit]
+            return [dict(self._records[doc_id]) for doc_id in selected]
+
+    def snapshot_stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                **self.stats,
+                "ready": self.ready,
+                "records": len(self._records),
+                "tickers": len(self._by_ticker),
+                "newest_update": self._newest_update.isoformat() if self._newest_update else None,
+            }
+
+    # ------------------------------------------------------------------
+    # Keeping current
+    # ------------------------------------------------------------------
+    def listen(self, db: firestore.Client) -> None:
+        """Load and follow the collection with a Firestore listener (runs on the client's background thread)."""
+        self._watch = files_collection(db, self.doc_type).on_snapshot(self._on_snapshot)
+
+    def _on_snapshot(self, docs, changes, read_time) -> None:
+        from google.cloud.firestore_v1.watch import ChangeType
+
+        if not self.ready:
+            self.load(docs)
+            return
+        self.apply(
+            [change.document for change in changes if change.type != ChangeType.REMOVED],
+            [change.document.id for change in changes if change.type == ChangeType.REMOVED],
+        )
+
+    async def poll(
+        self,
+        db: firestore.Client | firestore.AsyncClient,
+        interval_seconds: float,
+        full_reload_every: int = 30,
+    ) -> None:
+        """
+        Keep the index current by polling; runs until cancelled.
+
+        Each poll fetches only documents updated since the newest ``updatedAt``
+        seen. Deleted manifests do not show up in that query, so the collection
+        is reloaded in full every ``full_reload_every`` polls.
+        """
+        from google.cloud.firestore_v1.base_query import FieldFilter
+
+        polls = 0
+        while True:
+            try:
+                collection = files_collection(db, self.doc_type)
+                if not self.ready or self._newest_update is None or polls % full_reload_every == 0:
+                    self.load(await _fetch(collection))
+                else:
+                    query = collection.where(filter=FieldFilter("updatedAt", ">", self._newest_update))
+                    updated = await _fetch(query)
+                    if updated:
+                        self.apply(updated)
+                        logger.info(f"Manifest index: {len(updated)} records updated")
+            except Exception as e:
+                logger.warning(f"Manifest index poll failed: {e}")
+            polls += 1
+            await asyncio.sleep(interval_seconds)
+
+    def close(self) -> None:
+        if self._watch is not None:
+            self._watch.unsubscribe()
+            self._watch = None
+
+
+async def _fetch(query) -> list:
+    """All snapshots from a sync or async Firestore query."""
+    stream = query.stream()
+    if hasattr(stream, "__aiter__"):
+        return [doc async for doc in stream]
+    return await asyncio.to_thread(list, stream)
 
 
 def already_ingested(
@@ -108,3 +382,200 @@ def already_ingested(
     if not record:
         return False
     return record.get("sha256") == file_hash and record.get("status") == "success"
+
+
+def mark_ingestion_running(
+    db: firestore.Client,
+    ticker: str,
+    year: int,
+    *,
+    file_hash: str,
+    source: str,
+    chunking: dict[str, Any] | None = None,
+    doc_type: str = INGESTION_DOC_TYPE,
+) -> None:
+    """Record the start of an ingest; keeps upsert progress when the hash and chunking are unchanged."""
+    from google.cloud import firestore
+
+    ref = manifest_doc_ref(db, ticker, year, doc_type)
+    snapshot = ref.get()
+    previous = snapshot.to_dict() if snapshot.exists else {}
+    payload = {
+        "ticker": ticker.strip().upper(),
+        "year": year,
+        "sourceGsPath": source,
+        "sha256": file_hash,
+        "status": "running",
+        "chunking": chunking or {},
+        "error": firestore.DELETE_FIELD,
+        "updatedAt": firestore.SERVER_TIMESTAMP,
+    }
+    previous = previous or {}
+    if previous.get("sha256") != file_hash or previous.get("chunking") != (chunking or {}):
+        payload["upsertedChunks"] = 0
+    ref.set(payload, merge=True)
+
+
+def mark_ingestion_progress(
+    db: firestore.Client,
+    ticker: str,
+    year: int,
+    *,
+    chunk_count: int,
+    upserted_chunks: int,
+    doc_type: str = INGESTION_DOC_TYPE,
+) -> None:
+    """Record how many leading chunks of a running ingest are safely upserted."""
+    from google.cloud import firestore
+
+    manifest_doc_ref(db, ticker, year, doc_type).set(
+        {
+            "chunkCount": chunk_count,
+            "upsertedChunks": upserted_chunks,
+            "updatedAt": firestore.SERVER_TIMESTAMP,
+        },
+        merge=True,
+    )
+
+
+def mark_ingestion_success(
+    db: firestore.Client,
+    ticker: str,
+    year: int,
+    *,
+    chunk_count: int,
+    doc_type: str = INGESTION_DOC_TYPE,
+) -> None:
+    """Mark an ingest as complete."""
+    from google.cloud import firestore
+
+    manifest_doc_ref(db, ticker, year, doc_type).set(
+        {
+            "status": "success",
+            "chunkCount": chunk_count,
+            "upsertedChunks": chunk_count,
+            "updatedAt": firestore.SERVER_TIMESTAMP,
+        },
+        merge=True,
+    )
+
+
+def mark_ingestion_failed(
+    db: firestore.Client,
+    ticker: str,
+    year: int,
+    *,
+    error: str,
+    doc_type: str = INGESTION_DOC_TYPE,
+) -> None:
+    """Mark an ingest as failed, keeping upsert progress so a re-run can resume."""
+    from google.cloud import firestore
+
+    manifest_doc_ref(db, ticker, year, doc_type).set(
+        {
+            "status": "failed",
+            "error": error[:1000],
+            "updatedAt": firestore.SERVER_TIMESTAMP,
+        },
+        merge=True,
+    )
+
+
+def get_chunk_keys(
+    db: firestore.Client,
+    ticker: str,
+    year: int,
+    doc_type: str = INGESTION_DOC_TYPE,
+) -> dict[str, Any] | None:
+    """
+    Fetch the chunk keys of a filing: ``keys`` in chunk order as of the last successful
+    ingest, ``upserted`` (``key@position``) written by runs since, ``orphans`` still
+    to delete, and the ``chunking`` they were embedded with.
+    """
+    doc = chunk_keys_ref(db, ticker, year, doc_type).get()
+    return doc.to_dict() if doc.exists else None
+
+
+def known_chunk_keys(chunk_keys: dict[str, Any] | None) -> dict[str, int | None]:
+    """Every key in a chunk keys document, mapped to the chunk position its vector stores (None for orphans)."""
+    if not chunk_keys:
+        return {}
+    known: dict[str, int | None] = {key: None for key in chunk_keys.get("orphans") or []}
+    known.update({key: position for position, key in enumerate(chunk_keys.get("keys") or [])})
+    for entry in chunk_keys.get("upserted") or []:
+        key, _, position = entry.rpartition("@")
+        known[key] = int(position)
+    return known
+
+
+def reset_chunk_keys(
+    db: firestore.Client,
+    ticker: str,
+    year: int,
+    *,
+    chunking: dict[str, Any],
+    orphans: list[str],
+    doc_type: str = INGESTION_DOC_TYPE,
+) -> None:
+    """Start tracking keys for a new chunking; vectors written under the previous one can only be deleted."""
+    from google.cloud import firestore
+
+    chunk_keys_ref(db, ticker, year, doc_type).set(
+        {
+            "chunking": chunking,
+            "keys": [],
+            "upserted": [],
+            "orphans": orphans,
+            "updatedAt": firestore.SERVER_TIMESTAMP,
+        }
+    )
+
+
+def add_upserted_chunk_keys(
+    db: firestore.Client,
+    ticker: str,
+    year: int,
+    entries: list[str],
+    doc_type: str = INGESTION_DOC_TYPE,
+) -> None:
+    """Record ``key@position`` entries for chunks upserted by a running ingest."""
+    from google.cloud import firestore
+
+    chunk_keys_ref(db, ticker, year, doc_type).set(
+        {"upserted": firestore.ArrayUnion(entries), "updatedAt": firestore.SERVER_TIMESTAMP},
+        merge=True,
+    )
+
+
+def set_chunk_keys(
+    db: firestore.Client,
+    ticker: str,
+    year: int,
+    *,
+    chunking: dict[str, Any],
+    keys: list[str],
+    orphans: list[str],
+    doc_type: str = INGESTION_DOC_TYPE,
+) -> None:
+    """Record the keys of a completed ingest in chunk order, with any orphans whose deletion failed."""
+    from google.cloud import firestore
+
+    chunk_keys_ref(db, ticker, year, doc_type).set(
+        {
+            "chunking": chunking,
+            "keys": keys,
+            "upserted": [],
+            "orphans": orphans,
+            "updatedAt": firestore.SERVER_TIMESTAMP,
+        }
+    )
+
+
+def delete_chunk_keys(
+    db: firestore.Client,
+    ticker: str,
+    year: int,
+    doc_type: str = INGESTION_DOC_TYPE,
+) -> None:
+    """Forget a filing's chunk keys once none of its vectors use them."""
+    chunk_keys_ref(db, ticker, year, doc_type).delete()
@@ -0,0 +1,443 @@
+"""Segmented, memory-mapped BM25 index over the 10-K chunks.
+
+The index is built from the same filings and the same chunking as vector
+ingestion, so every lexical hit carries the vector ID of the dense chunk
+(``TICKER:YEAR:10K:<content key>``, or ``TICKER:YEAR:10K:i`` with
+``--chunk-ids position``) and the two result lists can be fused directly.
+
+Index directory layout::
+
+    manifest.json            BM25 parameters, chunking, segments, indexed filings (sha256 + rows)
+    seg_00000/               one segment per build run; new filings land in a new segment
+        meta.json            row count and metadata column schema
+        terms.bin            sorted vocabulary, UTF-8 back to back
+        term_offsets.npy     (terms + 1,) int64 byte offsets into terms.bin
+        post_offsets.npy     (terms + 1,) int64 offsets into the postings arrays
+        post_docs.npy        int32 segment-local row ids, grouped by term
+        post_tfs.npy         uint16 term frequencies, parallel to post_docs.npy
+        doc_lengths.npy      int32 token count per row
+        live.npy             bool per row; False once a newer version of the filing is indexed
+        ids.bin / id_offsets.npy, texts.bin / text_offsets.npy, col_<name>.npy
+
+Build or update it with::
+
+    python lexical_index.py build --dir ../clean_10k_texts --out lexical_index
+    python lexical_index.py compact --out lexical_index
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import math
+import os
+import re
+import shutil
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Iterable
+
+import numpy as np
+from langchain_core.documents import Document
+
+from ingest_pipeline import (
+    CHUNK_ID_SCHEMES,
+    FilingSource,
+    chunk_filing,
+    chunk_ids,
+    chunking_config,
+    discover_local_filings,
+    make_reader,
+    sha256_text,
+)
+from local_vector_store import MetadataColumns, StringColumn, write_strings
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = "manifest.json"
+FORMAT_VERSION = 1
+DOC_TYPE = "10-K"
+_MAX_TF = np.iinfo(np.uint16).max
+
+_TOKEN_RE = re.compile(r"\d+(?:,\d{3})+(?:\.\d+)?|[a-z0-9]+(?:[.&'\-][a-z0-9]+)*")
+_STOPWORDS = frozenset(
+    """
+    a about above after all also an and any are as at be been before being below between both but by
+    can could did do does doing during each few for from further had has have having he her here hers
+    him his how i if in into is it its itself just me more most my no nor not now of off on once only
+    or other our ours out over own same she should so some such than that the their theirs them then
+    there these they this those through to too under until up very was we were what when where which
+    while who whom why will with would you your
+    """.split()
+)
+
+
+def tokenize(text: str) -> list[str]:
+    """Lower-case word, number and ticker tokens ("ebitda", "2024", "1,234.5", "brk-b"), minus stopwords."""
+    tokens = []
+    for token in _TOKEN_RE.findall(text.lower().replace("’", "'")):
+        if token.endswith("'s"):
+            token = token[:-2]
+        if token and token not in _STOPWORDS:
+            tokens.append(token)
+    return tokens
+
+
+def _filing_key(ticker: str, year: int) -> str:
+    return f"{ticker}_{year}"
+
+
+def _prepare_filing(
+    source: FilingSource,
+    text: str,
+    chunk_size: int,
+    chunk_overlap: int,
+    chunker: str = "sections",
+    id_scheme: str = "content",
+) -> list[tuple]:
+    """Chunk and tokenize one filing: [(vector id, text, metadata, term counts), ...]."""
+    chunks = chunk_filing(text, chunk_size, chunk_overlap, chunker)
+    ids = chunk_ids(source.ticker, source.year, chunks, id_scheme)
+    rows = []
+    for chunk, (chunk_body, chunk_metadata) in enumerate(chunks):
+        metadata = {
+            "ticker": source.ticker,
+            "year": source.year,
+            "docType": DOC_TYPE,
+            "chunk": chunk,
+            "source": source.uri,
+            **chunk_metadata,
+        }
+        rows.append((ids[chunk], chunk_body, metadata, Counter(tokenize(chunk_body))))
+    return rows
+
+
+def _write_segment(path: Path, rows: list[tuple]) -> int:
+    """Write a segment directory from prepared rows; returns the number of terms."""
+    path.mkdir(parents=True, exist_ok=True)
+    postings: dict[str, list[tuple[int, int]]] = {}
+    doc_lengths = np.zeros(len(rows), dtype=np.int32)
+    for row, (_, _, _, counts) in enumerate(rows):
+        doc_lengths[row] = sum(counts.values())
+        for term, tf in counts.items():
+            postings.setdefault(term, []).append((row, min(tf, _MAX_TF)))
+
+    terms = sorted(postings)
+    post_offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+    np.cumsum([len(postings[term]) for term in terms], out=post_offsets[1:])
+    post_docs = np.empty(int(post_offsets[-1]), dtype=np.int32)
+    post_tfs = np.empty(int(post_offsets[-1]), dtype=np.uint16)
+    for i, term in enumerate(terms):
+        entries = np.asarray(postings[term], dtype=np.int64)
+        post_docs[post_offsets[i]:post_offsets[i + 1]] = entries[:, 0]
+        post_tfs[post_offsets[i]:post_offsets[i + 1]] = entries[:, 1]
+
+    write_strings(path / "terms.bin", path / "term_offsets.npy", terms)
+    np.save(path / "post_offsets.npy", post_offsets)
+    np.save(path / "post_docs.npy", post_docs)
+    np.save(path / "post_tfs.npy", post_tfs)
+    np.save(path / "doc_lengths.npy", doc_lengths)
+    np.save(path / "live.npy", np.ones(len(rows), dtype=bool))
+    write_strings(path / "ids.bin", path / "id_offsets.npy", [row[0] for row in rows])
+    write_strings(path / "texts.bin", path / "text_offsets.npy", [row[1] for row in rows])
+    schema = MetadataColumns.write(path, [row[2] for row in rows])
+    (path / "meta.json").write_text(json.dumps({"count": len(rows), "columns": schema}, indent=2), encoding="utf-8")
+    return len(terms)
+
+
+class _Segment:
+    """Read side of one segment; postings and texts stay memory-mapped."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        meta = json.loads((path / "meta.json").read_text(encoding="utf-8"))
+        self.count = int(meta["count"])
+        terms = StringColumn(path / "terms.bin", path / "term_offsets.npy")
+        self.vocabulary = {terms[i]: i for i in range(len(terms.offsets) - 1)}
+        self.post_offsets = np.load(path / "post_offsets.npy", mmap_mode="r")
+        self.post_docs = np.load(path / "post_docs.npy", mmap_mode="r")
+        self.post_tfs = np.load(path / "post_tfs.npy", mmap_mode="r")
+        self.doc_lengths = np.load(path / "doc_lengths.npy", mmap_mode="r")
+        self.live = np.load(path / "live.npy")
+        self.ids = StringColumn(path / "ids.bin", path / "id_offsets.npy")
+        self.texts = StringColumn(path / "texts.bin", path / "text_offsets.npy")
+        self.metadata_columns = MetadataColumns.load(path, meta["columns"], self.count)
+
+    def postings(self, term: str) -> tuple[np.ndarray, np.ndarray] | None:
+        index = self.vocabulary.get(term)
+        if index is None:
+            return None
+        start, end = int(self.post_offsets[index]), int(self.post_offsets[index + 1])
+        return np.asarray(self.post_docs[start:end]), np.asarray(self.post_tfs[start:end], dtype=np.float32)
+
+    def document(self, row: int) -> Document:
+        return Document(id=self.ids[row], page_content=self.texts[row], metadata=self.metadata_columns.row(row))
+
+    def kill(self, start: int, end: int) -> None:
+        self.live[start:end] = False
+        np.save(self.path / "live.npy", self.live)
+
+
+class LexicalIndex:
+    """
+    BM25 search over a directory of immutable segments.
+
+    New or changed filings are appended as a new segment and the rows of their
+    previous version are marked dead, so updates never rewrite existing
+    postings; ``compact`` folds everything back into a single segment. Document
+    frequencies and the average length only count live rows.
+    """
+
+    def __init__(self, path: str | Path, *, k1: float = 1.2, b: float = 0.75):
+        self.path = Path(path)
+        manifest_path = self.path / MANIFEST_FILE
+        if manifest_path.is_file():
+            self.manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+            if self.manifest.get("version") != FORMAT_VERSION:
+                raise ValueError(f"Unsupported lexical index version: {self.manifest.get('version')}")
+        else:
+            self.manifest = {"version": FORMAT_VERSION, "k1": k1, "b": b, "segments": [], "files": {}, "next_segment": 0}
+        self.k1 = float(self.manifest["k1"])
+        self.b = float(self.manifest["b"])
+        self._load_segments()
+
+    @classmethod
+    def open(cls, path: str | Path) -> LexicalIndex:
+        """Open an existing index, failing if there is none at ``path``."""
+        if not (Path(path) / MANIFEST_FILE).is_file():
+            raise FileNotFoundError(f"No lexical index found at {path}")
+        return cls(path)
+
+    def _load_segments(self) -> None:
+        self.segments = {name: _Segment(self.path / name) for name in self.manifest["segments"]}
+        self.doc_count = int(sum(segment.live.sum() for segment in self.segments.values()))
+        total_length = sum(
+            int(np.asarray(segment.doc_lengths)[segment.live].sum()) for segment in self.segments.values()
+        )
+        self.avg_doc_length = total_length / self.doc_count if self.doc_count else 0.0
+
+    def _save_manifest(self) -> None:
+        self.path.mkdir(parents=True, exist_ok=True)
+        temporary = self.path / f"{MANIFEST_FILE}.tmp"
+        temporary.write_text(json.dumps(self.manifest, indent=2), encoding="utf-8")
+        os.replace(temporary, self.path / MANIFEST_FILE)
+
+    # ------------------------------------------------------------------
+    # Search
+    # ------------------------------------------------------------------
+    def _idf(self, term: str) -> float:
+        df = 0
+        for segment in self.segments.values():
+            postings = segment.postings(term)
+            if postings is not None:
+                df += int(segment.live[postings[0]].sum())
+        if df == 0:
+            return 0.0
+        return math.log(1 + (self.doc_count - df + 0.5) / (df + 0.5))
+
+    def search(self, query: str, k: int = 4, filter: dict | None = None) -> list[tuple[Document, float]]:
+        """Top-k live chunks by BM25 score, optionally restricted by a Pinecone-style metadata filter."""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or not self.doc_count or k <= 0:
+            return []
+        weighted_terms = [(term, idf) for term in terms if (idf := self._idf(term)) > 0]
+
+        candidates: list[tuple[float, str, int]] = []
+        for name, segment in self.segments.items():
+            scores = np.zeros(segment.count, dtype=np.float32)
+            for term, idf in weighted_terms:
+                postings = segment.postings(term)
+                if postings is None:
+                    continue
+                docs, tfs = postings
+                lengths = np.asarray(segment.doc_lengths[docs], dtype=np.float32)
+                norm = self.k1 * (1 - self.b + self.b * lengths / self.avg_doc_length)
+                scores[docs] += idf * tfs * (self.k1 + 1) / (tfs + norm)
+
+            scores[~segment.live] = 0
+            mask = segment.metadata_columns.filter_mask(filter)
+            if mask is not None:
+                scores[~mask] = 0
+            rows = np.flatnonzero(scores)
+            if len(rows) > k:
+                rows = rows[np.argpartition(-scores[rows], k - 1)[:k]]
+            candidates.extend((float(scores[row]), name, int(row)) for row in rows)
+
+        candidates.sort(key=lambda candidate: -candidate[0])
+        return [(self.segments[name].document(row), score) for score, name, row in candidates[:k]]
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+    def is_current(self, source: FilingSource, file_hash: str, chunking: dict[str, int]) -> bool:
+        entry = self.manifest["files"].get(_filing_key(source.ticker, source.year))
+        return bool(entry) and entry["sha256"] == file_hash and entry.get("chunking") == chunking
+
+    def add_segment(self, filings: list[tuple[FilingSource, str, dict[str, int], list[tuple]]]) -> str | None:
+        """
+        Append prepared filings ``(source, sha256, chunking, rows)`` as one new
+        segment and retire the rows of any earlier version of the same filings.
+        """
+        filings = [filing for filing in filings if filing[3]]
+        if not filings:
+            return None
+        name = f"seg_{self.manifest['next_segment']:05d}"
+        rows = [row for *_, filing_rows in filings for row in filing_rows]
+        term_count = _write_segment(self.path / name, rows)
+
+        retired = []
+        start = 0
+        for source, file_hash, chunking, filing_rows in filings:
+            key = _filing_key(source.ticker, source.year)
+            previous = self.manifest["files"].get(key)
+            if previous and previous["segment"] in self.segments:
+                retired.append(previous)
+            self.manifest["files"][key] = {
+                "sha256": file_hash,
+                "chunking": chunking,
+                "segment": name,
+                "start": start,
+                "end": start + len(filing_rows),
+            }
+            start += len(filing_rows)
+
+        self.manifest["segments"].append(name)
+        self.manifest["next_segment"] += 1
+        # Publish the new segment before retiring old rows: a crash in between
+        # leaves a duplicate (deduplicated by vector ID at fusion) rather than a gap.
+        self._save_manifest()
+        for previous in retired:
+            self.segments[previous["segment"]].kill(previous["start"], previous["end"])
+        self._load_segments()
+        logger.info(f"Added lexical segment {name}: {len(filings)} filings, {len(rows)} chunks, {term_count} terms")
+        return name
+
+    def compact(self) -> None:
+        """Rewrite all live rows into a single segment and delete the old ones."""
+        old_segments = list(self.manifest["segments"])
+        if len(old_segments) <= 1 and all(segment.live.all() for segment in self.segments.values()):
+            return
+        filings = []
+        for entry in sorted(self.manifest["files"].values(), key=lambda entry: (entry["segment"], entry["start"])):
+            segment = self.segments[entry["segment"]]
+            rows = []
+            for row in range(entry["start"], entry["end"]):
+                text = segment.texts[row]
+                rows.append((segment.ids[row], text, segment.metadata_columns.row(row), Counter(tokenize(text))))
+            metadata = rows[0][2] if rows else {}
+            source = FilingSource(
+                ticker=metadata.get("ticker", ""),
+                year=int(metadata.get("year", 0)),
+                uri=metadata.get("source", ""),
+            )
+            filings.append((source, entry["sha256"], entry.get("chunking"), rows))
+
+        self.manifest["segments"] = []
+        self.segments = {}
+        name = self.add_segment(filings)
+        for old in old_segments:
+            if old != name:
+                shutil.rmtree(self.path / old, ignore_errors=True)
+        self._load_segments()
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "path": str(self.path),
+            "segments": len(self.segments),
+            "filings": len(self.manifest["files"]),
+            "live_chunks": self.doc_count,
+            "dead_chunks": int(sum((~segment.live).sum() for segment in self.segments.values())),
+            "avg_chunk_tokens": round(self.avg_doc_length, 1),
+        }
+
+
+def build_lexical_index(
+    path: str | Path,
+    sources: Iterable[FilingSource],
+    *,
+    read: Callable[[str], str] | None = None,
+    chunk_size: int = 1200,
+    chunk_overlap: int = 150,
+    chunker: str = "sections",
+    chunk_id_scheme: str = "content",
+    force: bool = False,
+    workers: int | None = None,
+) -> LexicalIndex:
+    """Index new or changed filings into a new segment; unchanged filings are skipped by file hash."""
+    read = read or make_reader()
+    index = LexicalIndex(path)
+    chunking = chunking_config(chunk_size, chunk_overlap, chunker, chunk_ids=chunk_id_scheme)
+
+    pending = []
+    for source in sources:
+        text = read(source.uri)
+        file_hash = sha256_text(text)
+        if not force and index.is_current(source, file_hash, chunking):
+            continue
+        pending.append((source, file_hash, text))
+    logger.info(f"{len(pending)} filings to index lexically")
+    if not pending:
+        return index
+
+    workers = workers or max((os.cpu_count() or 2) - 1, 1)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        prepared = list(
+            pool.map(
+                _prepare_filing,
+                [source for source, _, _ in pending],
+                [text for _, _, text in pending],
+                [chunk_size] * len(pending),
+                [chunk_overlap] * len(pending),
+                [chunker] * len(pending),
+                [chunk_id_scheme] * len(pending),
+            )
+        )
+    index.add_segment(
+        [(source, file_hash, chunking, rows) for (source, file_hash, _), rows in zip(pending, prepared)]
+    )
+    return index
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build the BM25 lexical index for the RAG API.")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    build = subcommands.add_parser("build", help="Index new or changed filings into a new segment")
+    build.add_argument("--dir", required=True, help="Directory of {TICKER}_{YEAR}_10K.txt files")
+    build.add_argument("--out", default="lexical_index", help="Index directory")
+    build.add_argument("--tickers", default=None, help="Comma-separated tickers to index")
+    build.add_argument("--chunk-size", type=int, default=1200)
+    build.add_argument("--chunk-overlap", type=int, default=150)
+    build.add_argument("--chunker", choices=("sections", "recursive"), default="sections")
+    build.add_argument("--chunk-ids", choices=CHUNK_ID_SCHEMES, default="content", help="Must match ingestion")
+    build.add_argument("--workers", type=int, default=None)
+    build.add_argument("--force", action="store_true", help="Re-index filings even if unchanged")
+
+    compact = subcommands.add_parser("compact", help="Merge all segments and drop retired rows")
+    compact.add_argument("--out", default="lexical_index", help="Index directory")
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.command == "build":
+        tickers = args.tickers.split(",") if args.tickers else None
+        index = build_lexical_index(
+            args.out,
+            discover_local_filings(args.dir, tickers),
+            chunk_size=args.chunk_size,
+            chunk_overlap=args.chunk_overlap,
+            chunker=args.chunker,
+            chunk_id_scheme=args.chunk_ids,
+            force=args.force,
+            workers=args.workers,
+        )
+    else:
+        index = LexicalIndex.open(args.out)
+        index.compact()
+    logger.info(f"Lexical index: {index.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,830 @@
+"""In-process, memory-mapped vector store used as an offline alternative to Pinecone.
+
+Index directory layout::
+
+    manifest.json        count, dim, dtype, embedding profile, metadata column schema, IVF settings
+    embeddings.npy       (count, dim) unit-normalized float32/float16 matrix (memory-mapped)
+    codes.npy            optional int8 or packed-bit first-pass codes (see embedding_profiles.py)
+    code_scales.npy      optional (dim,) per-dimension scales of int8 codes
+    texts.bin            UTF-8 page contents back to back (memory-mapped)
+    text_offsets.npy     (count + 1,) int64 byte offsets into texts.bin
+    ids.bin              UTF-8 vector IDs back to back
+    id_offsets.npy       (count + 1,) int64 byte offsets into ids.bin
+    col_<name>.npy       one array per metadata field; strings are dictionary-encoded
+    ivf_centroids.npy    optional (nlist, dim) coarse quantizer centroids
+    ivf_offsets.npy      optional (nlist + 1,) offsets into ivf_rows.npy
+    ivf_rows.npy         optional row ids grouped by IVF list
+
+Build one from the live Pinecone index with::
+
+    python local_vector_store.py export --out ./local_index --dtype float16 --ivf
+
+Derive a smaller index for another embedding profile, and measure its recall
+against the original::
+
+    python local_vector_store.py convert --src ./local_index --out ./local_index_1024_int8 \
+        --profile text-embedding-3-large:1024:int8
+    python local_vector_store.py evaluate --index ./local_index_1024_int8 --reference ./local_index
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Any, Iterable
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from embedding_profiles import MATRYOSHKA_MODELS, EmbeddingProfile, Quantizer
+from mmr import mmr_select
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = "manifest.json"
+FORMAT_VERSION = 1
+SUPPORTED_DTYPES = ("float32", "float16")
+_BLOCK_ROWS = 16384
+_MISSING_CODE = -1
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def write_strings(path: Path, offsets_path: Path, values: list[str]) -> None:
+    """Write strings back to back with their byte offsets; read them with ``StringColumn``."""
+    encoded = [value.encode("utf-8") for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(item) for item in encoded], out=offsets[1:])
+    path.write_bytes(b"".join(encoded))
+    np.save(offsets_path, offsets)
+
+
+class StringColumn:
+    """Variable-length strings read lazily from a memory-mapped blob."""
+
+    def __init__(self, path: Path, offsets_path: Path):
+        self.offsets = np.load(offsets_path, mmap_mode="r")
+        size = int(self.offsets[-1]) if len(self.offsets) else 0
+        self.blob = np.memmap(path, dtype=np.uint8, mode="r") if size else np.zeros(0, dtype=np.uint8)
+
+    def __getitem__(self, row: int) -> str:
+        start, end = int(self.offsets[row]), int(self.offsets[row + 1])
+        return self.blob[start:end].tobytes().decode("utf-8")
+
+
+def _encode_columns(metadatas: list[dict[str, Any]]) -> tuple[dict[str, dict], dict[str, np.ndarray]]:
+    """Turn per-row metadata dicts into typed column arrays plus a schema."""
+    names = sorted({key for metadata in metadatas for key in metadata})
+    schema: dict[str, dict] = {}
+    arrays: dict[str, np.ndarray] = {}
+
+    for name in names:
+        values = [metadata.get(name) for metadata in metadatas]
+        present = [value for value in values if value is not None]
+        if present and all(isinstance(value, bool) for value in present):
+            schema[name] = {"kind": "bool"}
+            arrays[name] = np.array([_MISSING_CODE if v is None else int(v) for v in values], dtype=np.int8)
+        elif present and all(isinstance(value, int) and not isinstance(value, bool) for value in present):
+            schema[name] = {"kind": "int"}
+            arrays[name] = np.array([_MISSING_CODE if v is None else v for v in values], dtype=np.int64)
+        elif present and all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in present):
+            schema[name] = {"kind": "float"}
+            arrays[name] = np.array([np.nan if v is None else float(v) for v in values], dtype=np.float64)
+        else:
+            as_text = [None if v is None else (v if isinstance(v, str) else json.dumps(v)) for v in values]
+            categories = sorted({value for value in as_text if value is not None})
+            lookup = {value: code for code, value in enumerate(categories)}
+            schema[name] = {"kind": "category", "values": categories}
+            arrays[name] = np.array(
+                [_MISSING_CODE if v is None else lookup[v] for v in as_text],
+                dtype=np.int32,
+            )
+    return schema, arrays
+
+
+class MetadataColumns:
+    """Typed, memory-mapped metadata columns with vectorized Pinecone-style filters."""
+
+    def __init__(self, schema: dict[str, dict], columns: dict[str, np.ndarray], count: int):
+        self.schema = schema
+        self.columns = columns
+        self.count = count
+
+    @classmethod
+    def load(cls, path: Path, schema: dict[str, dict], count: int) -> MetadataColumns:
+        columns = {name: np.load(path / f"col_{name}.npy", mmap_mode="r") for name in schema}
+        return cls(schema, columns, count)
+
+    @staticmethod
+    def write(path: Path, metadatas: list[dict[str, Any]]) -> dict[str, dict]:
+        """Write one col_<name>.npy per field and return the schema to store in a manifest."""
+        schema, columns = _encode_columns(metadatas)
+        for name, array in columns.items():
+            np.save(path / f"col_{name}.npy", array)
+        return schema
+
+    def row(self, row: int) -> dict[str, Any]:
+        """Decode one row back into a metadata dict."""
+        metadata: dict[str, Any] = {}
+        for name, spec in self.schema.items():
+            value = self.columns[name][row]
+            kind = spec["kind"]
+            if kind == "float":
+                if not np.isnan(value):
+                    metadata[name] = float(value)
+            elif value == _MISSING_CODE:
+                continue
+            elif kind == "category":
+                metadata[name] = spec["values"][int(value)]
+            elif kind == "bool":
+                metadata[name] = bool(value)
+            else:
+                metadata[name] = int(value)
+        return metadata
+
+    def _encode_filter_value(self, name: str, value: Any) -> Any:
+        spec = self.schema[name]
+        if spec["kind"] == "category":
+            try:
+                return spec["values"].index(value if isinstance(value, str) else json.dumps(value))
+            except ValueError:
+                return None
+        if spec["kind"] == "bool":
+            return int(bool(value))
+        return value
+
+    def _field_mask(self, name: str, condition: Any) -> np.ndarray:
+        if name not in self.schema:
+            return np.zeros(self.count, dtype=bool)
+        column = np.asarray(self.columns[name])
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+
+        mask = np.ones(self.count, dtype=bool)
+        for operator, operand in condition.items():
+            if operator in ("$in", "$nin"):
+                codes = [self._encode_filter_value(name, item) for item in operand]
+                matched = np.isin(column, [code for code in codes if code is not None])
+                mask &= matched if operator == "$in" else ~matched
+                continue
+
+            code = self._encode_filter_value(name, operand)
+            if operator == "$eq":
+                mask &= column == code if code is not None else False
+            elif operator == "$ne":
+                mask &= column != code if code is not None else True
+            elif operator in ("$gt", "$gte", "$lt", "$lte"):
+                if self.schema[name]["kind"] not in ("int", "float"):
+                    raise ValueError(f"Range filter {operator} requires a numeric field, got {name}")
+                present = column != _MISSING_CODE if self.schema[name]["kind"] == "int" else ~np.isnan(column)
+                compare = {
+                    "$gt": np.greater,
+                    "$gte": np.greater_equal,
+                    "$lt": np.less,
+                    "$lte": np.less_equal,
+                }[operator]
+                mask &= present & compare(column, operand)
+            else:
+                raise ValueError(f"Unsupported filter operator: {operator}")
+        return mask
+
+    def filter_mask(self, filter: dict | None) -> np.ndarray | None:
+        """Evaluate a Pinecone-style metadata filter to a boolean row mask (None = all rows)."""
+        if not filter:
+            return None
+        mask = np.ones(self.count, dtype=bool)
+        for key, condition in filter.items():
+            if key == "$and":
+                for clause in condition:
+                    mask &= self.filter_mask(clause)
+            elif key == "$or":
+                any_mask = np.zeros(self.count, dtype=bool)
+                for clause in condition:
+                    any_mask |= self.filter_mask(clause)
+                mask &= any_mask
+            else:
+                mask &= self._field_mask(key, condition)
+        return mask
+
+
+def _train_ivf(matrix: np.ndarray, nlist: int, iterations: int = 10, sample_size: int = 20000, seed: int = 0):
+    """Spherical k-means coarse quantizer; returns centroids and per-row list assignments."""
+    rng = np.random.default_rng(seed)
+    count = matrix.shape[0]
+    sample_rows = rng.choice(count, size=min(sample_size, count), replace=False)
+    sample = np.asarray(matrix[np.sort(sample_rows)], dtype=np.float32)
+    centroids = sample[rng.choice(sample.shape[0], size=nlist, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignment = np.argmax(sample @ centroids.T, axis=1)
+        for list_id in range(nlist):
+            members = sample[assignment == list_id]
+            if len(members):
+                centroids[list_id] = members.sum(axis=0)
+        centroids = _normalize_rows(centroids)
+
+    assignments = np.empty(count, dtype=np.int32)
+    for start in range(0, count, _BLOCK_ROWS):
+        block = np.asarray(matrix[start:start + _BLOCK_ROWS], dtype=np.float32)
+        assignments[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return centroids, assignments
+
+
+def write_index(
+    path: str | Path,
+    *,
+    ids: list[str],
+    embeddings: np.ndarray | list[list[float]],
+    texts: list[str],
+    metadatas: list[dict[str, Any]] | None = None,
+    dtype: str = "float32",
+    ivf_lists: int | None = None,
+    profile: EmbeddingProfile | None = None,
+) -> Path:
+    """
+    Write an index directory from raw vectors, texts and metadata.
+
+    With a ``profile`` the vectors are cut to its dimensions, first-pass codes
+    are written for its quantization, and the profile is recorded in the manifest.
+    """
+    if dtype not in SUPPORTED_DTYPES:
+        raise ValueError(f"Unsupported dtype {dtype}; expected one of {SUPPORTED_DTYPES}")
+    metadatas = metadatas or [{} for _ in texts]
+    if not (len(ids) == len(texts) == len(metadatas) == len(embeddings)):
+        raise ValueError("ids, embeddings, texts and metadatas must have the same length")
+
+    out = Path(path)
+    out.mkdir(parents=True, exist_ok=True)
+
+    vectors = _normalize_rows(np.asarray(embeddings, dtype=np.float32)) if profile is None else profile.prepare(embeddings)
+    matrix = vectors.astype(dtype)
+    np.save(out / "embeddings.npy", matrix)
+    for stale in ("codes.npy", "code_scales.npy"):
+        (out / stale).unlink(missing_ok=True)
+    if profile is not None and profile.quantization != "none":
+        quantizer = Quantizer.fit(profile.quantization, vectors)
+        np.save(out / "codes.npy", quantizer.encode(vectors))
+        if quantizer.scales is not None:
+            np.save(out / "code_scales.npy", quantizer.scales.astype(np.float32))
+    del vectors
+    write_strings(out / "texts.bin", out / "text_offsets.npy", texts)
+    write_strings(out / "ids.bin", out / "id_offsets.npy", ids)
+
+    schema = MetadataColumns.write(out, metadatas)
+
+    ivf = None
+    for stale in ("ivf_centroids.npy", "ivf_offsets.npy", "ivf_rows.npy"):
+        (out / stale).unlink(missing_ok=True)
+    if ivf_lists and len(ids) >= ivf_lists:
+        centroids, assignments = _train_ivf(matrix, ivf_lists)
+        order = np.argsort(assignments, kind="stable").astype(np.int64)
+        offsets = np.zeros(ivf_lists + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assignments, minlength=ivf_lists), out=offsets[1:])
+        np.save(out / "ivf_centroids.npy", centroids.astype(np.float32))
+        np.save(out / "ivf_offsets.npy", offsets)
+        np.save(out / "ivf_rows.npy", order)
+        ivf = {"nlist": ivf_lists}
+
+    manifest = {
+        "version": FORMAT_VERSION,
+        "count": len(ids),
+        "dim": int(matrix.shape[1]) if len(ids) else 0,
+        "dtype": dtype,
+        "metric": "cosine",
+        "embedding_profile": profile.as_dict() if profile is not None else None,
+        "columns": schema,
+        "ivf": ivf,
+    }
+    (out / MANIFEST_FILE).write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    logger.info(f"Wrote local index with {len(ids)} vectors ({dtype}, profile {profile}) to {out}")
+    return out
+
+
+class LocalVectorStore(VectorStore):
+    """
+    NumPy-backed vector store over a memory-mapped index directory.
+
+    Search is exact (blocked matrix-vector product over the whole matrix) unless
+    the index was built with an IVF coarse quantizer and ``nprobe`` is set, in
+    which case only the ``nprobe`` closest lists are scanned. Metadata filters use
+    the same operators as Pinecone (``$eq``, ``$ne``, ``$in``, ``$nin``, ``$gt``,
+    ``$gte``, ``$lt``, ``$lte``, ``$and``, ``$or``) and are evaluated as
+    vectorized masks over the metadata columns.
+
+    Indexes written with a quantized embedding profile rank candidates on their
+    first-pass codes, then rescore the best ``rescore_factor * k`` of them
+    against the full-precision vectors (default: the profile's factor).
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        embedding: Embeddings,
+        *,
+        nprobe: int | None = None,
+        rescore_factor: int | None = None,
+    ):
+        self.path = Path(path)
+        self._embedding = embedding
+        self.nprobe = nprobe
+        self._rescore_factor = rescore_factor
+        self._load()
+
+    def _load(self) -> None:
+        manifest_path = self.path / MANIFEST_FILE
+        if not manifest_path.is_file():
+            raise FileNotFoundError(f"No local vector index found at {self.path}")
+        self.manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+        if self.manifest.get("version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported local index version: {self.manifest.get('version')}")
+
+        self.count = int(self.manifest["count"])
+        self.dim = int(self.manifest["dim"])
+        self.matrix = np.load(self.path / "embeddings.npy", mmap_mode="r")
+        self._texts = StringColumn(self.path / "texts.bin", self.path / "text_offsets.npy")
+        self._ids = StringColumn(self.path / "ids.bin", self.path / "id_offsets.npy")
+        self.metadata_columns = MetadataColumns.load(self.path, self.manifest["columns"], self.count)
+        self._row_by_id: dict[str, int] | None = None
+
+        stored_profile = self.manifest.get("embedding_profile")
+        self.profile = EmbeddingProfile.from_dict(stored_profile) if stored_profile else None
+        self.codes = self.quantizer = None
+        if self.profile is not None and self.profile.quantization != "none":
+            scales_path = self.path / "code_scales.npy"
+            self.codes = np.load(self.path / "codes.npy", mmap_mode="r")
+            self.quantizer = Quantizer(
+                self.profile.quantization,
+                self.dim,
+                np.load(scales_path) if scales_path.is_file() else None,
+            )
+        self.rescore_factor = self._rescore_factor or (self.profile.rescore_factor if self.profile else 1)
+
+        self.ivf = None
+        if self.manifest.get("ivf"):
+            self.ivf = (
+                np.load(self.path / "ivf_centroids.npy"),
+                np.load(self.path / "ivf_offsets.npy"),
+                np.load(self.path / "ivf_rows.npy", mmap_mode="r"),
+            )
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding
+
+    # ------------------------------------------------------------------
+    # Metadata
+    # ------------------------------------------------------------------
+    def _metadata(self, row: int) -> dict[str, Any]:
+        return self.metadata_columns.row(row)
+
+    def _document(self, row: int) -> Document:
+        return Document(id=self._ids[row], page_content=self._texts[row], metadata=self._metadata(row))
+
+    def fetch_vectors(self, ids: list[str]) -> dict[str, np.ndarray]:
+        """Stored (unit-length) vectors by vector ID, like Pinecone's ``fetch``; unknown IDs are left out."""
+        if self._row_by_id is None:
+            self._row_by_id = {self._ids[row]: row for row in range(self.count)}
+        rows = {vector_id: self._row_by_id[vector_id] for vector_id in ids if vector_id in self._row_by_id}
+        if not rows:
+            return {}
+        matrix = np.asarray(self.matrix[list(rows.values())], dtype=np.float32)
+        return dict(zip(rows, matrix))
+
+    def filter_mask(self, filter: dict | None) -> np.ndarray | None:
+        """Evaluate a Pinecone-style metadata filter to a boolean row mask (None = all rows)."""
+        return self.metadata_columns.filter_mask(filter)
+
+    # ------------------------------------------------------------------
+    # Search
+    # ------------------------------------------------------------------
+    def _scan(self, matrix: np.ndarray, rows: np.ndarray | None, score_block) -> np.ndarray:
+        """``score_block`` applied to the given rows of ``matrix`` (all rows, a block at a time, when None)."""
+        if rows is not None:
+            return score_block(np.asarray(matrix[rows]))
+        scores = np.empty(self.count, dtype=np.float32)
+        for start in range(0, self.count, _BLOCK_ROWS):
+            block = np.asarray(matrix[start:start + _BLOCK_ROWS])
+            scores[start:start + len(block)] = score_block(block)
+        return scores
+
+    def _score_rows(self, rows: np.ndarray | None, query: np.ndarray) -> np.ndarray:
+        """Dot products between the query and the given rows (all rows when None)."""
+        if rows is None and self.matrix.dtype == np.float32:
+            return np.asarray(self.matrix @ query)
+        return self._scan(self.matrix, rows, lambda block: block.astype(np.float32, copy=False) @ query)
+
+    def _ivf_candidates(self, query: np.ndarray) -> np.ndarray:
+        centroids, offsets, ivf_rows = self.ivf
+        nprobe = min(self.nprobe, len(centroids))
+        probe = np.argpartition(-(centroids @ query), nprobe - 1)[:nprobe]
+        return np.sort(np.concatenate([ivf_rows[offsets[i]:offsets[i + 1]] for i in probe]))
+
+    def _top_rows(self, query: np.ndarray, k: int, filter: dict | None) -> tuple[np.ndarray, np.ndarray]:
+        if self.count == 0 or k <= 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        mask = self.filter_mask(filter)
+        rows = None
+        if self.ivf is not None and self.nprobe:
+            rows = self._ivf_candidates(query)
+            if mask is not None:
+                rows = rows[mask[rows]]
+            if len(rows) < k:
+                # Too few candidates in the probed lists; fall back to exact search.
+                rows = None
+        if rows is None and mask is not None:
+            rows = np.flatnonzero(mask)
+
+        if self.codes is None:
+            return self._best(rows, self._score_rows(rows, query), k)
+        # Rank on the compact codes, then rescore the shortlist at full precision.
+        approximate = self._scan(self.codes, rows, self.quantizer.scorer(query))
+        shortlist, _ = self._best(rows, approximate, k * self.rescore_factor)
+        shortlist = np.sort(shortlist)
+        return self._best(shortlist, self._score_rows(shortlist, query), k)
+
+    @staticmethod
+    def _best(rows: np.ndarray | None, scores: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+        """The ``k`` highest scoring rows, best first (``rows`` maps score positions to rows; None = identity)."""
+        if len(scores) == 0:
+            return np.zeros(0, dtype=np.int64), scores
+        top = min(k, len(scores))
+        best = np.argpartition(-scores, top - 1)[:top]
+        best = best[np.argsort(-scores[best], kind="stable")]
+        row_ids = best if rows is None else rows[best]
+        return row_ids, scores[best]
+
+    def _embed_query(self, query: str) -> np.ndarray:
+        return self._normalize_query(self._embedding.embed_query(query))
+
+    def _normalize_query(self, embedding: list[float] | np.ndarray) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        if self.profile is not None and self.profile.truncated and vector.shape[0] > self.dim:
+            # A full-width query for a Matryoshka index: keep the prefix the index stores.
+            vector = vector[: self.dim]
+        if vector.shape[0] != self.dim:
+            raise ValueError(
+                f"Query embedding has {vector.shape[0]} dimensions but the local index has {self.dim}"
+            )
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm else vector
+
+    def similarity_search_by_vector_with_score(
+        self,
+        embedding: list[float],
+        *,
+        k: int = 4,
+        filter: dict | None = None,
+        **kwargs: Any,
+    ) -> list[tuple[Document, float]]:
+        rows, scores = self._top_rows(self._normalize_query(embedding), k, filter)
+        return [(self._document(int(row)), float(score)) for row, score in zip(rows, scores)]
+
+    def similarity_search_with_score(
+        self,
+        query: str,
+        k: int = 4,
+        filter: dict | None = None,
+        **kwargs: Any,
+    ) -> list[tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_score(
+            self._embedding.embed_query(query), k=k, filter=filter
+        )
+
+    def similarity_search_by_vector(
+        self,
+        embedding: list[float],
+        k: int = 4,
+        filter: dict | None = None,
+        **kwargs: Any,
+    ) -> list[Document]:
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k=k, filter=filter)]
+
+    def similarity_search(
+        self,
+        query: str,
+        k: int = 4,
+        filter: dict | None = None,
+        **kwargs: Any,
+    ) -> list[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k, filter=filter)]
+
+    def max_marginal_relevance_search_by_vector(
+        self,
+        embedding: list[float],
+        k: int = 4,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        filter: dict | None = None,
+        **kwargs: Any,
+    ) -> list[Document]:
+        query = self._normalize_query(embedding)
+        rows, scores = self._top_rows(query, fetch_k, filter)
+        if len(rows) == 0:
+            return []
+        candidates = np.asarray(self.matrix[rows], dtype=np.float32)
+        selected = mmr_select(scores, candidates, k, lambda_mult)
+        return [self._document(int(rows[i])) for i in selected]
+
+    def max_marginal_relevance_search(
+        self,
+        query: str,
+        k: int = 4,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        filter: dict | None = None,
+        **kwargs: Any,
+    ) -> list[Document]:
+        return self.max_marginal_relevance_search_by_vector(
+            self._embedding.embed_query(query), k, fetch_k, lambda_mult, filter
+        )
+
+    def _select_relevance_score_fn(self):
+        return self._cosine_relevance_score_fn
+
+    def describe_index_stats(self) -> dict[str, Any]:
+        """Mirror the shape of Pinecone's describe_index_stats for the debug endpoint."""
+        return {
+            "dimension": self.dim,
+            "total_vector_count": self.count,
+            "dtype": self.manifest["dtype"],
+            "embedding_profile": str(self.profile) if self.profile else None,
+            "first_pass_bytes_per_vector": self.codes.shape[1] if self.codes is not None else self.dim * self.matrix.itemsize,
+            "rescore_factor": self.rescore_factor if self.codes is not None else None,
+            "ivf_lists": (self.manifest.get("ivf") or {}).get("nlist"),
+            "nprobe": self.nprobe,
+            "path": str(self.path),
+        }
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: list[dict] | None = None,
+        *,
+        ids: list[str] | None = None,
+        **kwargs: Any,
+    ) -> list[str]:
+        """Append texts by rewriting the index; intended for small offline corpora."""
+        texts = list(texts)
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [f"local:{self.count + i}" for i in range(len(texts))]
+        vectors = np.asarray(self._embedding.embed_documents(texts), dtype=np.float32)
+        if self.profile is not None:
+            vectors = self.profile.prepare(vectors)
+        if self.count:
+            vectors = np.vstack([np.asarray(self.matrix, dtype=np.float32), vectors])
+
+        existing_rows = range(self.count)
+        write_index(
+            self.path,
+            ids=[self._ids[row] for row in existing_rows] + ids,
+            embeddings=vectors,
+            texts=[self._texts[row] for row in existing_rows] + texts,
+            metadatas=[self._metadata(row) for row in existing_rows] + metadatas,
+            dtype=self.manifest["dtype"],
+            ivf_lists=(self.manifest.get("ivf") or {}).get("nlist"),
+            profile=self.profile,
+        )
+        self._load()
+        return ids
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: list[str],
+        embedding: Embeddings,
+        metadatas: list[dict] | None = None,
+        *,
+        ids: list[str] | None = None,
+        path: str | Path = "local_index",
+        dtype: str = "float32",
+        ivf_lists: int | None = None,
+        nprobe: int | None = None,
+        profile: EmbeddingProfile | None = None,
+        **kwargs: Any,
+    ) -> LocalVectorStore:
+        ids = ids or [f"local:{i}" for i in range(len(texts))]
+        write_index(
+            path,
+            ids=ids,
+            embeddings=embedding.embed_documents(list(texts)),
+            texts=list(texts),
+            metadatas=metadatas,
+            dtype=dtype,
+            ivf_lists=ivf_lists,
+            profile=profile,
+        )
+        return cls(path, embedding, nprobe=nprobe)
+
+
+def export_pinecone_index(
+    index,
+    out: str | Path,
+    *,
+    namespace: str | None = None,
+    text_key: str = "text",
+    dtype: str = "float32",
+    ivf_lists: int | None = None,
+    profile: EmbeddingProfile | None = None,
+    batch_size: int = 100,
+) -> Path:
+    """Copy every vector (values, text and metadata) from a Pinecone index into a local index."""
+    ids: list[str] = []
+    vectors: list[list[float]] = []
+    texts: list[str] = []
+    metadatas: list[dict[str, Any]] = []
+
+    for page in index.list(namespace=namespace or ""):
+        page_ids = list(page)
+        for start in range(0, len(page_ids), batch_size):
+            fetched = index.fetch(ids=page_ids[start:start + batch_size], namespace=namespace or "")
+            for vector_id, vector in fetched.vectors.items():
+                metadata = dict(vector.metadata or {})
+                text = metadata.pop(text_key, None)
+                if text is None:
+                    logger.warning(f"Skipping {vector_id}: no '{text_key}' metadata")
+                    continue
+                ids.append(vector_id)
+                vectors.append(vector.values)
+                texts.append(text)
+                metadatas.append(metadata)
+        logger.info(f"Exported {len(ids)} vectors so far")
+
+    return write_index(
+        out,
+        ids=ids,
+        embeddings=vectors,
+        texts=texts,
+        metadatas=metadatas,
+        dtype=dtype,
+        ivf_lists=ivf_lists,
+        profile=profile,
+    )
+
+
+def convert_index(
+    src: str | Path,
+    out: str | Path,
+    profile: EmbeddingProfile,
+    *,
+    dtype: str | None = None,
+    ivf_lists: int | None = None,
+) -> Path:
+    """
+    Rewrite a local index for another profile of the same model, without embedding again.
+
+    Only narrowing works (a 3072-dimension index can become 1024 dimensions, not
+    the reverse). An index that records no profile is taken to hold ``profile.model``
+    vectors.
+    """
+    source = LocalVectorStore(src, embedding=None)
+    if source.profile is not None and source.profile.model != profile.model:
+        raise ValueError(f"{src} holds {source.profile.model} vectors, not {profile.model}")
+    if source.dim < profile.dimensions:
+        raise ValueError(f"{src} has {source.dim} dimensions; cannot widen to {profile.dimensions}")
+    if source.dim > profile.dimensions and profile.model not in MATRYOSHKA_MODELS:
+        raise ValueError(f"{profile.model} vectors cannot be truncated to {profile.dimensions} dimensions")
+
+    rows = range(source.count)
+    return write_index(
+        out,
+        ids=[source._ids[row] for row in rows],
+        embeddings=np.asarray(source.matrix, dtype=np.float32),
+        texts=[source._texts[row] for row in rows],
+        metadatas=[source._metadata(row) for row in rows],
+        dtype=dtype or source.manifest["dtype"],
+        ivf_lists=ivf_lists if ivf_lists is not None else (source.manifest.get("ivf") or {}).get("nlist"),
+        profile=profile,
+    )
+
+
+def evaluate_index(
+    index: str | Path,
+    reference: str | Path,
+    *,
+    queries: int = 200,
+    k: int = 10,
+    nprobe: int | None = None,
+    seed: int = 0,
+) -> dict[str, Any]:
+    """
+    Recall@k of ``index`` against exact search over ``reference``, plus search time and bytes read per vector.
+
+    Stored chunk vectors of the reference, sampled at random, stand in for query
+    embeddings; each query's own chunk is left out of both result lists.
+    """
+    candidate = LocalVectorStore(index, embedding=None, nprobe=nprobe)
+    exact = LocalVectorStore(reference, embedding=None)
+    sample = np.random.default_rng(seed).choice(exact.count, size=min(queries, exact.count), replace=False)
+
+    recalls, candidate_ms, exact_ms = [], [], []
+    for row in np.sort(sample):
+        query = np.asarray(exact.matrix[row], dtype=np.float32)
+        query_id = exact._ids[int(row)]
+
+        started = time.perf_counter()
+        expected, _ = exact._top_rows(query, k + 1, None)
+        exact_ms.append((time.perf_counter() - started) * 1000)
+        started = time.perf_counter()
+        found, _ = candidate._top_rows(candidate._normalize_query(query), k + 1, None)
+        candidate_ms.append((time.perf_counter() - started) * 1000)
+
+        expected_ids = [exact._ids[int(r)] for r in expected if exact._ids[int(r)] != query_id][:k]
+        found_ids = {candidate._ids[int(r)] for r in found if candidate._ids[int(r)] != query_id}
+        if expected_ids:
+            recalls.append(len(found_ids.intersection(expected_ids)) / len(expected_ids))
+
+    stats = candidate.describe_index_stats()
+    return {
+        "index": str(index),
+        "reference": str(reference),
+        "embedding_profile": stats["embedding_profile"],
+        "queries": len(sample),
+        "k": k,
+        f"recall_at_{k}": round(float(np.mean(recalls)), 4) if recalls else None,
+        "search_ms_p50": round(float(np.median(candidate_ms)), 3) if candidate_ms else None,
+        "reference_search_ms_p50": round(float(np.median(exact_ms)), 3) if exact_ms else None,
+        "first_pass_bytes_per_vector": stats["first_pass_bytes_per_vector"],
+        "reference_bytes_per_vector": exact.dim * exact.matrix.itemsize,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build a local vector index for the RAG API.")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    export = subcommands.add_parser("export", help="Copy the Pinecone index into a local index directory")
+    export.add_argument("--out", required=True, help="Output index directory")
+    export.add_argument("--namespace", default=None, help="Pinecone namespace to export")
+    export.add_argument("--dtype", choices=SUPPORTED_DTYPES, default="float32")
+    export.add_argument(
+        "--ivf",
+        type=int,
+        nargs="?",
+        const=-1,
+        default=None,
+        help="Build an IVF approximate index; optional list count (default sqrt(N))",
+    )
+    export.add_argument("--profile", type=EmbeddingProfile.parse, help="Embedding profile to store the vectors as")
+
+    convert = subcommands.add_parser("convert", help="Rewrite a local index for a narrower or quantized profile")
+    convert.add_argument("--src", required=True, help="Existing local index directory")
+    convert.add_argument("--out", required=True, help="Output index directory")
+    convert.add_argument("--profile", required=True, type=EmbeddingProfile.parse, help="e.g. text-embedding-3-large:1024:int8")
+    convert.add_argument("--dtype", choices=SUPPORTED_DTYPES, default=None, help="Full-precision dtype (default: the source's)")
+
+    evaluate = subcommands.add_parser("evaluate", help="Recall@k of an index against exact search over a reference index")
+    evaluate.add_argument("--index", required=True)
+    evaluate.add_argument("--reference", required=True)
+    evaluate.add_argument("--queries", type=int, default=200)
+    evaluate.add_argument("--k", type=int, default=10)
+    evaluate.add_argument("--nprobe", type=int, default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.command == "convert":
+        convert_index(args.src, args.out, args.profile, dtype=args.dtype)
+        return
+    if args.command == "evaluate":
+        result = evaluate_index(args.index, args.reference, queries=args.queries, k=args.k, nprobe=args.nprobe)
+        print(json.dumps(result, indent=2))
+        return
+
+    from dotenv import load_dotenv
+    from pinecone import Pinecone
+
+    load_dotenv()
+    pinecone_client = Pinecone(api_key=os.environ["PINECONE_API_KEY"])
+    index = pinecone_client.Index(os.environ["PINECONE_INDEX_NAME"])
+
+    ivf_lists = args.ivf
+    if ivf_lists == -1:
+        total = index.describe_index_stats().get("total_vector_count", 0)
+        ivf_lists = max(1, int(np.sqrt(total)))
+
+    export_pinecone_index(
+        index,
+        args.out,
+        namespace=args.namespace,
+        dtype=args.dtype,
+        ivf_lists=ivf_lists,
+        profile=args.profile,
+    )
+
+
+if __name__ == "__main__":
+    main()
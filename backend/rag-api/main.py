@@ -1,39 +1,327 @@
-from contextlib import asynccontextmanager
-from typing import List
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import AsyncExitStack, aclosing, asynccontextmanager, contextmanager
+from dataclasses import replace
+from functools import partial
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable, List
+import asyncio
+import contextvars
+import json
 import logging
+import sys
+import time
 
+import numpy as np
 from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from google.cloud import firestore
-from pydantic import BaseModel, Field
+from starlette.background import BackgroundTask
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field, field_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from langchain_pinecone import PineconeVectorStore
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
-from pinecone import Pinecone
+from langchain_core.documents import Document
+
+from admission import AdmissionGate, Overloaded, RetryPolicy, Upstream
+from answer_cache import AnswerCache, create_answer_cache, normalize_question, question_numbers
+from context import TokenCounter, assemble_context
+from embedding_profiles import DEFAULT_PROFILE, EmbeddingProfile, check_index_profile
+from filing_sections import normalize_item
+from firebase_client import create_async_firestore_client, create_firestore_client
+from ingestion import (
+    ManifestIndex,
+    aget_ingestion_record,
+    alist_ingestion_records,
+    get_ingestion_record,
+    list_ingestion_records,
+)
+from mmr import ChunkVectorCache, mmr_select
+from retrieval import FUSION_METHODS, RetrievalResult, fuse_results, orchestrate_retrieval
+from rewrite_cache import RewriteCache, create_rewrite_cache, prompt_version, rewrite_key
+from single_flight import SingleFlight
+from symbols import DEFAULT_COMPANIES_CSV, SymbolIndex, normalize_ticker
+from telemetry import REQUEST_DURATION, record, render_metrics, render_stats, span, trace_run
+
+# The OpenAI, Pinecone and Firestore client libraries, and the langchain_core base classes
+# behind the embeddings cache and the local indexes, take seconds to import. They are
+# imported when the components are built, after the server is already answering /health.
+if TYPE_CHECKING:
+    from google.cloud import firestore
+    from langchain_core.embeddings import Embeddings
+    from langchain_core.vectorstores import VectorStore
+    from langchain_openai import ChatOpenAI
 
-from firebase_client import create_firestore_client
-from ingestion import get_ingestion_record, list_ingestion_records
+    from financial_facts import FinancialFacts
+    from lexical_index import LexicalIndex
+    from rerank import RerankStage
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+LLM_MODEL = "gpt-4o-mini"
+
+
+STARTUP_MODES = ("background", "lazy", "eager")
+
 
 class Settings(BaseSettings):
-    pinecone_api_key: str = Field(..., alias="PINECONE_API_KEY")
-    pinecone_index_name: str = Field(..., alias="PINECONE_INDEX_NAME")
+    startup_mode: str = Field(
+        default="background",
+        alias="STARTUP_MODE",
+        description=(
+            "'background': serve / and /health at once and build the clients in a warm-up task; "
+            "'lazy': build them on the first request that needs them; 'eager': build them before serving."
+        ),
+    )
+    startup_warmup: bool = Field(
+        default=True,
+        alias="STARTUP_WARMUP",
+        description="Once the clients are built, open the embeddings and vector-store connections with one query.",
+    )
+    vector_store_backend: str = Field(
+        default="pinecone",
+        alias="VECTOR_STORE_BACKEND",
+        description="Vector store backend: 'pinecone' or 'local'.",
+    )
+    pinecone_api_key: str | None = Field(default=None, alias="PINECONE_API_KEY")
+    pinecone_index_name: str | None = Field(default=None, alias="PINECONE_INDEX_NAME")
+    local_index_path: str = Field(
+        default="local_index",
+        alias="LOCAL_INDEX_PATH",
+        description="Index directory written by local_vector_store.py when VECTOR_STORE_BACKEND=local.",
+    )
+    local_index_nprobe: int | None = Field(
+        default=None,
+        alias="LOCAL_INDEX_NPROBE",
+        description="IVF lists to scan per query; unset for exact search.",
+    )
+    local_index_rescore_factor: int | None = Field(
+        default=None,
+        alias="LOCAL_INDEX_RESCORE_FACTOR",
+        description="Quantized indexes rescore this many candidates per result at full precision (default: 4 int8, 10 binary).",
+    )
+    embedding_profile: str = Field(
+        default=DEFAULT_PROFILE,
+        alias="EMBEDDING_PROFILE",
+        description=(
+            "model[:dimensions[:quantization]] the index was built with, e.g. text-embedding-3-large:1024:int8. "
+            "Queries are embedded to match, and startup fails when the index records a different profile."
+        ),
+    )
     openai_api_key: str = Field(..., alias="OPENAI_API_KEY")
     firebase_service_account_json: str | None = Field(
         default=None,
         alias="FIREBASE_SERVICE_ACCOUNT_JSON",
     )
     gcp_project_id: str | None = Field(default=None, alias="GCP_PROJECT_ID")
+    firestore_async: bool = Field(
+        default=True,
+        alias="FIRESTORE_ASYNC",
+        description="Read ingestion manifests with Firestore's AsyncClient; false uses the sync client in a thread.",
+    )
+    manifest_index_mode: str = Field(
+        default="listen",
+        alias="MANIFEST_INDEX_MODE",
+        description="How the in-memory ingestion manifest index stays current: 'listen' (Firestore listener), 'poll' or 'off'.",
+    )
+    manifest_poll_interval_seconds: float = Field(default=60.0, alias="MANIFEST_POLL_INTERVAL_SECONDS")
     allowed_origins: str | None = Field(
         default=None,
         alias="ALLOWED_ORIGINS",
         description="Comma separated list of allowed origins for CORS.",
     )
+    retrieval_llm_timeout_seconds: float = Field(
+        default=8.0,
+        alias="RETRIEVAL_LLM_TIMEOUT_SECONDS",
+        description="Timeout for the query refinement and expansion LLM stages.",
+    )
+    retrieval_search_timeout_seconds: float = Field(
+        default=5.0,
+        alias="RETRIEVAL_SEARCH_TIMEOUT_SECONDS",
+        description="Timeout for each individual vector search.",
+    )
+    retrieval_total_timeout_seconds: float = Field(
+        default=15.0,
+        alias="RETRIEVAL_TOTAL_TIMEOUT_SECONDS",
+        description="Overall retrieval deadline; partial results are used after it.",
+    )
+    retrieval_fusion_method: str = Field(
+        default="rrf",
+        alias="RETRIEVAL_FUSION_METHOD",
+        description="How multi-query results are merged: 'rrf' (reciprocal-rank fusion) or 'score' (score-weighted).",
+    )
+    retrieval_rrf_k: int = Field(default=60, alias="RETRIEVAL_RRF_K")
+    lexical_index_path: str = Field(
+        default="lexical_index",
+        alias="LEXICAL_INDEX_PATH",
+        description="BM25 index directory built with lexical_index.py; lexical search is off when it is missing.",
+    )
+    auto_ticker_filter: bool = Field(
+        default=True,
+        alias="AUTO_TICKER_FILTER",
+        description="Restrict retrieval to tickers/companies named in the question when no filter is given.",
+    )
+    symbol_index_path: str = Field(default=str(DEFAULT_COMPANIES_CSV), alias="SYMBOL_INDEX_PATH")
+    facts_index_path: str = Field(
+        default="facts_index",
+        alias="FACTS_INDEX_PATH",
+        description="Financial facts index built with financial_facts.py; numeric questions go through RAG when it is missing.",
+    )
+    answer_cache_enabled: bool = Field(default=True, alias="ANSWER_CACHE_ENABLED")
+    answer_cache_backend: str = Field(
+        default="memory",
+        alias="ANSWER_CACHE_BACKEND",
+        description="Answer cache backend: 'memory' or 'sqlite'.",
+    )
+    answer_cache_path: str = Field(
+        default="answer_cache.sqlite3",
+        alias="ANSWER_CACHE_PATH",
+        description="SQLite file used when ANSWER_CACHE_BACKEND=sqlite.",
+    )
+    answer_cache_ttl_seconds: float = Field(default=6 * 60 * 60, alias="ANSWER_CACHE_TTL_SECONDS")
+    answer_cache_max_entries: int = Field(default=1000, alias="ANSWER_CACHE_MAX_ENTRIES")
+    answer_cache_max_bytes: int = Field(default=64 * 1024 * 1024, alias="ANSWER_CACHE_MAX_BYTES")
+    answer_cache_similarity_threshold: float = Field(
+        default=0.95,
+        alias="ANSWER_CACHE_SIMILARITY_THRESHOLD",
+        description="Minimum cosine similarity for a near-duplicate question to reuse a cached answer.",
+    )
+    rewrite_cache_enabled: bool = Field(default=True, alias="REWRITE_CACHE_ENABLED")
+    rewrite_cache_backend: str = Field(
+        default="sqlite",
+        alias="REWRITE_CACHE_BACKEND",
+        description="Backend for cached LLM query rewrites: 'memory' or 'sqlite'.",
+    )
+    rewrite_cache_path: str = Field(
+        default="rewrite_cache.sqlite3",
+        alias="REWRITE_CACHE_PATH",
+        description="SQLite file used when REWRITE_CACHE_BACKEND=sqlite.",
+    )
+    rewrite_cache_ttl_seconds: float = Field(default=7 * 24 * 60 * 60, alias="REWRITE_CACHE_TTL_SECONDS")
+    rewrite_cache_max_entries: int = Field(default=5000, alias="REWRITE_CACHE_MAX_ENTRIES")
+    context_token_budget: int = Field(
+        default=3000,
+        alias="CONTEXT_TOKEN_BUDGET",
+        description="Maximum tokens of retrieved context placed in the answer prompt.",
+    )
+    context_duplicate_threshold: float = Field(
+        default=0.85,
+        alias="CONTEXT_DUPLICATE_THRESHOLD",
+        description="Word-trigram overlap at which a retrieved passage is dropped as a near-duplicate.",
+    )
+    mmr_fetch_k: int = Field(
+        default=0,
+        alias="MMR_FETCH_K",
+        description="Candidates MMR selects from (0 = three times k).",
+    )
+    mmr_lambda: float = Field(
+        default=0.5,
+        alias="MMR_LAMBDA",
+        description="MMR trade-off between relevance (1) and diversity (0).",
+    )
+    mmr_vector_dims: int = Field(
+        default=256,
+        alias="MMR_VECTOR_DIMS",
+        description="Leading (Matryoshka) dimensions of chunk vectors kept for MMR diversity (0 = all).",
+    )
+    mmr_vector_cache_max_entries: int = Field(
+        default=20000,
+        alias="MMR_VECTOR_CACHE_MAX_ENTRIES",
+        description="Chunk vectors cached for MMR as float16 (512 bytes each at 256 dimensions).",
+    )
+    rerank_enabled: bool = Field(
+        default=False,
+        alias="RERANK_ENABLED",
+        description="Over-fetch candidates, rerank them and send only the best k to generation.",
+    )
+    rerank_model: str = Field(
+        default="lexical",
+        alias="RERANK_MODEL",
+        description="Reranker: 'lexical' (no model) or 'cross-encoder:<sentence-transformers model name>'.",
+    )
+    rerank_candidates: int = Field(
+        default=20,
+        alias="RERANK_CANDIDATES",
+        description="Candidates retrieved for reranking (at least k).",
+    )
+    rerank_budget_ms: float = Field(
+        default=50.0,
+        alias="RERANK_BUDGET_MS",
+        description="Time allowed for reranking; after it the candidates are used in retrieval order.",
+    )
+    rerank_retrieval_weight: float = Field(
+        default=0.3,
+        alias="RERANK_RETRIEVAL_WEIGHT",
+        description="Weight of the original retrieval order in the reranked score (0 = reranker only).",
+    )
+    batch_max_items: int = Field(default=100, alias="BATCH_MAX_ITEMS")
+    batch_search_concurrency: int = Field(
+        default=8,
+        alias="BATCH_SEARCH_CONCURRENCY",
+        description="Maximum concurrent vector searches per /api/ask/batch call.",
+    )
+    batch_llm_concurrency: int = Field(
+        default=4,
+        alias="BATCH_LLM_CONCURRENCY",
+        description="Maximum concurrent LLM calls (rewrites and answers) per /api/ask/batch call.",
+    )
+    embedding_cache_max_entries: int = Field(
+        default=2000,
+        alias="EMBEDDING_CACHE_MAX_ENTRIES",
+        description="Query embeddings kept in memory (about 12 KB each for text-embedding-3-large).",
+    )
+    embedding_batch_window_ms: float = Field(
+        default=5.0,
+        alias="EMBEDDING_BATCH_WINDOW_MS",
+        description="How long a query embedding waits for others to share its API call.",
+    )
+    embedding_max_batch_size: int = Field(default=256, alias="EMBEDDING_MAX_BATCH_SIZE")
+    vector_store_async: bool = Field(
+        default=True,
+        alias="VECTOR_STORE_ASYNC",
+        description="Query Pinecone through its asyncio client; false (or the local backend) runs sync calls on the vector-store pool.",
+    )
+    vector_store_async_max_concurrent: int = Field(
+        default=64,
+        alias="VECTOR_STORE_ASYNC_MAX_CONCURRENT",
+        description="Concurrent searches allowed through the asyncio client.",
+    )
+    vector_store_max_workers: int = Field(
+        default=16,
+        alias="VECTOR_STORE_MAX_WORKERS",
+        description="Threads dedicated to blocking vector-store calls, which is also the limit on concurrent sync searches.",
+    )
+    vector_store_max_waiting: int = Field(
+        default=64,
+        alias="VECTOR_STORE_MAX_WAITING",
+        description="Searches allowed to queue for a vector-store thread before new ones are rejected with 503.",
+    )
+    llm_max_concurrent: int = Field(
+        default=16,
+        alias="LLM_MAX_CONCURRENT",
+        description="Maximum concurrent chat-model calls (rewrites and answers) across all requests.",
+    )
+    llm_max_waiting: int = Field(
+        default=64,
+        alias="LLM_MAX_WAITING",
+        description="Chat-model calls allowed to queue before new ones are rejected with 503.",
+    )
+    admission_max_wait_seconds: float = Field(
+        default=10.0,
+        alias="ADMISSION_MAX_WAIT_SECONDS",
+        description="Longest a queued upstream call waits for a slot before it is rejected with 503.",
+    )
+    upstream_max_attempts: int = Field(
+        default=3,
+        alias="UPSTREAM_MAX_ATTEMPTS",
+        description="Attempts per chat-model or vector-store call when it is rate limited or fails transiently.",
+    )
+    upstream_retry_max_delay_seconds: float = Field(
+        default=4.0,
+        alias="UPSTREAM_RETRY_MAX_DELAY_SECONDS",
+        description="Longest backoff between attempts; a longer Retry-After from the upstream fails the call with 503.",
+    )
 
     model_config = SettingsConfigDict(
         env_file=".env",
@@ -59,37 +347,383 @@ class Settings(BaseSettings):
 
 
 settings = Settings()
+token_counter = TokenCounter(LLM_MODEL)
+answer_flights = SingleFlight()
 
 
-@asynccontextmanager
-async def lifespan(_: FastAPI):
-    embeddings = OpenAIEmbeddings(
-        model="text-embedding-3-large",
+def create_embeddings() -> Embeddings:
+    """Build the embeddings model used for queries (wrapped in CachedEmbeddings by the lifespan)"""
+    from langchain_openai import OpenAIEmbeddings
+
+    return OpenAIEmbeddings(
+        **EmbeddingProfile.parse(settings.embedding_profile).embedding_kwargs(),
         openai_api_key=settings.openai_api_key,
     )
-    pinecone_client = Pinecone(api_key=settings.pinecone_api_key)
-    index = pinecone_client.Index(settings.pinecone_index_name)
-    vector_store = PineconeVectorStore(embedding=embeddings, index=index)
-    llm = ChatOpenAI(
-        model="gpt-4o-mini",
+
+
+def create_llm() -> ChatOpenAI:
+    from langchain_openai import ChatOpenAI
+
+    return ChatOpenAI(
+        model=LLM_MODEL,
         temperature=0,
         openai_api_key=settings.openai_api_key,
+        # Retries go through the admission layer so they release their slot while backing off.
+        max_retries=0,
+    )
+
+
+def create_upstream(name: str, max_concurrent: int, max_waiting: int) -> Upstream:
+    return Upstream(
+        AdmissionGate(
+            name,
+            max_concurrent=max_concurrent,
+            max_waiting=max_waiting,
+            max_wait_seconds=settings.admission_max_wait_seconds,
+        ),
+        RetryPolicy(
+            name,
+            max_attempts=settings.upstream_max_attempts,
+            max_delay=settings.upstream_retry_max_delay_seconds,
+        ),
     )
 
+
+def create_vector_store(embeddings: Embeddings) -> VectorStore:
+    """Build the vector store selected by VECTOR_STORE_BACKEND, checking it against EMBEDDING_PROFILE"""
+    profile = EmbeddingProfile.parse(settings.embedding_profile)
+    if settings.vector_store_backend == "local":
+        from local_vector_store import LocalVectorStore
+
+        vector_store = LocalVectorStore(
+            settings.local_index_path,
+            embedding=embeddings,
+            nprobe=settings.local_index_nprobe,
+            rescore_factor=settings.local_index_rescore_factor,
+        )
+        check_index_profile(profile, vector_store.profile, vector_store.dim, f"Local index {settings.local_index_path}")
+        logger.info(
+            f"Local vector index loaded from {settings.local_index_path} ({vector_store.count} vectors, profile {profile})"
+        )
+        return vector_store
+
+    if settings.vector_store_backend != "pinecone":
+        raise ValueError(f"Unknown VECTOR_STORE_BACKEND: {settings.vector_store_backend}")
+    if not settings.pinecone_api_key or not settings.pinecone_index_name:
+        raise ValueError("PINECONE_API_KEY and PINECONE_INDEX_NAME are required for the pinecone backend")
+    from langchain_pinecone import PineconeVectorStore
+    from pinecone import Pinecone
+
+    pinecone_client = Pinecone(api_key=settings.pinecone_api_key)
+    index = pinecone_client.Index(settings.pinecone_index_name)
+    if profile.quantization != "none":
+        raise ValueError(f"EMBEDDING_PROFILE {profile}: quantized first passes need VECTOR_STORE_BACKEND=local")
+    try:
+        dimension = index.describe_index_stats().dimension
+    except Exception as exc:
+        # An unreachable index fails the first search anyway; only a known width can be checked.
+        logger.warning("Could not check the Pinecone index against EMBEDDING_PROFILE: %s", exc)
+    else:
+        # Pinecone keeps no profile, only the vector width.
+        check_index_profile(profile, None, dimension, f"Pinecone index {settings.pinecone_index_name}")
+    return PineconeVectorStore(embedding=embeddings, index=index)
+
+
+def _is_pinecone(vector_store: VectorStore) -> bool:
+    """Whether ``vector_store`` is Pinecone's, without importing langchain_pinecone for other backends"""
+    module = sys.modules.get("langchain_pinecone")
+    return module is not None and isinstance(vector_store, module.PineconeVectorStore)
+
+
+def _is_async_firestore(db) -> bool:
+    from google.cloud import firestore
+
+    return isinstance(db, firestore.AsyncClient)
+
+
+# Longest the background warm-up waits for the server's first request before it starts anyway.
+_BACKGROUND_START_DELAY_SECONDS = 1.0
+
+
+@contextmanager
+def _startup_phase(name: str):
+    """Record how long one startup phase took in ``app.state.startup_timings`` (ms)"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        app.state.startup_timings[f"{name}_ms"] = round((time.perf_counter() - started) * 1000, 1)
+
+
+async def _start_components(shutdown: AsyncExitStack) -> None:
+    """
+    Build every client, index and cache on ``app.state``, registering their cleanup on ``shutdown``.
+
+    Blocking construction (client library imports, index loads, credential
+    discovery) runs in worker threads, so the event loop keeps answering
+    /health while this runs in the background.
+    """
+    from embedding_cache import CachedEmbeddings
+    from financial_facts import FinancialFacts
+    from lexical_index import LexicalIndex
+    from rerank import RerankStage, create_reranker
+
+    with _startup_phase("embeddings"):
+        embeddings = CachedEmbeddings(
+            await run_in_threadpool(create_embeddings),
+            max_entries=settings.embedding_cache_max_entries,
+            batch_window_ms=settings.embedding_batch_window_ms,
+            max_batch_size=settings.embedding_max_batch_size,
+        )
+        shutdown.callback(embeddings.close)
+
+    with _startup_phase("vector_store"):
+        vector_store = await run_in_threadpool(create_vector_store, embeddings)
+        vector_store_async = False
+        if settings.vector_store_async and _is_pinecone(vector_store):
+            try:
+                # Opens one pooled HTTP session that every async query reuses until shutdown.
+                await vector_store.__aenter__()
+                vector_store_async = True
+                shutdown.push_async_callback(vector_store.aclose)
+                logger.info("Pinecone asyncio client opened for vector searches")
+            except Exception as exc:
+                logger.warning("Pinecone asyncio client not opened, using sync searches on the vector-store pool: %s", exc)
+
+    with _startup_phase("llm"):
+        llm = await run_in_threadpool(create_llm)
+
+    app.state.embeddings = embeddings
     app.state.vector_store = vector_store
     app.state.llm = llm
+    # Blocking vector-store calls get their own pool so a burst of searches cannot
+    # exhaust the default threadpool that other endpoints (e.g. /health) rely on.
+    vector_executor = ThreadPoolExecutor(max_workers=settings.vector_store_max_workers, thread_name_prefix="vector-io")
+    shutdown.callback(vector_executor.shutdown, wait=False, cancel_futures=True)
+    app.state.vector_executor = vector_executor
+    app.state.vector_store_async = vector_store_async
+    app.state.vector_upstream = create_upstream(
+        "vector store",
+        settings.vector_store_async_max_concurrent if vector_store_async else settings.vector_store_max_workers,
+        settings.vector_store_max_waiting,
+    )
+    app.state.llm_upstream = create_upstream("chat model", settings.llm_max_concurrent, settings.llm_max_waiting)
+    app.state.chunk_vectors = ChunkVectorCache(settings.mmr_vector_cache_max_entries, settings.mmr_vector_dims)
+
+    app.state.lexical_index = None
+    with _startup_phase("lexical_index"):
+        try:
+            app.state.lexical_index = await run_in_threadpool(LexicalIndex.open, settings.lexical_index_path)
+            logger.info(f"Lexical index loaded: {app.state.lexical_index.stats()}")
+        except FileNotFoundError:
+            logger.info(f"No lexical index at {settings.lexical_index_path}; BM25 search disabled")
+        except Exception as exc:
+            logger.warning("Lexical index not loaded: %s", exc)
+
+    app.state.financial_facts = None
+    with _startup_phase("financial_facts"):
+        try:
+            app.state.financial_facts = await run_in_threadpool(FinancialFacts.open, settings.facts_index_path)
+            logger.info(f"Financial facts index loaded: {app.state.financial_facts.snapshot_stats()}")
+        except FileNotFoundError:
+            logger.info(f"No financial facts index at {settings.facts_index_path}; numeric questions use retrieval")
+        except Exception as exc:
+            logger.warning("Financial facts index not loaded: %s", exc)
+
+    app.state.symbol_index = None
+    # The facts fast path needs the company in the question even without automatic ticker filters.
+    if settings.auto_ticker_filter or app.state.financial_facts is not None:
+        with _startup_phase("symbol_index"):
+            try:
+                app.state.symbol_index = await run_in_threadpool(SymbolIndex.from_csv, settings.symbol_index_path)
+            except Exception as exc:
+                logger.warning("Symbol index not loaded, automatic ticker filtering and the facts fast path disabled: %s", exc)
+
+    app.state.rewrite_cache = None
+    if settings.rewrite_cache_enabled:
+        with _startup_phase("rewrite_cache"):
+            try:
+                app.state.rewrite_cache = await run_in_threadpool(
+                    partial(
+                        create_rewrite_cache,
+                        settings.rewrite_cache_backend,
+                        path=settings.rewrite_cache_path,
+                        ttl_seconds=settings.rewrite_cache_ttl_seconds,
+                        max_entries=settings.rewrite_cache_max_entries,
+                    )
+                )
+                shutdown.callback(app.state.rewrite_cache.close)
+                logger.info(f"Rewrite cache initialized ({settings.rewrite_cache_backend} backend)")
+            except Exception as exc:
+                logger.warning("Rewrite cache not initialized: %s", exc)
+
+    app.state.rerank_stage = None
+    if settings.rerank_enabled:
+        with _startup_phase("rerank"):
+            try:
+                app.state.rerank_stage = RerankStage(
+                    await run_in_threadpool(create_reranker, settings.rerank_model),
+                    budget_ms=settings.rerank_budget_ms,
+                    retrieval_weight=settings.rerank_retrieval_weight,
+                )
+                shutdown.callback(app.state.rerank_stage.close)
+                logger.info(f"Reranking {settings.rerank_candidates} candidates with {app.state.rerank_stage.reranker.name}")
+            except Exception as exc:
+                logger.warning("Reranker not initialized: %s", exc)
+
+    app.state.answer_cache = None
+    if settings.answer_cache_enabled:
+        with _startup_phase("answer_cache"):
+            try:
+                app.state.answer_cache = await run_in_threadpool(
+                    partial(
+                        create_answer_cache,
+                        settings.answer_cache_backend,
+                        path=settings.answer_cache_path,
+                        ttl_seconds=settings.answer_cache_ttl_seconds,
+                        max_entries=settings.answer_cache_max_entries,
+                        max_bytes=settings.answer_cache_max_bytes,
+                        similarity_threshold=settings.answer_cache_similarity_threshold,
+                    )
+                )
+                shutdown.callback(app.state.answer_cache.close)
+                logger.info(f"Answer cache initialized ({settings.answer_cache_backend} backend)")
+            except Exception as exc:
+                logger.warning("Answer cache not initialized: %s", exc)
+
+    with _startup_phase("firestore"):
+        try:
+            create_client = create_async_firestore_client if settings.firestore_async else create_firestore_client
+            app.state.firestore = await run_in_threadpool(
+                partial(
+                    create_client,
+                    service_account_value=settings.firebase_service_account_json,
+                    project_id=settings.gcp_project_id,
+                )
+            )
+            if app.state.firestore is not None:
+                shutdown.callback(app.state.firestore.close)
+            logger.info(f"Firestore {'async ' if settings.firestore_async else ''}client initialized for ingestion reads")
+        except Exception as exc:
+            app.state.firestore = None
+            logger.warning("Firestore client not initialized: %s", exc)
+
+    app.state.manifest_index = None
+    if settings.manifest_index_mode != "off" and app.state.firestore is not None:
+        manifest_index = ManifestIndex()
+        try:
+            if settings.manifest_index_mode == "listen":
+                # Listeners are only available on the sync client; they run on its background thread.
+                if not _is_async_firestore(app.state.firestore):
+                    manifest_index.listen(app.state.firestore)
+                else:
+                    manifest_listener_db = await run_in_threadpool(
+                        partial(
+                            create_firestore_client,
+                            service_account_value=settings.firebase_service_account_json,
+                            project_id=settings.gcp_project_id,
+                        )
+                    )
+                    shutdown.callback(manifest_listener_db.close)
+                    manifest_index.listen(manifest_listener_db)
+            elif settings.manifest_index_mode == "poll":
+                manifest_poller = asyncio.create_task(
+                    manifest_index.poll(app.state.firestore, settings.manifest_poll_interval_seconds)
+                )
+                shutdown.callback(manifest_poller.cancel)
+            else:
+                raise ValueError(f"Unknown MANIFEST_INDEX_MODE: {settings.manifest_index_mode}")
+            shutdown.callback(manifest_index.close)
+            app.state.manifest_index = manifest_index
+            logger.info(f"Manifest index started ({settings.manifest_index_mode})")
+        except Exception as exc:
+            logger.warning("Manifest index not started, manifest endpoints query Firestore: %s", exc)
 
+    if settings.startup_warmup:
+        with _startup_phase("warmup"):
+            await _warm_up()
+
+
+async def _warm_up() -> None:
+    """
+    Pay the first-request costs before a user does: the tiktoken encoding, and the
+    TLS connections of the embeddings and vector-store clients (one query each)
+    """
+    await run_in_threadpool(token_counter.count, "warm-up")
     try:
-        app.state.firestore = create_firestore_client(
-            service_account_value=settings.firebase_service_account_json,
-            project_id=settings.gcp_project_id,
-        )
-        logger.info("Firestore client initialized for ingestion reads")
+        vector = await app.state.embeddings.aembed_query("warm-up")
+        await _vector_search(app.state.vector_store, "similarity_search_by_vector", vector, 1)
     except Exception as exc:
-        app.state.firestore = None
-        logger.warning("Firestore client not initialized: %s", exc)
+        logger.warning("Connection warm-up failed; the first question opens them instead: %s", exc)
+
+
+def _startup_state() -> str:
+    """'deferred' (lazy mode, nothing needed yet), 'starting', 'ready' or 'failed'"""
+    task: asyncio.Task | None = getattr(app.state, "startup_task", None)
+    if task is None:
+        return "deferred"
+    if not task.done():
+        return "starting"
+    return "failed" if task.cancelled() or task.exception() is not None else "ready"
 
-    yield
+
+async def _run_startup(shutdown: AsyncExitStack) -> None:
+    if not app.state.serving.is_set():
+        # Let the server bind and answer its first request (normally the platform's health
+        # check) before the client imports compete with it for the interpreter.
+        try:
+            await asyncio.wait_for(app.state.serving.wait(), _BACKGROUND_START_DELAY_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+    try:
+        await _start_components(shutdown)
+    except Exception:
+        logger.exception(f"API startup failed after {app.state.startup_timings}")
+        raise
+    app.state.startup_timings["ready_ms"] = round((time.perf_counter() - app.state.startup_started) * 1000, 1)
+    logger.info(f"API ready; startup timings (ms): {app.state.startup_timings}")
+
+
+async def _ensure_started() -> None:
+    """Wait until the components are built, starting that now when nothing has yet (STARTUP_MODE=lazy)"""
+    app.state.serving.set()
+    task: asyncio.Task | None = app.state.startup_task
+    if task is None:
+        task = app.state.startup_task = asyncio.create_task(_run_startup(app.state.shutdown))
+    if not task.done():
+        # A cancelled request must not cancel startup for the requests waiting with it.
+        await asyncio.shield(task)
+    task.result()
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    if settings.retrieval_fusion_method not in FUSION_METHODS:
+        raise ValueError(f"Unknown RETRIEVAL_FUSION_METHOD: {settings.retrieval_fusion_method}")
+    if settings.startup_mode not in STARTUP_MODES:
+        raise ValueError(f"Unknown STARTUP_MODE: {settings.startup_mode}")
+    EmbeddingProfile.parse(settings.embedding_profile)
+
+    app.state.startup_started = time.perf_counter()
+    app.state.startup_timings = {}
+    app.state.startup_task = None
+    app.state.serving = asyncio.Event()
+    async with AsyncExitStack() as shutdown:
+        app.state.shutdown = shutdown
+        if settings.startup_mode == "eager":
+            await _ensure_started()
+        elif settings.startup_mode == "background":
+            app.state.startup_task = asyncio.create_task(_run_startup(shutdown))
+        app.state.startup_timings["serving_ms"] = round((time.perf_counter() - app.state.startup_started) * 1000, 1)
+        logger.info(f"Serving after {app.state.startup_timings['serving_ms']} ms (STARTUP_MODE={settings.startup_mode})")
+
+        try:
+            yield
+        finally:
+            task = app.state.startup_task
+            if task is not None and not task.done():
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
 
 
 app = FastAPI(lifespan=lifespan)
@@ -105,6 +739,50 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+# Paths that do not need the clients, so they are answered while startup is still running
+# (/metrics reports whichever components exist, including the startup phase timings).
+_STARTUP_EXEMPT_PATHS = {"/", "/health", "/docs", "/openapi.json", "/metrics", "/debug/startup-stats"}
+
+
+@app.middleware("http")
+async def wait_for_startup(request: Request, call_next):
+    if request.url.path in _STARTUP_EXEMPT_PATHS:
+        response = await call_next(request)
+        if not app.state.serving.is_set():
+            # Runs once the response is sent, so the background startup cannot delay it.
+            response.background = BackgroundTask(app.state.serving.set)
+        return response
+    try:
+        await _ensure_started()
+    except Exception as exc:
+        return JSONResponse(status_code=503, content={"detail": f"API startup failed: {exc}"})
+    return await call_next(request)
+
+
+@app.middleware("http")
+async def record_request_duration(request: Request, call_next):
+    started = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    REQUEST_DURATION.observe(
+        time.perf_counter() - started,
+        method=request.method,
+        path=getattr(route, "path", "unmatched"),
+        status=response.status_code,
+    )
+    return response
+
+
+@app.exception_handler(Overloaded)
+async def overloaded_handler(_: Request, exc: Overloaded):
+    logger.warning(f"Shedding request: {exc}")
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": exc.retry_after_header()},
+    )
+
 # ---------------------------------------------
 # Models and Retrieval Strategies
 # ---------------------------------------------
@@ -112,12 +790,92 @@ class AskRequest(BaseModel):
     question: str
     retrieval_method: str = Field(
         default="llm_enhanced",
-        description="Retrieval method: 'similarity', 'mmr', 'multi_query', 'llm_enhanced', or 'hybrid'"
+        description="Retrieval method: 'similarity', 'mmr', 'multi_query', 'llm_enhanced', 'hybrid', or 'lexical_hybrid'"
     )
     k: int = Field(default=5, description="Number of documents to retrieve")
+    include_timings: bool = Field(
+        default=False,
+        description="Include per-stage retrieval and generation timings (ms) in the response",
+    )
+    use_cache: bool = Field(default=True, description="Serve and store this answer in the answer cache")
+    use_facts: bool = Field(
+        default=True,
+        description="Answer single-metric questions (e.g. revenue in a given year) from the financial facts index",
+    )
+    tickers: List[str] | None = Field(default=None, description="Only search these tickers, e.g. ['AAPL', 'MSFT']")
+    years: List[int] | None = Field(default=None, description="Only search these fiscal years")
+    doc_types: List[str] | None = Field(default=None, description="Only search these document types, e.g. ['10-K']")
+    sections: List[str] | None = Field(
+        default=None,
+        description="Only search these 10-K items, e.g. ['1A', '7'] for Risk Factors and MD&A",
+    )
 
+    @field_validator("sections")
+    @classmethod
+    def _normalize_sections(cls, sections: List[str] | None) -> List[str] | None:
+        if not sections:
+            return sections
+        normalized = [normalize_item(section) for section in sections]
+        unknown = [section for section, item in zip(sections, normalized) if item is None]
+        if unknown:
+            raise ValueError(f"Unknown 10-K items: {', '.join(unknown)}")
+        return normalized
 
-def _require_firestore(request: Request) -> firestore.Client:
+
+def build_metadata_filter(
+    tickers: List[str] | None = None,
+    years: List[int] | None = None,
+    doc_types: List[str] | None = None,
+    sections: List[str] | None = None,
+) -> dict | None:
+    """Vector-store metadata filter for the given tickers, years, document types and 10-K items (None = no filter)"""
+    metadata_filter = {}
+    if tickers:
+        metadata_filter["ticker"] = {"$in": sorted({normalize_ticker(ticker) for ticker in tickers})}
+    if years:
+        metadata_filter["year"] = {"$in": sorted(set(years))}
+    if doc_types:
+        metadata_filter["docType"] = {"$in": sorted(set(doc_types))}
+    if sections:
+        metadata_filter["section"] = {"$in": sorted(set(sections))}
+    return metadata_filter or None
+
+
+def _explicit_filter(query: AskRequest) -> dict | None:
+    return build_metadata_filter(query.tickers, query.years, query.doc_types, query.sections)
+
+
+def _resolve_filter(query: AskRequest) -> tuple[dict | None, bool]:
+    """Return (metadata filter, whether it was derived automatically from the question)"""
+    explicit = _explicit_filter(query)
+    if explicit is not None:
+        return explicit, False
+    symbol_index: SymbolIndex | None = getattr(app.state, "symbol_index", None)
+    if symbol_index is None or not settings.auto_ticker_filter:
+        return None, False
+    tickers = symbol_index.extract(query.question)
+    if not tickers:
+        return None, False
+    return build_metadata_filter(tickers), True
+
+
+def _cache_scope(query: AskRequest) -> str:
+    """
+    Answer-cache partition: the retrieval method, the metadata filter and the
+    years and figures in the question, so a near-duplicate question about a
+    different company or fiscal year never reuses an answer.
+    """
+    scope = query.retrieval_method
+    metadata_filter, _ = _resolve_filter(query)
+    if metadata_filter is not None:
+        scope += f"|{json.dumps(metadata_filter, sort_keys=True)}"
+    numbers = question_numbers(query.question)
+    if numbers:
+        scope += f"|{','.join(numbers)}"
+    return scope
+
+
+def _require_firestore(request: Request) -> firestore.Client | firestore.AsyncClient:
     db = request.app.state.firestore
     if db is None:
         raise HTTPException(
@@ -130,9 +888,39 @@ def _require_firestore(request: Request) -> firestore.Client:
     return db
 
 
-async def expand_query_with_llm(llm: ChatOpenAI, original_query: str) -> List[str]:
-    """Use LLM to generate multiple search queries from the original question"""
-    expansion_prompt = f"""
+async def _vector_search(vector_store: VectorStore, method: str, *args, **kwargs):
+    """
+    Call a vector-store search method, admitted and retried as a vector-store upstream call.
+
+    With the Pinecone asyncio client the method's native async variant is awaited
+    directly; otherwise the sync method runs on the dedicated vector-store pool.
+    """
+    if app.state.vector_store_async:
+        call = partial(getattr(vector_store, f"a{method}"), *args, **kwargs)
+    else:
+        call = partial(_on_vector_executor, partial(getattr(vector_store, method), *args, **kwargs))
+    return await app.state.vector_upstream.call(call)
+
+
+def _on_vector_executor(fn: Callable[[], Any]) -> asyncio.Future:
+    """
+    Run ``fn`` on the vector-store pool in a copy of the caller's context, so the
+    spans it records (e.g. the query embedding) land on the request's trace.
+    """
+    loop = asyncio.get_running_loop()
+    return loop.run_in_executor(app.state.vector_executor, contextvars.copy_context().run, fn)
+
+
+async def _llm_invoke(llm: ChatOpenAI, prompt: str):
+    return await app.state.llm_upstream.call(partial(llm.ainvoke, prompt))
+
+
+def _llm_stream(llm: ChatOpenAI, prompt: str) -> AsyncIterator:
+    return app.state.llm_upstream.stream(partial(llm.astream, prompt))
+
+
+def _expansion_prompt(original_query: str) -> str:
+    return f"""
     Given the following question, generate 2-3 alternative search queries that would help find relevant information.
     The queries should be rephrased or focus on different aspects of the question.
     
@@ -140,131 +928,277 @@ async def expand_query_with_llm(llm: ChatOpenAI, original_query: str) -> List[st
     
     Return only the queries, one per line, without numbering or bullets.
     """
+
+
+def _refinement_prompt(original_query: str) -> str:
+    return f"""
+    Refine the following search query to make it more effective for finding relevant information in a financial/company knowledge base.
+    Focus on key terms, company names, financial concepts, and specific details.
     
+    Original query: {original_query}
+    
+    Return only the refined query, nothing else.
+    """
+
+
+# Number of alternative queries kept from an expansion (the original question is always searched too).
+EXPANDED_QUERY_LIMIT = 2
+# Rewrite cache keys include these, so changing a prompt or the model invalidates earlier rewrites.
+REFINE_PROMPT_VERSION = prompt_version(LLM_MODEL, _refinement_prompt("{question}"))
+EXPAND_PROMPT_VERSION = prompt_version(LLM_MODEL, f"{EXPANDED_QUERY_LIMIT}\x1f{_expansion_prompt('{question}')}")
+
+
+async def _generate_expansions(llm: ChatOpenAI, original_query: str) -> List[str]:
+    response = await _llm_invoke(llm, _expansion_prompt(original_query))
+    queries = [q.strip() for q in response.content.split('\n') if q.strip()]
+    return queries[:EXPANDED_QUERY_LIMIT]
+
+
+async def expand_query_with_llm(llm: ChatOpenAI, original_query: str) -> List[str]:
+    """Use LLM to generate multiple search queries from the original question"""
+    rewrite_cache: RewriteCache | None = app.state.rewrite_cache
     try:
-        response = await llm.ainvoke(expansion_prompt)
-        queries = [q.strip() for q in response.content.split('\n') if q.strip()]
+        if rewrite_cache is None:
+            queries = await _generate_expansions(llm, original_query)
+        else:
+            queries = await rewrite_cache.get_or_compute(
+                rewrite_key("expand", EXPAND_PROMPT_VERSION, original_query),
+                partial(_generate_expansions, llm, original_query),
+            )
         # Always include the original query
-        queries.insert(0, original_query)
-        return queries[:3]  # Limit to 3 queries
+        return [original_query, *queries]
     except Exception as e:
         logger.warning(f"Query expansion failed: {e}, using original query only")
         return [original_query]
 
 
+async def _stream_expansions(llm: ChatOpenAI, original_query: str) -> AsyncIterator[str]:
+    buffer = ""
+    emitted = 0
+    async with aclosing(_llm_stream(llm, _expansion_prompt(original_query))) as chunks:
+        async for chunk in chunks:
+            buffer += chunk.content
+            while "\n" in buffer:
+                line, buffer = buffer.split("\n", 1)
+                if line.strip():
+                    yield line.strip()
+                    emitted += 1
+                    if emitted >= EXPANDED_QUERY_LIMIT:
+                        return
+    if buffer.strip():
+        yield buffer.strip()
+
+
+async def stream_expanded_queries(llm: ChatOpenAI, original_query: str) -> AsyncIterator[str]:
+    """Stream alternative search queries, yielding each one as soon as its line is complete"""
+    rewrite_cache: RewriteCache | None = app.state.rewrite_cache
+    if rewrite_cache is None:
+        stream = _stream_expansions(llm, original_query)
+    else:
+        stream = rewrite_cache.stream_or_compute(
+            rewrite_key("expand", EXPAND_PROMPT_VERSION, original_query),
+            partial(_stream_expansions, llm, original_query),
+        )
+    async with aclosing(stream) as queries:
+        async for query in queries:
+            yield query
+
+
+async def _generate_refinement(llm: ChatOpenAI, original_query: str) -> str:
+    response = await _llm_invoke(llm, _refinement_prompt(original_query))
+    return response.content.strip()
+
+
 async def refine_query_with_llm(llm: ChatOpenAI, original_query: str) -> str:
     """Use LLM to refine/improve the search query for better retrieval"""
-    refinement_prompt = f"""
-    Refine the following search query to make it more effective for finding relevant information in a financial/company knowledge base.
-    Focus on key terms, company names, financial concepts, and specific details.
-    
-    Original query: {original_query}
-    
-    Return only the refined query, nothing else.
-    """
-    
+    rewrite_cache: RewriteCache | None = app.state.rewrite_cache
     try:
-        response = await llm.ainvoke(refinement_prompt)
-        refined = response.content.strip()
+        if rewrite_cache is None:
+            refined = await _generate_refinement(llm, original_query)
+        else:
+            refined = await rewrite_cache.get_or_compute(
+                rewrite_key("refine", REFINE_PROMPT_VERSION, original_query),
+                partial(_generate_refinement, llm, original_query),
+            )
         return refined if refined else original_query
     except Exception as e:
         logger.warning(f"Query refinement failed: {e}, using original query")
         return original_query
 
 
-async def mmr_search(vector_store: PineconeVectorStore, query: str, k: int, fetch_k: int = 20):
-    """Maximal Marginal Relevance search for diverse results"""
+async def _fetch_vectors(vector_store: VectorStore, ids: List[str]) -> dict:
+    """Stored vectors by ID: Pinecone's fetch, or the local index's rows"""
+    if not _is_pinecone(vector_store):
+        return await _vector_search(vector_store, "fetch_vectors", ids)
+    if app.state.vector_store_async:
+        index = await vector_store.async_index
+        call = partial(index.fetch, ids=ids)
+    else:
+        call = partial(_on_vector_executor, partial(vector_store.index.fetch, ids=ids))
+    response = await app.state.vector_upstream.call(call)
+    return {vector_id: vector.values for vector_id, vector in response.vectors.items()}
+
+
+async def _candidate_vectors(vector_store: VectorStore, docs: List[Document]) -> tuple[np.ndarray, int]:
+    """Truncated unit vectors for the candidates (cached, the rest fetched in one call) and how many were fetched"""
+    cache: ChunkVectorCache = app.state.chunk_vectors
+    ids = [doc.id for doc in docs]
+    found, missing = cache.get_many(vector_id for vector_id in ids if vector_id)
+    if missing:
+        found.update(cache.put_many(await _fetch_vectors(vector_store, missing)))
+    if not found:
+        raise ValueError("No vectors found for the MMR candidates")
+    # A candidate without a stored vector counts as unlike every other one.
+    unknown = np.zeros_like(next(iter(found.values())))
+    return np.stack([found.get(vector_id, unknown) for vector_id in ids]), len(missing)
+
+
+async def mmr_search(
+    vector_store: VectorStore,
+    query: str | List[float],
+    k: int,
+    fetch_k: int | None = None,
+    filter: dict | None = None,
+) -> List[Document]:
+    """
+    Maximal Marginal Relevance search for diverse results, by question text or query vector.
+
+    The candidates come from a plain similarity search, whose scores serve as
+    the relevance. Only the candidates' truncated vectors are needed for the
+    diversity term, and they come from an in-memory cache, so a warm MMR search
+    costs one similarity query.
+    """
+    fetch_k = fetch_k or settings.mmr_fetch_k or 3 * k
+    by_vector = not isinstance(query, str)
+    if not _is_pinecone(vector_store) and not hasattr(vector_store, "fetch_vectors"):
+        # Without access to stored vectors, let the vector store run MMR itself.
+        method = "max_marginal_relevance_search_by_vector" if by_vector else "max_marginal_relevance_search"
+        if hasattr(vector_store, method):
+            return await _vector_search(vector_store, method, query, k=k, fetch_k=fetch_k, filter=filter)
+        logger.warning("MMR search not available, falling back to similarity search")
+        method = "similarity_search_by_vector" if by_vector else "similarity_search"
+        return await _vector_search(vector_store, method, query, k=k, filter=filter)
+
     try:
-        if hasattr(vector_store, 'max_marginal_relevance_search'):
-            docs = await run_in_threadpool(
-                vector_store.max_marginal_relevance_search,
-                query, k=k, fetch_k=fetch_k
-            )
-            return docs
-        else:
-            # Fallback to regular similarity search
-            logger.warning("MMR search not available, falling back to similarity search")
-            return await run_in_threadpool(vector_store.similarity_search, query, k)
+        method = "similarity_search_by_vector_with_score" if by_vector else "similarity_search_with_score"
+        candidates = await _vector_search(vector_store, method, query, k=fetch_k, filter=filter)
     except Exception as e:
         logger.error(f"Error in MMR search: {e}")
         raise
+    if len(candidates) <= k:
+        return [doc for doc, _ in candidates]
 
-
-async def multi_query_retrieval(vector_store: PineconeVectorStore, llm: ChatOpenAI, query: str, k: int):
-    """Generate multiple queries and combine results"""
-    # Generate multiple query variations
-    queries = await expand_query_with_llm(llm, query)
-    logger.info(f"Generated {len(queries)} query variations: {queries}")
-    
-    # Search with each query
-    all_docs = []
-    seen_ids = set()
-    
-    for q in queries:
+    with span("mmr", candidates=len(candidates)) as counts:
         try:
-            docs = await run_in_threadpool(vector_store.similarity_search, q, k)
-            for doc in docs:
-                # Use page_content as a simple deduplication key
-                doc_id = hash(doc.page_content[:100])  # First 100 chars as ID
-                if doc_id not in seen_ids:
-                    seen_ids.add(doc_id)
-                    all_docs.append(doc)
+            vectors, counts["fetched"] = await _candidate_vectors(vector_store, [doc for doc, _ in candidates])
         except Exception as e:
-            logger.warning(f"Error searching with query '{q}': {e}")
-            continue
-    
-    # Return top k unique documents
-    return all_docs[:k]
+            logger.warning(f"Vectors for MMR not available ({e}); using similarity order")
+            return [doc for doc, _ in candidates[:k]]
+        selected = mmr_select(np.array([score for _, score in candidates]), vectors, k, settings.mmr_lambda)
+    return [candidates[i][0] for i in selected]
+
+
+def _similarity_search_fn(vector_store: VectorStore, filter: dict | None = None):
+    async def search(query: str, k: int):
+        return await _vector_search(vector_store, "similarity_search_with_score", query, k, filter=filter)
+    return search
+
 
+def _relative_scores(results: List[tuple]) -> List[tuple]:
+    """Scale BM25 scores to (0, 1] so score-weighted fusion can mix them with cosine similarities"""
+    top = max((score for _, score in results), default=0.0)
+    return [(doc, score / top if top else 0.0) for doc, score in results]
 
-async def llm_enhanced_retrieval(vector_store: PineconeVectorStore, llm: ChatOpenAI, query: str, k: int):
+
+def _lexical_search_fn(lexical_index: LexicalIndex | None, filter: dict | None = None):
+    if lexical_index is None:
+        return None
+
+    async def search(query: str, k: int):
+        return _relative_scores(await run_in_threadpool(lexical_index.search, query, k, filter=filter))
+    return search
+
+
+def _orchestrator_options() -> dict:
+    return {
+        "fusion_method": settings.retrieval_fusion_method,
+        "rrf_k": settings.retrieval_rrf_k,
+        "llm_timeout": settings.retrieval_llm_timeout_seconds,
+        "search_timeout": settings.retrieval_search_timeout_seconds,
+        "total_timeout": settings.retrieval_total_timeout_seconds,
+    }
+
+
+async def multi_query_retrieval(
+    vector_store: VectorStore, llm: ChatOpenAI, query: str, k: int, filter: dict | None = None
+) -> RetrievalResult:
+    """Search the original query and each LLM-generated variation concurrently, then combine results"""
+    result = await orchestrate_retrieval(
+        query,
+        k,
+        search=_similarity_search_fn(vector_store, filter),
+        expand=partial(stream_expanded_queries, llm),
+        **_orchestrator_options(),
+    )
+    logger.info(f"Multi-query retrieval timings (ms): {result.timings}")
+    return result
+
+
+async def llm_enhanced_retrieval(
+    vector_store: VectorStore, llm: ChatOpenAI, query: str, k: int, filter: dict | None = None
+):
     """Use LLM to refine query, then perform similarity search"""
     # Refine the query first
-    refined_query = await refine_query_with_llm(llm, query)
+    with span("refine"):
+        refined_query = await refine_query_with_llm(llm, query)
     logger.info(f"Original query: {query}")
     logger.info(f"Refined query: {refined_query}")
     
     # Perform similarity search with refined query
-    docs = await run_in_threadpool(vector_store.similarity_search, refined_query, k)
+    with span("search:refined") as counts:
+        docs = await _vector_search(vector_store, "similarity_search", refined_query, k, filter=filter)
+        counts["documents"] = len(docs)
     return docs
 
 
-async def hybrid_retrieval(vector_store: PineconeVectorStore, llm: ChatOpenAI, query: str, k: int):
-    """Combine multiple retrieval methods for best results"""
-    # Get results from multiple methods
-    results = []
-    
-    # 1. LLM-enhanced search
-    try:
-        llm_docs = await llm_enhanced_retrieval(vector_store, llm, query, k)
-        results.extend(llm_docs)
-    except Exception as e:
-        logger.warning(f"LLM-enhanced retrieval failed: {e}")
-    
-    # 2. Multi-query retrieval
-    try:
-        multi_docs = await multi_query_retrieval(vector_store, llm, query, k // 2)
-        results.extend(multi_docs)
-    except Exception as e:
-        logger.warning(f"Multi-query retrieval failed: {e}")
-    
-    # 3. Regular similarity search as fallback
-    try:
-        sim_docs = await run_in_threadpool(vector_store.similarity_search, query, k)
-        results.extend(sim_docs)
-    except Exception as e:
-        logger.warning(f"Similarity search failed: {e}")
-    
-    # Deduplicate and return top k
-    seen = set()
-    unique_docs = []
-    for doc in results:
-        doc_id = hash(doc.page_content[:100])
-        if doc_id not in seen:
-            seen.add(doc_id)
-            unique_docs.append(doc)
-    
-    return unique_docs[:k]
+async def hybrid_retrieval(
+    vector_store: VectorStore,
+    llm: ChatOpenAI,
+    query: str,
+    k: int,
+    filter: dict | None = None,
+    lexical_index: LexicalIndex | None = None,
+) -> RetrievalResult:
+    """Combine LLM-enhanced, multi-query, plain similarity and (when indexed) BM25 search, running all stages concurrently"""
+    result = await orchestrate_retrieval(
+        query,
+        k,
+        search=_similarity_search_fn(vector_store, filter),
+        refine=partial(refine_query_with_llm, llm),
+        expand=partial(stream_expanded_queries, llm),
+        lexical=_lexical_search_fn(lexical_index, filter),
+        expanded_k=max(k // 2, 1),
+        **_orchestrator_options(),
+    )
+    logger.info(f"Hybrid retrieval timings (ms): {result.timings}")
+    return result
+
+
+async def lexical_hybrid_retrieval(
+    vector_store: VectorStore, lexical_index: LexicalIndex | None, query: str, k: int, filter: dict | None = None
+) -> RetrievalResult:
+    """Fuse a dense similarity search with a BM25 search of the same question, without LLM calls"""
+    if lexical_index is None:
+        logger.warning("Lexical index not loaded, lexical_hybrid falls back to similarity search")
+    result = await orchestrate_retrieval(
+        query,
+        k,
+        search=_similarity_search_fn(vector_store, filter),
+        lexical=_lexical_search_fn(lexical_index, filter),
+        **_orchestrator_options(),
+    )
+    logger.info(f"Lexical hybrid retrieval timings (ms): {result.timings}")
+    return result
 
 
 @app.get("/")
@@ -274,7 +1208,54 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "ok"}
+    state = _startup_state()
+    if state == "failed":
+        # Lets the platform replace an instance whose clients could not be built.
+        return JSONResponse(status_code=503, content={"status": "error", "startup": state})
+    return {"status": "ok", "startup": state}
+
+
+@app.get("/debug/startup-stats")
+async def debug_startup_stats():
+    """Debug endpoint with the startup mode, its state and the duration of each startup phase (ms)"""
+    return {"mode": settings.startup_mode, "state": _startup_state(), **app.state.startup_timings}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus metrics: per-stage latency and size histograms, request durations and cache counters"""
+    lines = render_stats("rag_single_flight", answer_flights.snapshot_stats(), "Identical /api/ask requests sharing one run.")
+    lines += render_stats("rag_startup", app.state.startup_timings, "Startup phase durations in milliseconds.")
+    components = (
+        ("rag_embedding_cache", getattr(app.state, "embeddings", None), "Query embedding cache and batching."),
+        ("rag_rewrite_cache", getattr(app.state, "rewrite_cache", None), "LLM query rewrite cache."),
+        ("rag_answer_cache", getattr(app.state, "answer_cache", None), "Answer cache."),
+        ("rag_manifest_index", getattr(app.state, "manifest_index", None), "In-memory ingestion manifest index."),
+        ("rag_rerank", getattr(app.state, "rerank_stage", None), "Rerank stage outcomes."),
+        ("rag_mmr_vector_cache", getattr(app.state, "chunk_vectors", None), "Chunk vectors cached for MMR."),
+        ("rag_financial_facts", getattr(app.state, "financial_facts", None), "Financial facts index lookups."),
+    )
+    for prefix, component, help in components:
+        if hasattr(component, "snapshot_stats"):
+            lines += render_stats(prefix, component.snapshot_stats(), help)
+    for name, upstream in _upstreams().items():
+        lines += render_stats(f"rag_admission_{name}", upstream.snapshot_stats(), f"Admission control for {name} calls.")
+    return PlainTextResponse(render_metrics(lines), media_type="text/plain; version=0.0.4")
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    """Whether the request's If-None-Match covers ``etag`` (weak comparison, as for GET)"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return etag in {tag.strip().removeprefix("W/") for tag in header.split(",")}
+
+
+def _revalidate_headers(etag: str) -> dict:
+    # Clients may keep the payload but must revalidate it (cheaply, via If-None-Match) on every use.
+    return {"ETag": etag, "Cache-Control": "no-cache"}
 
 
 @app.get("/api/ingestion/files")
@@ -285,14 +1266,25 @@ async def list_ingestion_files(
     limit: int = Query(default=100, ge=1, le=500, description="Maximum records to return"),
 ):
     """List ingestion manifest documents from ingestion/10k/files."""
+    manifest_index: ManifestIndex | None = request.app.state.manifest_index
+    if manifest_index is not None and manifest_index.ready:
+        etag = manifest_index.etag
+        if _etag_matches(request, etag):
+            return Response(status_code=304, headers=_revalidate_headers(etag))
+        records = manifest_index.list(ticker=ticker, status=status, limit=limit)
+        return JSONResponse({"count": len(records), "items": records}, headers=_revalidate_headers(etag))
+
     db = _require_firestore(request)
-    records = await run_in_threadpool(
-        list_ingestion_records,
-        db,
-        ticker=ticker,
-        status=status,
-        limit=limit,
-    )
+    if _is_async_firestore(db):
+        records = await alist_ingestion_records(db, ticker=ticker, status=status, limit=limit)
+    else:
+        records = await run_in_threadpool(
+            list_ingestion_records,
+            db,
+            ticker=ticker,
+            status=status,
+            limit=limit,
+        )
     return {
         "count": len(records),
         "items": records,
@@ -302,39 +1294,61 @@ async def list_ingestion_files(
 @app.get("/api/ingestion/files/{ticker}/{year}")
 async def get_ingestion_file(request: Request, ticker: str, year: int):
     """Get one ingestion manifest document by ticker and filing year."""
-    db = _require_firestore(request)
-    record = await run_in_threadpool(get_ingestion_record, db, ticker, year)
+    manifest_index: ManifestIndex | None = request.app.state.manifest_index
+    etag = None
+    if manifest_index is not None and manifest_index.ready:
+        etag = manifest_index.etag
+        if _etag_matches(request, etag):
+            return Response(status_code=304, headers=_revalidate_headers(etag))
+        record = manifest_index.get(ticker, year)
+    else:
+        db = _require_firestore(request)
+        if _is_async_firestore(db):
+            record = await aget_ingestion_record(db, ticker, year)
+        else:
+            record = await run_in_threadpool(get_ingestion_record, db, ticker, year)
     if record is None:
         raise HTTPException(
             status_code=404,
             detail=f"No ingestion record found for {ticker.strip().upper()} {year}",
         )
-    return record
+    if etag is None:
+        return record
+    return JSONResponse(record, headers=_revalidate_headers(etag))
 
 
 @app.get("/debug/index-stats")
 async def debug_index_stats():
-    """Debug endpoint to check if the Pinecone index has data"""
+    """Debug endpoint to check if the vector index has data"""
+    from local_vector_store import LocalVectorStore
+
     try:
         vector_store = app.state.vector_store
-        index = vector_store.index
         
         # Get index stats
-        stats = index.describe_index_stats()
+        if isinstance(vector_store, LocalVectorStore):
+            stats = vector_store.describe_index_stats()
+        else:
+            stats = vector_store.index.describe_index_stats()
         
         # Try a simple test query
-        test_docs = await run_in_threadpool(
-            vector_store.similarity_search, 
+        test_docs = await _vector_search(
+            vector_store,
+            "similarity_search", 
             "test", 
             1
         )
         
+        profile = EmbeddingProfile.parse(settings.embedding_profile)
         return {
+            "backend": settings.vector_store_backend,
             "index_name": settings.pinecone_index_name,
             "index_stats": stats,
             "test_query_results": len(test_docs),
-            "embedding_model": "text-embedding-3-large",
-            "embedding_dimension": 3072,
+            "embedding_model": profile.model,
+            "embedding_dimension": profile.dimensions,
+            "embedding_profile": str(profile),
+            "lexical_index": app.state.lexical_index.stats() if app.state.lexical_index else None,
         }
     except Exception as e:
         logger.error(f"Error getting index stats: {str(e)}", exc_info=True)
@@ -344,53 +1358,557 @@ async def debug_index_stats():
         }
 
 
+@app.get("/debug/cache-stats")
+async def debug_cache_stats():
+    """Debug endpoint with hit/miss counters for the answer cache"""
+    answer_cache: AnswerCache | None = app.state.answer_cache
+    if answer_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, "backend": settings.answer_cache_backend, **answer_cache.snapshot_stats()}
+
+
+@app.get("/debug/manifest-index-stats")
+async def debug_manifest_index_stats():
+    """Debug endpoint with the size, freshness and update counts of the in-memory ingestion manifest index"""
+    manifest_index: ManifestIndex | None = app.state.manifest_index
+    if manifest_index is None:
+        return {"enabled": False}
+    return {"enabled": True, "mode": settings.manifest_index_mode, **manifest_index.snapshot_stats()}
+
+
+@app.get("/debug/single-flight-stats")
+async def debug_single_flight_stats():
+    """Debug endpoint with counts of /api/ask and /api/ask/stream requests that joined an identical in-flight request"""
+    return answer_flights.snapshot_stats()
+
+
+@app.get("/debug/rewrite-cache-stats")
+async def debug_rewrite_cache_stats():
+    """Debug endpoint with hit/miss/coalesced counters for the query rewrite cache"""
+    rewrite_cache: RewriteCache | None = app.state.rewrite_cache
+    if rewrite_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, "backend": settings.rewrite_cache_backend, **rewrite_cache.snapshot_stats()}
+
+
+def _upstreams() -> dict[str, Upstream]:
+    upstreams = {"vector_store": getattr(app.state, "vector_upstream", None), "llm": getattr(app.state, "llm_upstream", None)}
+    return {name: upstream for name, upstream in upstreams.items() if upstream is not None}
+
+
+@app.get("/debug/admission-stats")
+async def debug_admission_stats():
+    """Debug endpoint with active, queued and rejected counts and retries per upstream"""
+    return {name: upstream.snapshot_stats() for name, upstream in _upstreams().items()}
+
+
+@app.get("/debug/embedding-stats")
+async def debug_embedding_stats():
+    """Debug endpoint with hit rate and batching counters for the query embedding cache"""
+    from embedding_cache import CachedEmbeddings
+
+    embeddings = app.state.embeddings
+    if not isinstance(embeddings, CachedEmbeddings):
+        return {"enabled": False}
+    return {"enabled": True, **embeddings.snapshot_stats()}
+
+
+@app.get("/debug/mmr-stats")
+async def debug_mmr_stats():
+    """Debug endpoint with the size and hit rate of the chunk-vector cache used by MMR"""
+    return app.state.chunk_vectors.snapshot_stats()
+
+
+@app.get("/debug/facts-stats")
+async def debug_facts_stats():
+    """Debug endpoint with the size and lookup hit rate of the financial facts index"""
+    financial_facts: FinancialFacts | None = app.state.financial_facts
+    if financial_facts is None:
+        return {"enabled": False}
+    return {"enabled": True, "path": settings.facts_index_path, **financial_facts.snapshot_stats()}
+
+
+async def _lookup_cached_answer(query: AskRequest, answer_cache: AnswerCache):
+    """Return (cached payload or None, question embedding or None)"""
+    with span("cache_lookup"):
+        # Lookups run off the loop: dropping an expired entry writes to the backend.
+        cached = await run_in_threadpool(answer_cache.get_exact, query.question, _cache_scope(query), query.k)
+        question_embedding = None
+        if cached is None:
+            try:
+                question_embedding = await app.state.embeddings.aembed_query(query.question)
+                cached = await run_in_threadpool(answer_cache.get_similar, question_embedding, _cache_scope(query), query.k)
+            except Exception as e:
+                logger.warning(f"Question embedding for cache lookup failed: {e}")
+                answer_cache.record_miss()
+    if cached is not None:
+        logger.info(f"Answer cache hit for question: {query.question} (method: {query.retrieval_method})")
+    return cached, question_embedding
+
+
+async def _store_cached_answer(query: AskRequest, answer_cache: AnswerCache, answer: str, question_embedding) -> None:
+    await run_in_threadpool(
+        answer_cache.put,
+        query.question,
+        _cache_scope(query),
+        query.k,
+        {"answer": answer},
+        question_embedding,
+    )
+
+
+def _flight_key(endpoint: str, query: AskRequest) -> tuple:
+    """Requests with the same key produce the same answer and can share one in-flight run"""
+    return (endpoint, normalize_question(query.question), _cache_scope(query), query.k, query.use_cache, query.use_facts)
+
+
+def _facts_answer(query: AskRequest) -> dict | None:
+    """
+    Answer a question that asks for one reported figure of one company straight
+    from the financial facts index; None sends it through retrieval and the LLM.
+    """
+    financial_facts: FinancialFacts | None = getattr(app.state, "financial_facts", None)
+    if financial_facts is None or not query.use_facts or query.sections:
+        return None
+    if query.doc_types and "10-K" not in query.doc_types:
+        return None
+    from financial_facts import parse_metric_question
+
+    with span("facts_lookup"):
+        symbol_index: SymbolIndex | None = app.state.symbol_index
+        tickers, words = symbol_index.mentions(query.question) if symbol_index is not None else ([], set())
+        if query.tickers:
+            tickers = list(dict.fromkeys(normalize_ticker(ticker) for ticker in query.tickers))
+        if len(tickers) != 1:
+            return None
+        question = parse_metric_question(query.question, words)
+        if question is None:
+            return None
+        if not question.years and query.years:
+            question = replace(question, years=tuple(sorted(set(query.years))))
+        answer = financial_facts.answer(question, tickers[0])
+    if answer is None:
+        return None
+    text, facts = answer
+    logger.info(f"Answered from the financial facts index: {query.question}")
+    return {"answer": text, "facts": [fact.to_dict() for fact in facts]}
+
+
+async def _ask_once(query: AskRequest) -> dict:
+    """Answer one question (from the facts index or answer cache when possible), returning the payload with its timings"""
+    with trace_run("ask", _method_label(query)) as trace:
+        facts = _facts_answer(query)
+        if facts is not None:
+            trace.outcome = "facts"
+            return {**facts, "timings": trace.timings}
+
+        answer_cache: AnswerCache | None = app.state.answer_cache if query.use_cache else None
+        if answer_cache is None:
+            return {"answer": await _answer_question(query), "timings": trace.timings}
+
+        cached, question_embedding = await _lookup_cached_answer(query, answer_cache)
+        if cached is not None:
+            trace.outcome = "cache_hit"
+            return {**cached, "timings": trace.timings}
+
+        answer = await _answer_question(query)
+        await _store_cached_answer(query, answer_cache, answer, question_embedding)
+        return {"answer": answer, "timings": trace.timings}
+
+
 @app.post("/api/ask")
 async def ask(query: AskRequest):
+    # Identical concurrent requests share one run; it always records timings so any caller can have them.
+    shared = await answer_flights.do(_flight_key("ask", query), partial(_ask_once, query))
+    payload = {key: value for key, value in shared.items() if key != "timings"}
+    if query.include_timings:
+        payload["timings"] = dict(shared["timings"])
+    return payload
+
+
+def _sse(event: str, data) -> str:
+    """Format one Server-Sent Events message with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _source_payload(doc: Document) -> dict:
+    return {"id": doc.id, **doc.metadata}
+
+
+async def _answer_events(query: AskRequest) -> AsyncIterator[tuple[str, dict | list]]:
+    """(event, data) pairs for one streamed answer; the `done` event always carries timings"""
+    with trace_run("stream", _method_label(query)) as trace:
+        facts = _facts_answer(query)
+        if facts is not None:
+            trace.outcome = "facts"
+            yield "sources", []
+            yield "facts", facts["facts"]
+            yield "token", {"text": facts["answer"]}
+            yield "done", {"timings": trace.timings}
+            return
+
+        answer_cache: AnswerCache | None = app.state.answer_cache if query.use_cache else None
+        question_embedding = None
+        if answer_cache is not None:
+            cached, question_embedding = await _lookup_cached_answer(query, answer_cache)
+            if cached is not None:
+                trace.outcome = "cache_hit"
+                yield "sources", []
+                yield "token", {"text": cached["answer"]}
+                yield "done", {"timings": trace.timings}
+                return
+
+        try:
+            docs = await _retrieve_documents(query)
+        except (HTTPException, Overloaded) as e:
+            trace.outcome = f"http_{e.status_code}"
+            yield "error", _batch_error(e)["error"]
+            return
+        yield "sources", [_source_payload(doc) for doc in docs]
+
+        parts = []
+        try:
+            async with aclosing(_stream_answer(_build_prompt(query.question, docs))) as tokens:
+                async for text in tokens:
+                    parts.append(text)
+                    yield "token", {"text": text}
+        except asyncio.CancelledError:
+            logger.info("Answer stream cancelled; stopping answer generation")
+            raise
+        except Overloaded as e:
+            trace.outcome = "http_503"
+            yield "error", _batch_error(e)["error"]
+            return
+        except Exception as e:
+            logger.error(f"Error during answer generation: {str(e)}", exc_info=True)
+            trace.outcome = "error"
+            yield "error", {"status": 500, "detail": f"Error generating the answer: {str(e)}"}
+            return
+
+        if answer_cache is not None:
+            await _store_cached_answer(query, answer_cache, "".join(parts), question_embedding)
+        yield "done", {"timings": trace.timings}
+
+
+@app.post("/api/ask/stream")
+async def ask_stream(query: AskRequest, request: Request):
+    """
+    Stream an answer as Server-Sent Events.
+
+    Events, in order: `sources` (retrieved chunk metadata), any number of `token`
+    events with `{"text": ...}`, then `done` (with `timings` when requested).
+    Questions answered from the financial facts index get a `facts` event
+    (the statement line items used) after an empty `sources` event.
+    Failures are reported as a single `error` event with `status` and `detail`
+    (plus `retry_after` seconds for 503). Identical concurrent requests share one
+    generation and each receives every event from the start; generation stops
+    once all of their clients disconnect.
+    """
+    flight_key = _flight_key("stream", query)
+    if not answer_flights.running(flight_key):
+        # Shed load with a plain 503 before the event stream starts, while that is still possible.
+        app.state.vector_upstream.gate.check()
+        app.state.llm_upstream.gate.check()
+
+    async def event_stream():
+        events = answer_flights.stream(flight_key, partial(_answer_events, query))
+        async with aclosing(events) as shared_events:
+            async for event, data in shared_events:
+                if await request.is_disconnected():
+                    logger.info("Client disconnected; leaving the answer stream")
+                    return
+                if event == "done" and not query.include_timings:
+                    data = {}
+                yield _sse(event, data)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _batch_error(e: Exception) -> dict:
+    if isinstance(e, HTTPException):
+        return {"error": {"status": e.status_code, "detail": e.detail}}
+    if isinstance(e, Overloaded):
+        return {"error": {"status": 503, "detail": str(e), "retry_after": int(e.retry_after_header())}}
+    return {"error": {"status": 500, "detail": str(e)}}
+
+
+def _search_plan(query: AskRequest, k: int, refined: str | None, expanded: List[str], lexical: bool) -> List[tuple]:
+    """(query text, k, mode) searches for a strategy, in the order its results are merged"""
+    mode = "mmr" if query.retrieval_method == "mmr" else "similarity"
+    lexical_search = [(query.question, k, "lexical")] if lexical else []
+    if query.retrieval_method == "llm_enhanced":
+        return [(refined or query.question, k, mode)]
+    if query.retrieval_method == "multi_query":
+        return [(query.question, k, mode)] + [(q, k, mode) for q in expanded]
+    if query.retrieval_method == "hybrid":
+        plan = [(query.question, k, mode)] + lexical_search + [(q, max(k // 2, 1), mode) for q in expanded]
+        if refined and refined.strip() != query.question.strip():
+            plan.insert(0, (refined, k, mode))
+        return plan
+    if query.retrieval_method == "lexical_hybrid":
+        return [(query.question, k, mode)] + lexical_search
+    return [(query.question, k, mode)]
+
+
+@app.post("/api/ask/batch")
+async def ask_batch(queries: List[AskRequest]):
+    """
+    Answer many questions in one call.
+
+    All distinct question and rewritten-query texts are embedded in a single
+    batched embeddings call, identical searches run once with bounded
+    concurrency, and identical prompts are generated once. Results are returned
+    in request order; a failing item gets an `error` object instead of failing
+    the whole batch.
+    """
+    if len(queries) > settings.batch_max_items:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch has {len(queries)} items; the maximum is {settings.batch_max_items}",
+        )
+
+    with trace_run("batch", "mixed"):
+        results = await _answer_batch(queries)
+    return {"count": len(queries), "results": results}
+
+
+async def _answer_batch(queries: List[AskRequest]) -> List[dict]:
     vector_store = app.state.vector_store
+    lexical_index: LexicalIndex | None = app.state.lexical_index
     llm = app.state.llm
+    answer_cache: AnswerCache | None = app.state.answer_cache
+    llm_semaphore = asyncio.Semaphore(settings.batch_llm_concurrency)
+    search_semaphore = asyncio.Semaphore(settings.batch_search_concurrency)
+    results: List[dict | None] = [None] * len(queries)
+
+    def cache_for(query: AskRequest) -> AnswerCache | None:
+        return answer_cache if query.use_cache else None
+
+    # 1. Financial-fact lookups and exact answer-cache hits need no further work
+    pending = []
+    for i, query in enumerate(queries):
+        facts = _facts_answer(query)
+        if facts is not None:
+            results[i] = facts
+            continue
+        cache = cache_for(query)
+        cached = await run_in_threadpool(cache.get_exact, query.question, _cache_scope(query), query.k) if cache else None
+        if cached is not None:
+            results[i] = dict(cached)
+        else:
+            pending.append(i)
+
+    # 2. LLM query rewrites, shared between items asking the same question
+    async def limited_llm(coro):
+        async with llm_semaphore:
+            return await coro
+
+    refine_questions = {queries[i].question for i in pending if queries[i].retrieval_method in ("llm_enhanced", "hybrid")}
+    expand_questions = {queries[i].question for i in pending if queries[i].retrieval_method in ("multi_query", "hybrid")}
+    with span("rewrite", questions=len(refine_questions) + len(expand_questions)):
+        refined_list, expanded_list = await asyncio.gather(
+            asyncio.gather(*(limited_llm(refine_query_with_llm(llm, q)) for q in refine_questions)),
+            asyncio.gather(*(limited_llm(expand_query_with_llm(llm, q)) for q in expand_questions)),
+        )
+    refined = dict(zip(refine_questions, refined_list))
+    expanded = {q: variations[1:] for q, variations in zip(expand_questions, expanded_list)}
+    plans = {}
+    for i in pending:
+        metadata_filter, auto_filter = _resolve_filter(queries[i])
+        filter_key = json.dumps(metadata_filter, sort_keys=True) if metadata_filter else None
+        plans[i] = [
+            (text, k, mode, filter_key, auto_filter)
+            for text, k, mode in _search_plan(
+                queries[i],
+                _candidate_k(queries[i]),
+                refined.get(queries[i].question),
+                expanded.get(queries[i].question, []),
+                lexical=lexical_index is not None,
+            )
+        ]
+
+    # 3. One embeddings call for every distinct question and search text
+    texts = list(dict.fromkeys(
+        [queries[i].question for i in pending] + [text for i in pending for text, *_ in plans[i]]
+    ))
+    try:
+        vectors = dict(zip(texts, await app.state.embeddings.aembed_documents(texts))) if texts else {}
+    except Exception as e:
+        logger.error(f"Batch embedding failed: {str(e)}", exc_info=True)
+        for i in pending:
+            results[i] = _batch_error(HTTPException(status_code=500, detail=f"Error embedding queries: {str(e)}"))
+        return results
+
+    still_pending = []
+    for i in pending:
+        cache = cache_for(queries[i])
+        cached = (
+            await run_in_threadpool(cache.get_similar, vectors[queries[i].question], _cache_scope(queries[i]), queries[i].k)
+            if cache
+            else None
+        )
+        if cached is not None:
+            results[i] = dict(cached)
+        else:
+            still_pending.append(i)
+
+    # 4. Vector searches, each distinct (text, k, mode, filter) run once
+    async def search_by_vector(text: str, k: int, mode: str, metadata_filter: dict | None):
+        if mode == "lexical":
+            return _relative_scores(await run_in_threadpool(lexical_index.search, text, k, filter=metadata_filter))
+        if mode == "mmr":
+            return [(doc, None) for doc in await mmr_search(vector_store, vectors[text], k, filter=metadata_filter)]
+        return await _vector_search(
+            vector_store, "similarity_search_by_vector_with_score", vectors[text], k=k, filter=metadata_filter
+        )
+
+    async def run_search(text: str, k: int, mode: str, filter_key: str | None, auto_filter: bool):
+        async with search_semaphore:
+            metadata_filter = json.loads(filter_key) if filter_key else None
+            found = await search_by_vector(text, k, mode, metadata_filter)
+            if not found and auto_filter:
+                # The detected companies may not be in the index; search everything instead.
+                found = await search_by_vector(text, k, mode, None)
+            return found
+
+    search_keys = list(dict.fromkeys(key for i in still_pending for key in plans[i]))
+    with span("search", searches=len(search_keys)):
+        search_outcomes = await asyncio.gather(*(run_search(*key) for key in search_keys), return_exceptions=True)
+    searches = dict(zip(search_keys, search_outcomes))
+    logger.info(f"Batch of {len(queries)}: {len(texts)} texts embedded, {len(search_keys)} distinct searches")
+
+    # 5. Merge and rerank per item, then generate, sharing identical prompts
+    candidates: dict[int, List[Document]] = {}
+    for i in still_pending:
+        query = queries[i]
+        outcomes = [searches[key] for key in plans[i]]
+        if all(isinstance(outcome, Exception) for outcome in outcomes):
+            logger.error(f"Batch search failed for item {i}: {outcomes[0]}")
+            results[i] = _batch_error(
+                outcomes[0] if isinstance(outcomes[0], Overloaded)
+                else HTTPException(status_code=500, detail=f"Error searching the knowledge base: {str(outcomes[0])}")
+            )
+            continue
+        fused = fuse_results(
+            (outcome for outcome in outcomes if not isinstance(outcome, Exception)),
+            _candidate_k(query),
+            method=settings.retrieval_fusion_method,
+            rrf_k=settings.retrieval_rrf_k,
+        )
+        try:
+            candidates[i] = _documents_with_content([doc for doc, _ in fused])
+        except HTTPException as e:
+            results[i] = _batch_error(e)
+
+    reranked = await asyncio.gather(*(_rerank(queries[i].question, docs, queries[i].k) for i, docs in candidates.items()))
+    prompts: dict[str, List[int]] = {}
+    for i, docs in zip(candidates, reranked):
+        prompts.setdefault(_build_prompt(queries[i].question, docs), []).append(i)
+
+    prompt_list = list(prompts)
+    with span("generation", prompts=len(prompt_list)):
+        answers = await asyncio.gather(
+            *(limited_llm(_llm_invoke(llm, prompt)) for prompt in prompt_list),
+            return_exceptions=True,
+        )
+    for prompt, response in zip(prompt_list, answers):
+        for i in prompts[prompt]:
+            if isinstance(response, Exception):
+                results[i] = _batch_error(response)
+                continue
+            results[i] = {"answer": response.content}
+            cache = cache_for(queries[i])
+            if cache is not None:
+                await _store_cached_answer(queries[i], cache, response.content, vectors[queries[i].question])
+
+    return results
+
+
+RETRIEVAL_METHODS = ("similarity", "mmr", "multi_query", "llm_enhanced", "hybrid", "lexical_hybrid")
 
-    logger.info(f"Received question: {query.question} (method: {query.retrieval_method})")
+
+def _method_label(query: AskRequest) -> str:
+    """Retrieval method as a metrics label; unknown methods run (and are counted) as similarity"""
+    return query.retrieval_method if query.retrieval_method in RETRIEVAL_METHODS else "similarity"
+
+
+def _record_orchestrated(result: RetrievalResult) -> List[Document]:
+    """Add the orchestrator's stage timings to the current trace and return its documents"""
+    for stage, elapsed_ms in result.timings.items():
+        # "total" is covered by the enclosing retrieval span.
+        if stage != "total":
+            record(stage, elapsed_ms)
+    if not result.docs:
+        # Nothing found because the searches were shed, not because nothing matched: let the client retry.
+        overloaded = [e for e in result.errors.values() if isinstance(e, Overloaded)]
+        if overloaded:
+            raise overloaded[0]
+    return result.docs
+
+
+async def _similarity_documents(vector_store: VectorStore, query: str, k: int, metadata_filter: dict | None):
+    with span("search:original") as counts:
+        docs = await _vector_search(vector_store, "similarity_search", query, k, filter=metadata_filter)
+        counts["documents"] = len(docs)
+    return docs
+
+
+async def _run_strategy(query: AskRequest, metadata_filter: dict | None, k: int) -> List[Document]:
+    vector_store = app.state.vector_store
+    llm = app.state.llm
+
+    if query.retrieval_method == "similarity":
+        return await _similarity_documents(vector_store, query.question, k, metadata_filter)
+    if query.retrieval_method == "mmr":
+        with span("search:original") as counts:
+            docs = await mmr_search(vector_store, query.question, k, filter=metadata_filter)
+            counts["documents"] = len(docs)
+        return docs
+    if query.retrieval_method == "multi_query":
+        return _record_orchestrated(
+            await multi_query_retrieval(vector_store, llm, query.question, k, metadata_filter)
+        )
+    if query.retrieval_method == "llm_enhanced":
+        return await llm_enhanced_retrieval(vector_store, llm, query.question, k, metadata_filter)
+    if query.retrieval_method == "hybrid":
+        return _record_orchestrated(
+            await hybrid_retrieval(vector_store, llm, query.question, k, metadata_filter, app.state.lexical_index)
+        )
+    if query.retrieval_method == "lexical_hybrid":
+        return _record_orchestrated(
+            await lexical_hybrid_retrieval(vector_store, app.state.lexical_index, query.question, k, metadata_filter)
+        )
+
+    logger.warning(f"Unknown retrieval method: {query.retrieval_method}, using similarity")
+    return await _similarity_documents(vector_store, query.question, k, metadata_filter)
+
+
+async def _retrieve_documents(query: AskRequest) -> List[Document]:
+    """Run the selected retrieval strategy and return the documents that have content"""
+    metadata_filter, auto_filter = _resolve_filter(query)
+    logger.info(
+        f"Received question: {query.question} (method: {query.retrieval_method}, filter: {metadata_filter})"
+    )
     
     # 1. Retrieve most relevant documents using selected method
+    k = _candidate_k(query)
     try:
-        if query.retrieval_method == "similarity":
-            docs = await run_in_threadpool(vector_store.similarity_search, query.question, query.k)
-        elif query.retrieval_method == "mmr":
-            docs = await mmr_search(vector_store, query.question, query.k)
-        elif query.retrieval_method == "multi_query":
-            docs = await multi_query_retrieval(vector_store, llm, query.question, query.k)
-        elif query.retrieval_method == "llm_enhanced":
-            docs = await llm_enhanced_retrieval(vector_store, llm, query.question, query.k)
-        elif query.retrieval_method == "hybrid":
-            docs = await hybrid_retrieval(vector_store, llm, query.question, query.k)
-        else:
-            logger.warning(f"Unknown retrieval method: {query.retrieval_method}, using similarity")
-            docs = await run_in_threadpool(vector_store.similarity_search, query.question, query.k)
-        
+        with span("retrieval") as counts:
+            docs = await _run_strategy(query, metadata_filter, k)
+            if not docs and auto_filter:
+                # The detected companies may not be in the index; search everything instead.
+                logger.info(f"No documents for detected filter {metadata_filter}, retrying without it")
+                docs = await _run_strategy(query, None, k)
+            counts["documents"] = len(docs)
+
         logger.info(f"Found {len(docs)} documents using {query.retrieval_method} method")
+        docs_with_content = _documents_with_content(docs)
         
-        if not docs:
-            logger.warning("No documents returned from search")
-            raise HTTPException(
-                status_code=404,
-                detail="I could not find relevant information in the knowledge base. The index may be empty or the query doesn't match any documents.",
-            )
-        
-        # Filter out documents with empty content
-        docs_with_content = [doc for doc in docs if doc.page_content and doc.page_content.strip()]
-        logger.info(f"Found {len(docs_with_content)} documents with content")
-        
-        if not docs_with_content:
-            logger.warning("All documents returned have empty content")
-            raise HTTPException(
-                status_code=404,
-                detail="I could not find relevant information in the knowledge base. Documents were found but contain no content.",
-            )
-        
-        context = "\n\n".join(doc.page_content for doc in docs_with_content)
-        logger.info(f"Context length: {len(context)} characters")
-        
-    except HTTPException:
+    except (HTTPException, Overloaded):
         raise
     except Exception as e:
         logger.error(f"Error during retrieval: {str(e)}", exc_info=True)
@@ -399,8 +1917,68 @@ async def ask(query: AskRequest):
             detail=f"Error searching the knowledge base: {str(e)}",
         )
 
-    # 2. Build prompt
-    prompt = f"""
+    return await _rerank(query.question, docs_with_content, query.k)
+
+
+def _candidate_k(query: AskRequest) -> int:
+    """How many documents to retrieve: over-fetched for the reranker when it is on"""
+    if app.state.rerank_stage is None:
+        return query.k
+    return max(query.k, settings.rerank_candidates)
+
+
+async def _rerank(question: str, docs: List[Document], k: int) -> List[Document]:
+    """Keep the k best candidates by the reranker (no-op when reranking is off)"""
+    rerank_stage: RerankStage | None = app.state.rerank_stage
+    if rerank_stage is None:
+        return docs
+    with span("rerank", candidates=len(docs)) as counts:
+        result = await rerank_stage.rerank(question, docs, k)
+        counts["kept"] = len(result.docs)
+        counts["fallbacks"] = int(not result.reranked)
+    return result.docs
+
+
+def _documents_with_content(docs: List[Document]) -> List[Document]:
+    """Drop empty documents, raising 404 when nothing usable was retrieved"""
+    if not docs:
+        logger.warning("No documents returned from search")
+        raise HTTPException(
+            status_code=404,
+            detail="I could not find relevant information in the knowledge base. The index may be empty or the query doesn't match any documents.",
+        )
+    
+    # Filter out documents with empty content
+    docs_with_content = [doc for doc in docs if doc.page_content and doc.page_content.strip()]
+    logger.info(f"Found {len(docs_with_content)} documents with content")
+    
+    if not docs_with_content:
+        logger.warning("All documents returned have empty content")
+        raise HTTPException(
+            status_code=404,
+            detail="I could not find relevant information in the knowledge base. Documents were found but contain no content.",
+        )
+    return docs_with_content
+
+
+def _build_prompt(question: str, docs: List[Document]) -> str:
+    with span("context", chunks=len(docs)) as counts:
+        assembled = assemble_context(
+            docs,
+            budget_tokens=settings.context_token_budget,
+            count_tokens=token_counter.count,
+            truncate=token_counter.truncate,
+            duplicate_threshold=settings.context_duplicate_threshold,
+        )
+        counts["tokens"] = assembled.tokens
+        counts["passages"] = len(assembled.passages)
+    context = assembled.text
+    logger.info(
+        f"Context: {assembled.tokens} tokens in {len(assembled.passages)} passages from {len(docs)} chunks "
+        f"({assembled.merged_chunks} merged, {assembled.dropped_duplicates} near-duplicates dropped, "
+        f"{assembled.dropped_over_budget} over budget)"
+    )
+    return f"""
     You are a factual assistant. Answer ONLY using the provided context.
     If the answer is not found in the context, say:
     "I could not find relevant information in the knowledge base."
@@ -409,9 +1987,32 @@ async def ask(query: AskRequest):
     {context}
 
     QUESTION:
-    {query.question}
+    {question}
     """
 
+
+async def _stream_answer(prompt: str) -> AsyncIterator[str]:
+    """Stream answer text from the LLM, recording time to first token and generation spans"""
+    with span("generation", prompt_tokens=token_counter.count(prompt)) as counts:
+        generation_started = time.perf_counter()
+        parts = []
+        async with aclosing(_llm_stream(app.state.llm, prompt)) as chunks:
+            async for chunk in chunks:
+                if chunk.content:
+                    if not parts:
+                        record("time_to_first_token", (time.perf_counter() - generation_started) * 1000)
+                    parts.append(chunk.content)
+                    yield chunk.content
+        counts["completion_tokens"] = token_counter.count("".join(parts))
+
+
+async def _answer_question(query: AskRequest) -> str:
+    """Run retrieval and generation for one question, bypassing the answer cache"""
+    docs = await _retrieve_documents(query)
+
+    # 2. Build prompt
+    prompt = _build_prompt(query.question, docs)
+
     # 3. Query the LLM
-    response = await llm.ainvoke(prompt)
-    return {"answer": response.content}
+    async with aclosing(_stream_answer(prompt)) as tokens:
+        return "".join([text async for text in tokens])
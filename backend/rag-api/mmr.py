@@ -0,0 +1,130 @@
+"""Vectorized maximal marginal relevance over a compact cache of chunk vectors."""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Iterable
+
+import numpy as np
+
+
+def truncate_vectors(vectors: np.ndarray, dims: int | None) -> np.ndarray:
+    """
+    Keep the first ``dims`` components of each row and re-normalize to unit length.
+
+    OpenAI's ``text-embedding-3`` models are trained so that such prefixes
+    (Matryoshka truncation) remain good embeddings on their own, which makes a
+    few hundred dimensions enough to tell near-duplicate chunks apart.
+    """
+    matrix = np.asarray(vectors, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix[np.newaxis, :]
+    if dims and dims < matrix.shape[1]:
+        matrix = matrix[:, :dims]
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def mmr_select(relevance: np.ndarray, vectors: np.ndarray, k: int, lambda_mult: float = 0.5) -> list[int]:
+    """
+    Indices of ``k`` candidates chosen by maximal marginal relevance, in selection order.
+
+    ``relevance`` is each candidate's similarity to the query (e.g. the score the
+    vector search returned) and ``vectors`` are unit-length candidate vectors used
+    only for the candidate-to-candidate similarities. The pairwise similarity
+    matrix is computed once, and each step updates every candidate's redundancy
+    (its highest similarity to anything already selected) with one vector
+    maximum, so selection is O(n * k) after a single (n, n) product.
+    """
+    relevance = np.asarray(relevance, dtype=np.float32)
+    count = len(relevance)
+    k = min(k, count)
+    if k <= 0:
+        return []
+    similarity = vectors @ vectors.T
+    first = int(np.argmax(relevance))
+    selected = [first]
+    redundancy = similarity[first].copy()
+    available = np.ones(count, dtype=bool)
+    available[first] = False
+    weighted_relevance = lambda_mult * relevance
+    while len(selected) < k:
+        scores = weighted_relevance - (1 - lambda_mult) * redundancy
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        np.maximum(redundancy, similarity[best], out=redundancy)
+    return selected
+
+
+class ChunkVectorCache:
+    """
+    Recently seen chunk vectors by vector ID, truncated to ``dims`` and stored as float16.
+
+    Rows live in one preallocated matrix (allocated on first use, when the vector
+    width is known) and are evicted least-recently-used first beyond
+    ``max_entries``. At 256 dimensions an entry takes 512 bytes, against 12 KB for
+    a full 3072-dimension float32 vector.
+    """
+
+    def __init__(self, max_entries: int = 20000, dims: int | None = 256):
+        self.max_entries = max_entries
+        self.dims = dims or None
+        self._matrix: np.ndarray | None = None
+        self._slots: OrderedDict[str, int] = OrderedDict()
+        self._free: list[int] = []
+        self.stats = {"hits": 0, "misses": 0, "stored": 0, "evicted": 0}
+
+    def get_many(self, ids: Iterable[str]) -> tuple[dict[str, np.ndarray], list[str]]:
+        """Cached unit vectors (float32) for ``ids`` and the IDs that are not cached."""
+        found: dict[str, np.ndarray] = {}
+        missing: list[str] = []
+        for vector_id in ids:
+            slot = self._slots.get(vector_id)
+            if slot is None:
+                missing.append(vector_id)
+                continue
+            self._slots.move_to_end(vector_id)
+            found[vector_id] = self._matrix[slot].astype(np.float32)
+        self.stats["hits"] += len(found)
+        self.stats["misses"] += len(missing)
+        return found, missing
+
+    def put_many(self, vectors: dict[str, np.ndarray | list[float]]) -> dict[str, np.ndarray]:
+        """Store full-width vectors and return them as they are cached (truncated, unit length)."""
+        if not vectors:
+            return {}
+        ids = list(vectors)
+        rows = truncate_vectors(np.stack([np.asarray(vectors[i], dtype=np.float32) for i in ids]), self.dims)
+        if self.max_entries <= 0:
+            return dict(zip(ids, rows))
+        if self._matrix is None:
+            self._matrix = np.zeros((self.max_entries, rows.shape[1]), dtype=np.float16)
+            self._free = list(range(self.max_entries - 1, -1, -1))
+        for vector_id, row in zip(ids, rows):
+            slot = self._slots.get(vector_id)
+            if slot is None:
+                if not self._free:
+                    _, evicted = self._slots.popitem(last=False)
+                    self._free.append(evicted)
+                    self.stats["evicted"] += 1
+                slot = self._free.pop()
+            self._slots[vector_id] = slot
+            self._slots.move_to_end(vector_id)
+            self._matrix[slot] = row
+        self.stats["stored"] += len(ids)
+        return {vector_id: row.astype(np.float16).astype(np.float32) for vector_id, row in zip(ids, rows)}
+
+    def snapshot_stats(self) -> dict:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        width = self._matrix.shape[1] if self._matrix is not None else 0
+        return {
+            **self.stats,
+            "entries": len(self._slots),
+            "max_entries": self.max_entries,
+            "dims": width,
+            "hit_rate": round(self.stats["hits"] / lookups, 4) if lookups else 0.0,
+            "bytes": len(self._slots) * width * 2,
+        }
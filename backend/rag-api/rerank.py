@@ -0,0 +1,201 @@
+"""Rerank over-fetched retrieval candidates within a latency budget before generation."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Protocol
+
+import numpy as np
+from langchain_core.documents import Document
+
+from lexical_index import tokenize
+
+logger = logging.getLogger(__name__)
+
+CROSS_ENCODER_PREFIX = "cross-encoder:"
+
+
+class Reranker(Protocol):
+    name: str
+
+    def score(self, query: str, texts: list[str]) -> np.ndarray:
+        """Relevance of each text to the query; only the order within one call matters."""
+        ...
+
+
+class LexicalReranker:
+    """
+    Score candidates by how well they cover the question's terms, with no model.
+
+    The score is BM25 computed over the candidate set (so terms the vector search
+    already matched everywhere count for little), plus the share of query terms
+    present and the share of query bigrams that appear as phrases, which rewards
+    chunks that name the exact company, metric and year asked about.
+    """
+
+    name = "lexical"
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+
+    def score(self, query: str, texts: list[str]) -> np.ndarray:
+        query_tokens = tokenize(query)
+        terms = list(dict.fromkeys(query_tokens))
+        if not terms or not texts:
+            return np.zeros(len(texts), dtype=np.float32)
+        columns = {term: column for column, term in enumerate(terms)}
+        query_bigrams = set(zip(query_tokens, query_tokens[1:]))
+
+        tf = np.zeros((len(texts), len(terms)), dtype=np.float32)
+        lengths = np.empty(len(texts), dtype=np.float32)
+        bigram_hits = np.zeros(len(texts), dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = tokenize(text)
+            lengths[row] = len(tokens)
+            for token in tokens:
+                column = columns.get(token)
+                if column is not None:
+                    tf[row, column] += 1
+            if query_bigrams:
+                bigram_hits[row] = len(query_bigrams.intersection(zip(tokens, tokens[1:])))
+
+        df = (tf > 0).sum(axis=0)
+        idf = np.log1p((len(texts) - df + 0.5) / (df + 0.5))
+        norm = self.k1 * (1 - self.b + self.b * lengths / max(float(lengths.mean()), 1.0))
+        bm25 = (tf * (self.k1 + 1) / (tf + norm[:, None]) * idf).sum(axis=1)
+        top = float(bm25.max())
+        coverage = (tf > 0).mean(axis=1)
+        phrases = bigram_hits / len(query_bigrams) if query_bigrams else 0.0
+        return (bm25 / top if top > 0 else bm25) + 0.5 * coverage + 0.5 * phrases
+
+
+class CrossEncoderReranker:
+    """A sentence-transformers cross-encoder (e.g. ``cross-encoder/ms-marco-MiniLM-L-6-v2``) run on CPU."""
+
+    def __init__(self, model_name: str, batch_size: int = 32):
+        from sentence_transformers import CrossEncoder
+
+        self.name = f"{CROSS_ENCODER_PREFIX}{model_name}"
+        self.model = CrossEncoder(model_name, device="cpu")
+        self.batch_size = batch_size
+
+    def score(self, query: str, texts: list[str]) -> np.ndarray:
+        return np.asarray(self.model.predict([(query, text) for text in texts], batch_size=self.batch_size))
+
+
+def create_reranker(model: str) -> Reranker:
+    """
+    Build the reranker named by ``model``: 'lexical', or 'cross-encoder:<model name>'.
+
+    A cross-encoder that cannot be loaded (sentence-transformers missing, model
+    download failing) falls back to the lexical reranker with a warning.
+    """
+    if model == "lexical":
+        return LexicalReranker()
+    if model.startswith(CROSS_ENCODER_PREFIX):
+        try:
+            return CrossEncoderReranker(model[len(CROSS_ENCODER_PREFIX):])
+        except Exception as e:
+            logger.warning(f"Cross-encoder reranker {model} unavailable ({e}); using the lexical reranker")
+            return LexicalReranker()
+    raise ValueError(f"Unknown rerank model: {model}")
+
+
+@dataclass
+class RerankResult:
+    docs: list[Document]
+    reranked: bool
+    elapsed_ms: float
+
+
+def _rank_scores(count: int) -> np.ndarray:
+    """Retrieval order as a score in [0, 1], best first."""
+    return 1.0 - np.arange(count, dtype=np.float32) / max(count, 1)
+
+
+class RerankStage:
+    """
+    Reorder candidates with a ``Reranker`` and keep the best ``top_n``.
+
+    Scoring runs on a small dedicated thread pool so it never waits behind I/O
+    in the shared pools. The reranker's scores (scaled to [0, 1]) are blended
+    with the retrieval order by ``retrieval_weight``, so the vector ranking still
+    breaks near-ties. If scoring fails or does not finish within
+    ``budget_ms``, the candidates are kept in retrieval order.
+
+    A job that misses its budget keeps its worker until scoring returns, so
+    while every worker is busy new requests skip reranking instead of queueing
+    behind stale jobs.
+    """
+
+    def __init__(self, reranker: Reranker, *, budget_ms: float = 50.0, retrieval_weight: float = 0.3, workers: int = 2):
+        self.reranker = reranker
+        self.budget = budget_ms / 1000
+        self.retrieval_weight = retrieval_weight
+        self.workers = workers
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rerank")
+        self._in_flight = 0
+        self._in_flight_lock = threading.Lock()
+        self.stats = {"reranked": 0, "timed_out": 0, "failed": 0, "skipped": 0}
+
+    def _order(self, query: str, texts: list[str]) -> np.ndarray:
+        scores = np.asarray(self.reranker.score(query, texts), dtype=np.float32)
+        low, high = float(scores.min()), float(scores.max())
+        scaled = (scores - low) / (high - low) if high > low else np.zeros_like(scores)
+        blended = (1 - self.retrieval_weight) * scaled + self.retrieval_weight * _rank_scores(len(texts))
+        # Stable sort keeps retrieval order among equal scores.
+        return np.argsort(-blended, kind="stable")
+
+    def _submit(self, query: str, texts: list[str]) -> Future | None:
+        """Start scoring on a free worker, or return None while all workers are busy."""
+        with self._in_flight_lock:
+            if self._in_flight >= self.workers:
+                return None
+            self._in_flight += 1
+        future = self._executor.submit(self._order, query, texts)
+        future.add_done_callback(self._job_done)
+        return future
+
+    def _job_done(self, _future: Future) -> None:
+        with self._in_flight_lock:
+            self._in_flight -= 1
+
+    async def rerank(self, query: str, docs: list[Document], top_n: int) -> RerankResult:
+        started = time.perf_counter()
+
+        def result(kept: list[Document], reranked: bool) -> RerankResult:
+            return RerankResult(kept, reranked, round((time.perf_counter() - started) * 1000, 2))
+
+        if len(docs) <= 1:
+            self.stats["skipped"] += 1
+            return result(docs[:top_n], False)
+        texts = [doc.page_content or "" for doc in docs]
+        future = self._submit(query, texts)
+        if future is None:
+            self.stats["skipped"] += 1
+            logger.warning(f"All {self.workers} rerank workers busy; keeping retrieval order")
+            return result(docs[:top_n], False)
+        try:
+            order = await asyncio.wait_for(asyncio.wrap_future(future), self.budget)
+        except TimeoutError:
+            self.stats["timed_out"] += 1
+            logger.warning(f"Rerank of {len(docs)} candidates exceeded {self.budget * 1000:.0f} ms; keeping retrieval order")
+            return result(docs[:top_n], False)
+        except Exception as e:
+            self.stats["failed"] += 1
+            logger.warning(f"Rerank failed ({e}); keeping retrieval order")
+            return result(docs[:top_n], False)
+        self.stats["reranked"] += 1
+        return result([docs[i] for i in order[:top_n]], True)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def snapshot_stats(self) -> dict:
+        return {"model": self.reranker.name, "budget_ms": self.budget * 1000, "in_flight": self._in_flight, **self.stats}
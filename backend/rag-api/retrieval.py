@@ -0,0 +1,254 @@
+"""Concurrent orchestration for the multi-stage retrieval strategies."""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import heapq
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Awaitable, Callable, Iterable
+
+from langchain_core.documents import Document
+
+logger = logging.getLogger(__name__)
+
+ScoredDocument = tuple[Document, float | None]
+SearchFn = Callable[[str, int], Awaitable[list[ScoredDocument]]]
+RefineFn = Callable[[str], Awaitable[str]]
+ExpandFn = Callable[[str], AsyncIterator[str]]
+
+ORIGINAL_STAGE = "original"
+REFINED_STAGE = "refined"
+LEXICAL_STAGE = "lexical"
+
+FUSION_METHODS = ("rrf", "score")
+
+
+@dataclass
+class RetrievalResult:
+    """Documents returned by a strategy plus per-stage wall-clock timings in ms."""
+
+    docs: list[Document]
+    timings: dict[str, float] = field(default_factory=dict)
+    failed_stages: list[str] = field(default_factory=list)
+    scores: list[float] = field(default_factory=list)
+    errors: dict[str, Exception] = field(default_factory=dict)
+
+
+def _elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 2)
+
+
+def document_key(doc: Document) -> str:
+    """
+    Stable identity of a chunk: its vector ID, else ``ticker:year:10K:chunk`` from
+    metadata, else a hash of the full text.
+    """
+    if doc.id:
+        return doc.id
+    metadata = doc.metadata or {}
+    if metadata.get("ticker") is not None and metadata.get("year") is not None and metadata.get("chunk") is not None:
+        return f"{metadata['ticker']}:{metadata['year']}:10K:{metadata['chunk']}"
+    return "sha256:" + hashlib.sha256(doc.page_content.encode("utf-8")).hexdigest()
+
+
+class ResultFusion:
+    """
+    Merge ranked result lists into one ranking, keyed on ``document_key``.
+
+    ``rrf`` (reciprocal-rank fusion) adds ``weight / (rrf_k + rank)`` for every list
+    a chunk appears in. ``score`` adds ``weight * similarity`` using the scores
+    from ``similarity_search_with_score``; a list without scores contributes by
+    reciprocal rank instead. Either way a chunk found by several queries moves up.
+
+    Lists are consumed in a single pass as they are added and only one entry per
+    distinct chunk is kept. Ties keep the order in which chunks were first added,
+    so callers get a deterministic ranking by adding lists in priority order.
+    """
+
+    def __init__(self, method: str = "rrf", rrf_k: int = 60):
+        if method not in FUSION_METHODS:
+            raise ValueError(f"Unknown fusion method: {method}")
+        self.method = method
+        self.rrf_k = rrf_k
+        self._candidates: dict[str, list] = {}
+
+    def add(self, results: Iterable[ScoredDocument], weight: float = 1.0) -> None:
+        for rank, (doc, score) in enumerate(results, start=1):
+            if self.method == "score" and score is not None:
+                contribution = weight * score
+            else:
+                contribution = weight / (self.rrf_k + rank)
+            key = document_key(doc)
+            candidate = self._candidates.get(key)
+            if candidate is None:
+                self._candidates[key] = [contribution, len(self._candidates), doc]
+            else:
+                candidate[0] += contribution
+
+    def top(self, k: int) -> list[tuple[Document, float]]:
+        best = heapq.nsmallest(k, self._candidates.values(), key=lambda candidate: (-candidate[0], candidate[1]))
+        return [(doc, round(fused, 6)) for fused, _, doc in best]
+
+
+def fuse_results(
+    result_lists: Iterable[list[ScoredDocument]],
+    k: int,
+    *,
+    method: str = "rrf",
+    rrf_k: int = 60,
+) -> list[tuple[Document, float]]:
+    """Fuse result lists (in priority order) and return the top k chunks with fused scores."""
+    fusion = ResultFusion(method, rrf_k)
+    for results in result_lists:
+        fusion.add(results)
+    return fusion.top(k)
+
+
+async def orchestrate_retrieval(
+    query: str,
+    k: int,
+    *,
+    search: SearchFn,
+    refine: RefineFn | None = None,
+    expand: ExpandFn | None = None,
+    lexical: SearchFn | None = None,
+    expanded_k: int | None = None,
+    fusion_method: str = "rrf",
+    rrf_k: int = 60,
+    llm_timeout: float = 8.0,
+    search_timeout: float = 5.0,
+    total_timeout: float = 15.0,
+) -> RetrievalResult:
+    """
+    Run the raw search, LLM refinement and LLM expansion stages concurrently.
+
+    The original query is searched immediately, with ``search`` and, when given,
+    with the ``lexical`` (BM25) search. The refined query is searched as
+    soon as refinement returns, and each expanded query is searched as soon as the
+    expansion stream emits it. Every stage has its own timeout; a stage that fails
+    or times out is recorded in ``failed_stages`` (with its exception in ``errors``)
+    and the remaining results are still merged. When ``total_timeout`` elapses, outstanding stages are cancelled
+    and whatever has completed is returned.
+
+    Results are fused with ``ResultFusion`` and ties are broken by a fixed
+    priority order (refined, original, lexical, then expanded queries in emission order),
+    so the output does not depend on which upstream call happened to finish first.
+    """
+    started = time.perf_counter()
+    timings: dict[str, float] = {}
+    failed_stages: list[str] = []
+    errors: dict[str, Exception] = {}
+    results: dict[str, list[ScoredDocument]] = {}
+    expanded_labels: list[str] = []
+    search_tasks: list[asyncio.Task] = []
+
+    async def run_stage(stage: str, awaitable: Awaitable, timeout: float):
+        stage_started = time.perf_counter()
+        try:
+            return await asyncio.wait_for(awaitable, timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Retrieval stage '{stage}' timed out after {timeout}s")
+            failed_stages.append(stage)
+        except Exception as e:
+            logger.warning(f"Retrieval stage '{stage}' failed: {e}")
+            failed_stages.append(stage)
+            errors[stage] = e
+        finally:
+            timings[stage] = _elapsed_ms(stage_started)
+        return None
+
+    async def run_search(label: str, search_query: str, n: int, search_fn: SearchFn = search) -> None:
+        docs = await run_stage(f"search:{label}", search_fn(search_query, n), search_timeout)
+        if docs is not None:
+            results[label] = docs
+
+    def spawn_search(label: str, search_query: str, n: int, search_fn: SearchFn = search) -> None:
+        search_tasks.append(asyncio.create_task(run_search(label, search_query, n, search_fn)))
+
+    async def run_refine() -> None:
+        refined = await run_stage("refine", refine(query), llm_timeout)
+        # A refinement that echoes the question is already covered by the original search.
+        if refined and refined.strip() != query.strip():
+            await run_search(REFINED_STAGE, refined, k)
+
+    async def run_expand() -> None:
+        stage_started = time.perf_counter()
+        seen = {query.strip().lower()}
+        try:
+            async with asyncio.timeout(llm_timeout):
+                async for expanded_query in expand(query):
+                    normalized = expanded_query.strip().lower()
+                    if not normalized or normalized in seen:
+                        continue
+                    seen.add(normalized)
+                    label = f"expanded[{len(expanded_labels)}]"
+                    expanded_labels.append(label)
+                    spawn_search(label, expanded_query, expanded_k or k)
+        except TimeoutError:
+            logger.warning(
+                f"Query expansion timed out after {llm_timeout}s; "
+                f"keeping {len(expanded_labels)} expanded queries"
+            )
+            failed_stages.append("expand")
+        except Exception as e:
+            logger.warning(f"Query expansion failed: {e}; keeping {len(expanded_labels)} expanded queries")
+            failed_stages.append("expand")
+            errors["expand"] = e
+        finally:
+            timings["expand"] = _elapsed_ms(stage_started)
+
+    spawn_search(ORIGINAL_STAGE, query, k)
+    if lexical is not None:
+        spawn_search(LEXICAL_STAGE, query, k, lexical)
+    llm_tasks = []
+    if refine is not None:
+        llm_tasks.append(asyncio.create_task(run_refine()))
+    if expand is not None:
+        llm_tasks.append(asyncio.create_task(run_expand()))
+
+    deadline = started + total_timeout
+    # Expanded searches are spawned while the expansion stage runs, so keep
+    # waiting until no task (original, LLM or spawned search) is outstanding.
+    # The finally block also covers the caller being cancelled (client
+    # disconnect), which would otherwise leave the stages running.
+    try:
+        while True:
+            pending = [task for task in (*llm_tasks, *search_tasks) if not task.done()]
+            if not pending:
+                break
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                logger.warning(
+                    f"Retrieval exceeded {total_timeout}s; returning partial results "
+                    f"from {len(results)} completed searches"
+                )
+                failed_stages.append("total")
+                break
+            await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        pending = [task for task in (*llm_tasks, *search_tasks) if not task.done()]
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    fusion_started = time.perf_counter()
+    fused = fuse_results(
+        (results[label] for label in (REFINED_STAGE, ORIGINAL_STAGE, LEXICAL_STAGE, *expanded_labels) if label in results),
+        k,
+        method=fusion_method,
+        rrf_k=rrf_k,
+    )
+    timings["fusion"] = _elapsed_ms(fusion_started)
+
+    timings["total"] = _elapsed_ms(started)
+    return RetrievalResult(
+        docs=[doc for doc, _ in fused],
+        timings=timings,
+        failed_stages=failed_stages,
+        scores=[score for _, score in fused],
+        errors=errors,
+    )
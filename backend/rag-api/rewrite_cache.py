@@ -0,0 +1,275 @@
+"""Cache of LLM query rewrites (refinement and expansion) with single-flight computation."""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import aclosing
+from pathlib import Path
+from typing import Any, AsyncIterator, Awaitable, Callable
+
+from answer_cache import normalize_question
+
+logger = logging.getLogger(__name__)
+
+
+def prompt_version(model: str, template: str) -> str:
+    """Short fingerprint of a model and prompt template; editing either invalidates cached rewrites."""
+    return hashlib.sha256(f"{model}\x1f{template}".encode("utf-8")).hexdigest()[:12]
+
+
+def rewrite_key(kind: str, version: str, question: str) -> str:
+    raw = f"{kind}\x1f{version}\x1f{normalize_question(question)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class SQLiteRewriteStore:
+    """Persist rewrites to a local SQLite file so they survive restarts."""
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS rewrite_cache (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+                """
+            )
+
+    def load(self) -> list[tuple[str, Any, float]]:
+        with self._lock:
+            rows = self._conn.execute("SELECT key, value, created_at FROM rewrite_cache ORDER BY created_at").fetchall()
+        return [(key, json.loads(value), created_at) for key, value, created_at in rows]
+
+    def save(self, key: str, value: Any, created_at: float) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO rewrite_cache (key, value, created_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), created_at),
+            )
+
+    def delete(self, keys: list[str]) -> None:
+        if not keys:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM rewrite_cache WHERE key = ?", [(key,) for key in keys])
+
+
+class RewriteCache:
+    """
+    TTL + LRU cache of query rewrites keyed on (kind, prompt version, normalized question).
+
+    ``get_or_compute`` and ``stream_or_compute`` are single-flight: while one
+    caller runs the LLM call for a key, concurrent callers for the same key wait
+    for its result instead of issuing their own. Only successful rewrites are
+    cached; if the running call fails its waiters get the same error, and if it
+    is cancelled they retry.
+
+    Lookups and inserts only touch the in-memory entries; writes to the store
+    are queued on a single background thread, in order, so a rewrite miss never
+    waits on a SQLite commit on the event loop.
+    """
+
+    def __init__(
+        self,
+        store: SQLiteRewriteStore | None = None,
+        *,
+        ttl_seconds: float = 7 * 24 * 60 * 60,
+        max_entries: int = 5000,
+    ):
+        self.store = store
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[Any, float]] = OrderedDict()
+        self._inflight: dict[str, asyncio.Future] = {}
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0, "evictions": 0, "expired": 0}
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rewrite-cache-writer") if store else None
+
+        if store is not None:
+            now = time.time()
+            expired = []
+            for key, value, created_at in store.load():
+                if now - created_at > ttl_seconds:
+                    expired.append(key)
+                else:
+                    self._entries[key] = (value, created_at)
+            store.delete(expired + self._evict_over_capacity())
+
+    def _evict_over_capacity(self) -> list[str]:
+        evicted = []
+        while len(self._entries) > self.max_entries:
+            key, _ = self._entries.popitem(last=False)
+            evicted.append(key)
+            self.stats["evictions"] += 1
+        return evicted
+
+    def _persist(self, write: Callable[..., None], *args: Any) -> None:
+        """Queue a store write behind the ones before it."""
+        if self._writer is None:
+            return
+        try:
+            self._writer.submit(write, *args).add_done_callback(_log_write_failure)
+        except RuntimeError:
+            # Closed: the cache outlived the app, the write only loses persistence.
+            pass
+
+    def close(self) -> None:
+        """Finish the queued store writes."""
+        if self._writer is not None:
+            self._writer.shutdown(wait=True)
+
+    def get(self, key: str) -> Any | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry[1] > self.ttl_seconds:
+                del self._entries[key]
+                self.stats["expired"] += 1
+                entry = None
+                if self.store is not None:
+                    self._persist(self.store.delete, [key])
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry[0]
+
+    def put(self, key: str, value: Any) -> None:
+        created_at = time.time()
+        with self._lock:
+            self._entries[key] = (value, created_at)
+            self._entries.move_to_end(key)
+            evicted = self._evict_over_capacity()
+        if self.store is not None:
+            self._persist(self.store.save, key, value, created_at)
+            if evicted:
+                self._persist(self.store.delete, evicted)
+
+    async def _wait_for(self, key: str) -> tuple[bool, Any]:
+        """(True, value) once another caller's rewrite for ``key`` finishes; (False, None) if none is running."""
+        while True:
+            pending = self._inflight.get(key)
+            if pending is None:
+                return False, None
+            self.stats["coalesced"] += 1
+            await asyncio.wait([pending])
+            if not pending.cancelled():
+                return True, pending.result()
+            # The running caller was cancelled: loop to pick up a newer flight or become the owner.
+            self.stats["coalesced"] -= 1
+
+    def _claim(self, key: str) -> asyncio.Future:
+        self.stats["misses"] += 1
+        future = asyncio.get_running_loop().create_future()
+        # Waiters read the exception; keep asyncio from logging it as never retrieved.
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._inflight[key] = future
+        return future
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        value = self.get(key)
+        if value is not None:
+            return value
+        waited, value = await self._wait_for(key)
+        if waited:
+            return value
+
+        future = self._claim(key)
+        try:
+            value = await compute()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        else:
+            self.put(key, value)
+            future.set_result(value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    async def stream_or_compute(self, key: str, stream: Callable[[], AsyncIterator[str]]) -> AsyncIterator[str]:
+        """
+        Yield a cached list of lines, or stream them from ``stream()`` and cache the list.
+
+        The list is only cached when ``stream()`` runs to completion; a consumer that
+        stops early leaves nothing behind and lets waiters retry.
+        """
+        lines = self.get(key)
+        if lines is None:
+            waited, lines = await self._wait_for(key)
+        if lines is not None:
+            for line in lines:
+                yield line
+            return
+
+        future = self._claim(key)
+        lines = []
+        try:
+            async with aclosing(stream()) as source:
+                async for line in source:
+                    lines.append(line)
+                    yield line
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        except BaseException:
+            future.cancel()
+            raise
+        else:
+            self.put(key, lines)
+            future.set_result(lines)
+        finally:
+            if not future.done():
+                future.cancel()
+            self._inflight.pop(key, None)
+
+    def snapshot_stats(self) -> dict[str, Any]:
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"] + self.stats["coalesced"]
+            return {
+                **self.stats,
+                "entries": len(self._entries),
+                "inflight": len(self._inflight),
+                "hit_rate": round(self.stats["hits"] / lookups, 4) if lookups else 0.0,
+            }
+
+
+def _log_write_failure(future: Future) -> None:
+    if not future.cancelled() and future.exception() is not None:
+        logger.warning("Rewrite cache write failed: %s", future.exception())
+
+
+def create_rewrite_cache(
+    backend: str,
+    *,
+    path: str | None = None,
+    ttl_seconds: float,
+    max_entries: int,
+) -> RewriteCache:
+    """Build a RewriteCache with the named backend ('memory' or 'sqlite')."""
+    if backend == "sqlite":
+        if not path:
+            raise ValueError("A file path is required for the sqlite rewrite cache backend")
+        store = SQLiteRewriteStore(path)
+    elif backend == "memory":
+        store = None
+    else:
+        raise ValueError(f"Unknown rewrite cache backend: {backend}")
+    return RewriteCache(store, ttl_seconds=ttl_seconds, max_entries=max_entries)
@@ -0,0 +1,133 @@
+"""Single-flight execution: concurrent callers with the same key share one in-flight computation."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Awaitable, Callable, Hashable
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class _StreamFlight:
+    def __init__(self):
+        self.items: list[Any] = []
+        self.done = False
+        self.error: Exception | None = None
+        self.subscribers = 0
+        self.updated = asyncio.Event()
+        self.task: asyncio.Task | None = None
+
+    def notify(self) -> None:
+        # Swap in a fresh event so subscribers that wake up wait for the next change.
+        updated, self.updated = self.updated, asyncio.Event()
+        updated.set()
+
+
+class SingleFlight:
+    """
+    Deduplicate concurrent work by key.
+
+    ``do`` runs ``fn()`` once per key while it is in flight; callers arriving in
+    the meantime await the same result (or exception). ``stream`` does the same
+    for async iterators: one producer runs per key and every subscriber receives
+    all items from the start, including items produced before it joined.
+
+    The shared work runs in its own task, so a caller that goes away (client
+    disconnect) does not cancel it for the others; it is cancelled only when no
+    caller is left waiting. Nothing is kept once the work finishes.
+    """
+
+    def __init__(self):
+        self._calls: dict[Hashable, _Call] = {}
+        self._streams: dict[Hashable, _StreamFlight] = {}
+        self.stats = {"leaders": 0, "coalesced": 0, "abandoned": 0}
+
+    def running(self, key: Hashable) -> bool:
+        """Whether work for ``key`` is in flight, so a new caller would join it instead of starting its own."""
+        return key in self._calls or key in self._streams
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.create_task(fn()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _: self._forget(self._calls, key, call))
+            self.stats["leaders"] += 1
+        else:
+            self.stats["coalesced"] += 1
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        except asyncio.CancelledError:
+            if call.waiters == 1 and not call.task.done():
+                call.task.cancel()
+                self.stats["abandoned"] += 1
+            raise
+        finally:
+            call.waiters -= 1
+
+    async def stream(self, key: Hashable, fn: Callable[[], AsyncIterator[Any]]) -> AsyncIterator[Any]:
+        flight = self._streams.get(key)
+        if flight is None:
+            flight = _StreamFlight()
+            self._streams[key] = flight
+            flight.task = asyncio.create_task(self._pump(key, flight, fn))
+            self.stats["leaders"] += 1
+        else:
+            self.stats["coalesced"] += 1
+
+        flight.subscribers += 1
+        position = 0
+        try:
+            while True:
+                updated = flight.updated
+                while position < len(flight.items):
+                    yield flight.items[position]
+                    position += 1
+                if flight.done:
+                    if flight.error is not None:
+                        raise flight.error
+                    return
+                await updated.wait()
+        finally:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.done:
+                flight.task.cancel()
+                self.stats["abandoned"] += 1
+
+    async def _pump(self, key: Hashable, flight: _StreamFlight, fn: Callable[[], AsyncIterator[Any]]) -> None:
+        try:
+            async with aclosing(fn()) as items:
+                async for item in items:
+                    flight.items.append(item)
+                    flight.notify()
+        except asyncio.CancelledError:
+            logger.info("Shared stream cancelled: no subscribers left")
+        except Exception as e:
+            flight.error = e
+        finally:
+            flight.done = True
+            flight.notify()
+            self._forget(self._streams, key, flight)
+
+    @staticmethod
+    def _forget(flights: dict, key: Hashable, flight: Any) -> None:
+        if flights.get(key) is flight:
+            del flights[key]
+
+    def snapshot_stats(self) -> dict[str, Any]:
+        requests = self.stats["leaders"] + self.stats["coalesced"]
+        return {
+            **self.stats,
+            "inflight": len(self._calls) + len(self._streams),
+            "coalesced_rate": round(self.stats["coalesced"] / requests, 4) if requests else 0.0,
+        }
@@ -0,0 +1,145 @@
+"""In-memory S&P 500 symbol index for pulling tickers out of free-text questions."""
+
+from __future__ import annotations
+
+import csv
+import logging
+import re
+from pathlib import Path
+from typing import Iterable
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_COMPANIES_CSV = Path(__file__).resolve().parent.parent / "all_SP500_companies.csv"
+
+# Name words dropped from the end of company names ("Apple Inc." -> "apple").
+_NAME_SUFFIXES = {
+    "inc", "incorporated", "corp", "corporation", "co", "company", "companies", "plc", "ltd",
+    "limited", "holdings", "holding", "group", "class", "a", "b", "c", "the", "sa", "nv", "lp",
+}
+# Symbols that are also everyday words or finance abbreviations; only matched as "$IT" etc.
+_AMBIGUOUS_SYMBOLS = {"A", "ALL", "ARE", "CF", "ED", "EL", "HAS", "IP", "IR", "IT", "KEY", "LOW", "NI", "NOW", "ON", "PH", "SO"}
+# Single-word names that are ordinary words; they only match as part of a longer name.
+_COMMON_WORDS = {
+    "advanced", "air", "applied", "arch", "automatic", "ball", "best", "block", "brown", "capital",
+    "cardinal", "carrier", "church", "consolidated", "cooper", "crown", "delta", "digital", "dover",
+    "equity", "expand", "extra", "fair", "federal", "fifth", "first", "gen", "genuine", "global",
+    "globe", "henry", "home", "host", "iron", "jack", "live", "marathon", "match", "monster", "old",
+    "on", "pool", "principal", "progressive", "quest", "realty", "regency", "regions", "republic",
+    "royal", "southern", "state", "steel", "target", "trade", "union", "universal", "waste",
+    "waters", "west", "western",
+}
+# Well-known names that do not appear in the S&P 500 company list.
+_EXTRA_ALIASES = {
+    "google": ["GOOGL", "GOOG"],
+    "facebook": ["META"],
+}
+_MAX_NAME_WORDS = 5
+
+_SYMBOL_RE = re.compile(r"(\$?)\b([A-Z][A-Z0-9]{0,4}(?:[.\-][A-Z])?)\b")
+_POSSESSIVE_RE = re.compile(r"['’]s\b")
+_NON_WORD_RE = re.compile(r"[^a-z0-9]+")
+
+
+def normalize_ticker(ticker: str) -> str:
+    """Upper-case and use the index's class-share form ("BRK.B" -> "BRK-B")."""
+    return ticker.strip().upper().replace(".", "-")
+
+
+def _name_words(text: str) -> list[str]:
+    text = _POSSESSIVE_RE.sub("", text.lower()).replace("&", " and ")
+    return [word for word in _NON_WORD_RE.split(text) if word]
+
+
+def _strip_suffixes(words: list[str]) -> list[str]:
+    words = list(words)
+    while len(words) > 1 and words[-1] in _NAME_SUFFIXES:
+        words.pop()
+    while len(words) > 1 and words[0] == "the":
+        words.pop(0)
+    return words
+
+
+class SymbolIndex:
+    """
+    Ticker and company-name lookup built once from (symbol, company name) pairs.
+
+    ``extract`` scans a question in a single pass: upper-case tokens that are
+    known symbols (``$``-prefixed for symbols that are also common words), and
+    company names matched longest-first over word n-grams. A company's first
+    name word is also accepted when no other company shares it ("Nvidia" for
+    "Nvidia Corporation").
+    """
+
+    def __init__(self, companies: Iterable[tuple[str, str]]):
+        self.symbols: set[str] = set()
+        self.names: dict[tuple[str, ...], list[str]] = {}
+        # First name word -> (distinct company names, their symbols); share classes count once.
+        first_words: dict[str, tuple[set[tuple[str, ...]], list[str]]] = {}
+
+        for symbol, name in companies:
+            symbol = normalize_ticker(symbol)
+            self.symbols.add(symbol)
+            words = tuple(_strip_suffixes(_name_words(name))[:_MAX_NAME_WORDS])
+            if not words:
+                continue
+            self._add_name(words, symbol)
+            names, symbols = first_words.setdefault(words[0], (set(), []))
+            names.add(words)
+            symbols.append(symbol)
+
+        for word, (names, symbols) in first_words.items():
+            if len(names) == 1 and len(word) >= 4:
+                for symbol in symbols:
+                    self._add_name((word,), symbol)
+
+        for alias, symbols in _EXTRA_ALIASES.items():
+            for symbol in symbols:
+                if symbol in self.symbols:
+                    self._add_name((alias,), symbol)
+
+    def _add_name(self, words: tuple[str, ...], symbol: str) -> None:
+        if len(words) == 1 and words[0] in _COMMON_WORDS:
+            return
+        symbols = self.names.setdefault(words, [])
+        if symbol not in symbols:
+            symbols.append(symbol)
+
+    @classmethod
+    def from_csv(cls, path: str | Path = DEFAULT_COMPANIES_CSV) -> "SymbolIndex":
+        """Build the index from a CSV with ``Symbol`` and ``Security`` columns."""
+        with open(path, newline="", encoding="utf-8") as f:
+            rows = [(row["Symbol"], row["Security"]) for row in csv.DictReader(f) if row.get("Symbol")]
+        index = cls(rows)
+        logger.info(f"Symbol index loaded from {path} ({len(index.symbols)} symbols, {len(index.names)} names)")
+        return index
+
+    def extract(self, text: str) -> list[str]:
+        """Return the tickers mentioned in ``text`` (symbols first, then company names), without duplicates."""
+        return self.mentions(text)[0]
+
+    def mentions(self, text: str) -> tuple[list[str], set[str]]:
+        """Like ``extract``, also returning the lower-cased words that matched a symbol or company name."""
+        found: dict[str, None] = {}
+        matched: set[str] = set()
+
+        for prefix, token in _SYMBOL_RE.findall(text):
+            symbol = normalize_ticker(token)
+            if symbol in self.symbols and (prefix or (len(symbol) > 1 and symbol not in _AMBIGUOUS_SYMBOLS)):
+                found[symbol] = None
+                matched.update(_name_words(token))
+
+        words = _name_words(text)
+        position = 0
+        while position < len(words):
+            for size in range(min(_MAX_NAME_WORDS, len(words) - position), 0, -1):
+                symbols = self.names.get(tuple(words[position:position + size]))
+                if symbols:
+                    found.update(dict.fromkeys(symbols))
+                    matched.update(words[position:position + size])
+                    position += size
+                    break
+            else:
+                position += 1
+
+        return list(found), matched
@@ -0,0 +1,236 @@
+"""Per-request stage spans and in-process Prometheus metrics for the RAG pipeline."""
+
+from __future__ import annotations
+
+import asyncio
+import bisect
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterable, Iterator
+
+logger = logging.getLogger(__name__)
+
+# Seconds; covers cache hits (~1 ms) up to slow LLM generations.
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Tokens or documents per stage.
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(dict(zip(self.labelnames, key)))} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: Iterable[float], labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        self.labelnames = tuple(labelnames)
+        # Per label set: [non-cumulative bucket counts..., +Inf count], sum.
+        self._series: dict[tuple[str, ...], tuple[list[int], list[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._series.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[index] += 1
+            total[0] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total) in sorted(self._series.items()):
+                labels = dict(zip(self.labelnames, key))
+                cumulative = 0
+                for bound, count in zip((*self.buckets, float("inf")), counts):
+                    cumulative += count
+                    bucket_labels = _format_labels({**labels, "le": _format_value(bound)})
+                    lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(total[0])}")
+                lines.append(f"{self.name}_count{_format_labels(labels)} {cumulative}")
+        return lines
+
+
+STAGE_DURATION = Histogram(
+    "rag_stage_duration_seconds",
+    "Time spent in each pipeline stage; concurrent calls of one stage in a request are summed.",
+    DURATION_BUCKETS,
+    ("endpoint", "retrieval_method", "stage"),
+)
+STAGE_COUNT = Histogram(
+    "rag_stage_items",
+    "Tokens, documents or texts handled by a pipeline stage per request.",
+    COUNT_BUCKETS,
+    ("endpoint", "stage", "item"),
+)
+REQUEST_DURATION = Histogram(
+    "rag_http_request_duration_seconds",
+    "Time from request to response start (first byte for streamed responses).",
+    DURATION_BUCKETS,
+    ("method", "path", "status"),
+)
+PIPELINE_RUNS = Counter(
+    "rag_pipeline_runs_total",
+    "Retrieval and generation runs by outcome (requests joining an identical run are not counted).",
+    ("endpoint", "retrieval_method", "outcome"),
+)
+METRICS = (STAGE_DURATION, STAGE_COUNT, REQUEST_DURATION, PIPELINE_RUNS)
+
+
+class Trace:
+    """
+    Stage timings (ms) and item counts for one pipeline run.
+
+    ``timings`` is the dict returned to clients as the per-request ``timings``
+    field. A stage recorded more than once (e.g. embeddings for several search
+    queries) accumulates both its time and its counts.
+    """
+
+    def __init__(self, endpoint: str, retrieval_method: str):
+        self.endpoint = endpoint
+        self.retrieval_method = retrieval_method
+        self.started = time.perf_counter()
+        self.outcome = "ok"
+        self.timings: dict[str, float] = {}
+        self.counts: dict[str, dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, elapsed_ms: float, **counts: int) -> None:
+        with self._lock:
+            self.timings[stage] = round(self.timings.get(stage, 0.0) + elapsed_ms, 2)
+            self.add_counts(stage, **counts)
+
+    def add_counts(self, stage: str, **counts: int) -> None:
+        stage_counts = self.counts.setdefault(stage, {})
+        for item, value in counts.items():
+            stage_counts[item] = stage_counts.get(item, 0) + int(value)
+
+    def finish(self) -> None:
+        """Record the run in the histograms and log it as one line."""
+        for stage, elapsed_ms in self.timings.items():
+            STAGE_DURATION.observe(
+                elapsed_ms / 1000, endpoint=self.endpoint, retrieval_method=self.retrieval_method, stage=stage
+            )
+        for stage, stage_counts in self.counts.items():
+            for item, value in stage_counts.items():
+                STAGE_COUNT.observe(value, endpoint=self.endpoint, stage=stage, item=item)
+        PIPELINE_RUNS.inc(endpoint=self.endpoint, retrieval_method=self.retrieval_method, outcome=self.outcome)
+        total_ms = round((time.perf_counter() - self.started) * 1000, 2)
+        logger.info(
+            f"Trace {self.endpoint} ({self.retrieval_method}, {self.outcome}) in {total_ms} ms: "
+            f"timings={self.timings} counts={self.counts}"
+        )
+
+
+_current_trace: ContextVar[Trace | None] = ContextVar("rag_trace", default=None)
+
+
+def current_trace() -> Trace | None:
+    return _current_trace.get()
+
+
+@contextmanager
+def trace_run(endpoint: str, retrieval_method: str) -> Iterator[Trace]:
+    """
+    Make a new Trace current for this task (and the tasks and threads it starts) and finish it on exit.
+
+    The outcome is "ok" unless the block raises ("http_<status>", "cancelled" or
+    "error") or sets ``trace.outcome`` itself.
+    """
+    trace = Trace(endpoint, retrieval_method)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    except BaseException as e:
+        status = getattr(e, "status_code", None)
+        if status:
+            trace.outcome = f"http_{status}"
+        elif isinstance(e, (asyncio.CancelledError, GeneratorExit)):
+            trace.outcome = "cancelled"
+        else:
+            trace.outcome = "error"
+        raise
+    finally:
+        _current_trace.reset(token)
+        trace.finish()
+
+
+@contextmanager
+def span(stage: str, **counts: int) -> Iterator[dict[str, int]]:
+    """
+    Time a stage into the current trace (a no-op without one).
+
+    Yields a dict; counts known only after the stage ran (documents found,
+    tokens generated) can be set on it.
+    """
+    started = time.perf_counter()
+    late_counts: dict[str, int] = {}
+    try:
+        yield late_counts
+    finally:
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add(stage, (time.perf_counter() - started) * 1000, **counts, **late_counts)
+
+
+def record(stage: str, elapsed_ms: float, **counts: int) -> None:
+    """Add a stage measured elsewhere (e.g. by the retrieval orchestrator) to the current trace."""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add(stage, elapsed_ms, **counts)
+
+
+def render_stats(prefix: str, stats: dict[str, Any], help: str) -> list[str]:
+    """Expose a component's ``snapshot_stats()`` numbers as untyped samples named ``<prefix>_<key>``."""
+    lines = []
+    for key, value in stats.items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            continue
+        name = f"{prefix}_{key}"
+        lines += [f"# HELP {name} {help}", f"# TYPE {name} untyped", f"{name} {_format_value(value)}"]
+    return lines
+
+
+def render_metrics(extra_lines: Iterable[str] = ()) -> str:
+    """All metrics in the Prometheus text exposition format."""
+    lines = [line for metric in METRICS for line in metric.render()]
+    lines.extend(extra_lines)
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,15 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+API_DIR = Path(__file__).resolve().parent.parent
+# The API modules are top-level modules run from backend/rag-api.
+sys.path.insert(0, str(API_DIR))
+
+CORPUS_DIR = API_DIR / "clean_10k_texts"
+
+
+@pytest.fixture(scope="session")
+def corpus_dir() -> Path:
+    return CORPUS_DIR
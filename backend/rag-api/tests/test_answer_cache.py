@@ -0,0 +1,45 @@
+import sqlite3
+
+import numpy as np
+
+from answer_cache import AnswerCache, SQLiteBackend, create_answer_cache
+
+
+def test_scopes_partition_exact_and_similar_lookups():
+    cache = AnswerCache()
+    embedding = np.array([1.0, 0.0, 0.0])
+    cache.put("What was revenue in 2024?", "vector|2024", 5, {"answer": "a"}, embedding)
+
+    assert cache.get_exact("what was revenue in 2024", "vector|2024", 5) == {"answer": "a"}
+    assert cache.get_exact("What was revenue in 2024?", "hybrid|2024", 5) is None
+    assert cache.get_similar(embedding, "vector|2024", 5) == {"answer": "a"}
+    assert cache.get_similar(embedding, "vector|2023", 5) is None
+
+
+def test_sqlite_backend_round_trip(tmp_path):
+    path = tmp_path / "answers.sqlite3"
+    cache = create_answer_cache(
+        "sqlite", path=str(path), ttl_seconds=60, max_entries=10, max_bytes=1 << 20, similarity_threshold=0.95
+    )
+    cache.put("Revenue 2024?", "vector|2024", 5, {"answer": "a"}, [0.0, 1.0])
+    cache.close()
+
+    reopened = AnswerCache(SQLiteBackend(path))
+    assert reopened.get_exact("revenue 2024", "vector|2024", 5) == {"answer": "a"}
+    assert reopened.get_similar([0.0, 1.0], "vector|2024", 5) == {"answer": "a"}
+    reopened.close()
+
+
+def test_sqlite_backend_drops_entries_without_a_scope(tmp_path):
+    path = tmp_path / "answers.sqlite3"
+    with sqlite3.connect(path) as conn:
+        conn.execute(
+            "CREATE TABLE answer_cache (key TEXT PRIMARY KEY, retrieval_method TEXT NOT NULL, k INTEGER NOT NULL, "
+            "question TEXT NOT NULL, value TEXT NOT NULL, embedding BLOB, created_at REAL NOT NULL)"
+        )
+        conn.execute("INSERT INTO answer_cache VALUES ('k', 'vector', 5, 'q', '{}', NULL, 0)")
+    conn.close()
+
+    backend = SQLiteBackend(path)
+    assert backend.load() == []
+    backend.close()
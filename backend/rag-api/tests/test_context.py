@@ -0,0 +1,97 @@
+from langchain_core.documents import Document
+
+from context import (
+    PASSAGE_SEPARATOR,
+    Passage,
+    assemble_context,
+    drop_near_duplicates,
+    merge_adjacent_chunks,
+    strip_overlap,
+)
+
+
+def count_words(text: str) -> int:
+    return len(text.split())
+
+
+def truncate_words(text: str, max_tokens: int) -> str:
+    return " ".join(text.split()[:max_tokens])
+
+
+def chunk(index: int, text: str, ticker: str = "AAPL", year: int = 2024) -> Document:
+    return Document(
+        page_content=text,
+        id=f"{ticker}:{year}:10K:{index}",
+        metadata={"ticker": ticker, "year": year, "chunk": index},
+    )
+
+
+def words(prefix: str, count: int) -> str:
+    return " ".join(f"{prefix}{i}" for i in range(count))
+
+
+OVERLAP = "the overlapping sentence shared by both chunks."
+
+
+def test_strip_overlap():
+    assert strip_overlap(f"first part {OVERLAP}", f"{OVERLAP} second part") == " second part"
+    # Shorter matches are coincidence, not splitter overlap.
+    assert strip_overlap("ends with net", "net sales") == "net sales"
+
+
+def test_adjacent_chunks_merge_in_document_order():
+    docs = [
+        chunk(4, f"{OVERLAP} chunk four"),
+        chunk(9, "chunk nine"),
+        chunk(3, f"chunk three {OVERLAP}"),
+        chunk(3, f"chunk three {OVERLAP}"),
+    ]
+    passages = merge_adjacent_chunks(docs)
+    assert [passage.text for passage in passages] == [f"chunk three {OVERLAP} chunk four", "chunk nine"]
+    assert [passage.rank for passage in passages] == [0, 1]
+    assert passages[0].ids == ["AAPL:2024:10K:3", "AAPL:2024:10K:4"]
+
+
+def test_chunks_of_different_filings_are_not_merged():
+    passages = merge_adjacent_chunks([chunk(1, "apple one"), chunk(2, "msft two", ticker="MSFT")])
+    assert [passage.text for passage in passages] == ["apple one", "msft two"]
+
+
+def test_near_duplicates_keep_the_more_relevant_passage():
+    text = words("w", 40)
+    passages = [Passage(text, 0), Passage(text + " extra", 1), Passage(words("v", 40), 2)]
+    kept, dropped = drop_near_duplicates(passages, 0.85)
+    assert [passage.rank for passage in kept] == [0, 2]
+    assert dropped == 1
+
+
+def test_budget_is_respected_and_last_passage_truncated():
+    docs = [chunk(0, words("a", 100)), chunk(10, words("b", 100)), chunk(20, words("c", 100)), chunk(30, words("d", 100))]
+    context = assemble_context(docs, budget_tokens=290, count_tokens=count_words, truncate=truncate_words)
+
+    assert context.tokens <= 290
+    assert count_words(context.text) == context.tokens
+    assert [passage.text.split()[0] for passage in context.passages] == ["a0", "b0", "c0"]
+    assert count_words(context.passages[-1].text) == 90
+    assert context.dropped_over_budget == 1
+
+
+def test_small_remainder_is_not_filled():
+    docs = [chunk(0, words("a", 100)), chunk(10, words("b", 100))]
+    context = assemble_context(docs, budget_tokens=150, count_tokens=count_words, truncate=truncate_words)
+    assert context.text == words("a", 100)
+    assert context.dropped_over_budget == 1
+
+
+def test_assemble_context_reports_merges_and_duplicates():
+    docs = [
+        chunk(0, f"{words('a', 30)} {OVERLAP}"),
+        chunk(1, f"{OVERLAP} {words('b', 30)}"),
+        Document(page_content=f"{words('a', 30)} {OVERLAP}"),
+        Document(page_content="   "),
+    ]
+    context = assemble_context(docs, budget_tokens=1000, count_tokens=count_words)
+    assert context.merged_chunks == 1
+    assert context.dropped_duplicates == 1
+    assert PASSAGE_SEPARATOR not in context.text
+    assert context.text == f"{words('a', 30)} {OVERLAP} {words('b', 30)}"
@@ -0,0 +1,108 @@
+from pathlib import Path
+
+import pytest
+
+from filing_sections import (
+    COVER_SECTION,
+    UNSECTIONED,
+    clean_line,
+    parse_filing,
+    read_section,
+    section_index,
+)
+
+from conftest import CORPUS_DIR
+
+FILING = """\
+Apple Inc.
+Table of Contents
+Item 1. | Business | 1
+Item 1A. | Risk Factors | 5
+Item 7. | Management's Discussion and Analysis | 20
+Item 8. | Financial Statements and Supplementary Data | 30
+* * *
+Item 1. Business
+The Company designs, manufactures and markets smartphones and personal computers.
+| | Net sales | | | $ | | 391,035 | |
+---|---|---|---
+Item 1A. Risk Factors
+The Company's operations and performance depend significantly on global economic conditions.
+Item 7. Management's Discussion and Analysis
+Net sales increased during 2024 compared to 2023, driven by higher iPhone revenue.
+Apple Inc. | 2024 Form 10-K | 21
+Item 8. Financial Statements and Supplementary Data
+The consolidated financial statements follow the report of the independent auditor.
+"""
+
+
+def parse(text: str):
+    return parse_filing(text.splitlines(keepends=True))
+
+
+def test_table_of_contents_rows_do_not_start_sections():
+    parsed = parse(FILING)
+    assert [section.item for section in parsed.sections] == [COVER_SECTION, "1", "1A", "7", "8"]
+    assert parsed.section("1").text.startswith("Item 1. Business")
+
+
+def test_cleaning_drops_padding_separators_and_footers():
+    sections = {section.item: section.text for section in parse(FILING).sections}
+    assert sections["1"].splitlines()[-1] == "Net sales | $391,035"
+    assert "* * *" not in sections[COVER_SECTION]
+    assert sections["7"].splitlines()[-1].endswith("higher iPhone revenue.")
+
+
+def test_offsets_slice_the_original_text():
+    parsed = parse(FILING)
+    assert parsed.raw_chars == len(FILING)
+    headings = ["Item 1. Business", "Item 1A. Risk", "Item 7. Management", "Item 8. Financial"]
+    starts = [0] + [FILING.index(heading) for heading in headings]
+    assert [(section.start, section.end) for section in parsed.sections] == list(zip(starts, starts[1:] + [len(FILING)]))
+
+
+def test_read_section_round_trip(tmp_path):
+    path = tmp_path / "AAPL_2024_10K.txt"
+    path.write_text(FILING, encoding="utf-8")
+    parsed = parse(FILING)
+    index = section_index(parsed, ticker="AAPL", year=2024, sha256="0")
+    assert index["sections"] == [[section.item, section.start, section.end] for section in parsed.sections]
+    section = parsed.section("7")
+    assert read_section(path, index, "7") == FILING[section.start:section.end]
+    assert read_section(path, index, "7A") is None
+
+
+@pytest.mark.parametrize("heading", ["Item 1(a). Risk Factors", "ITEM 1(A). RISK FACTORS", "Item 1.A. Risk Factors"])
+def test_alternative_item_numbering(heading):
+    parsed = parse(FILING.replace("Item 1A. Risk Factors", heading))
+    assert [section.item for section in parsed.sections] == [COVER_SECTION, "1", "1A", "7", "8"]
+
+
+def test_filing_without_core_items_is_one_section():
+    text = FILING.replace("Item 8. Financial Statements", "Financial Statements")
+    parsed = parse(text)
+    assert [(section.item, section.start, section.end) for section in parsed.sections] == [(UNSECTIONED, 0, len(text))]
+
+
+def test_filing_without_item_headings_is_one_section():
+    parsed = parse("Annual report\nRevenue grew across all segments during the year.\n")
+    assert [section.item for section in parsed.sections] == [UNSECTIONED]
+
+
+@pytest.mark.parametrize("filing", ["GE_2024", "HON_2024", "MCD_2024"])
+def test_cross_reference_filings_are_not_split_on_minor_items(filing):
+    # Only Items 1B, 4, 6, 9, ... carry "Item N" headings in these filings.
+    parsed = parse((CORPUS_DIR / f"{filing}_10K.txt").read_text(encoding="utf-8"))
+    assert [section.item for section in parsed.sections] == [UNSECTIONED]
+
+
+@pytest.mark.parametrize("filing", ["AAPL_2025", "MSFT_2025", "HAL_2024", "ICE_2024"])
+def test_corpus_filings_have_core_items(filing, tmp_path):
+    path = CORPUS_DIR / f"{filing}_10K.txt"
+    text = path.read_text(encoding="utf-8")
+    parsed = parse(text)
+    items = [section.item for section in parsed.sections]
+    assert {"1", "1A", "7", "8"} <= set(items)
+    index = section_index(parsed, ticker=filing.split("_")[0], year=int(filing.split("_")[1]), sha256="0")
+    assert read_section(path, index, "7").lower().startswith("item 7. management")
+    # Sections tile the file without gaps or overlaps.
+    assert [section.end for section in parsed.sections[:-1]] == [section.start for section in parsed.sections[1:]]
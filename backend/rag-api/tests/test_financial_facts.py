@@ -0,0 +1,129 @@
+from functools import lru_cache
+
+import pytest
+
+from financial_facts import (
+    CONCEPTS_BY_NAME,
+    FinancialFacts,
+    MetricQuestion,
+    build_facts_index,
+    extract_facts,
+    normalize_label,
+    parse_metric_question,
+)
+from ingest_pipeline import FilingSource
+
+from conftest import CORPUS_DIR
+
+
+@lru_cache(maxsize=None)
+def concept_facts(filing: str) -> dict[tuple[str, int], tuple[float, int, str]]:
+    """(concept, period) -> (value, scale, line item) for one filing of the corpus."""
+    text = (CORPUS_DIR / f"{filing}_10K.txt").read_text(encoding="utf-8")
+    return {(fact.concept, fact.period): (fact.value, fact.scale, fact.line_item) for fact in extract_facts(text) if fact.concept}
+
+
+@pytest.mark.parametrize(
+    "filing, concept, period, value",
+    [
+        ("AAPL_2025", "revenue", 2025, 416161),
+        ("AAPL_2025", "net_income", 2025, 112010),
+        ("AAPL_2025", "eps_diluted", 2025, 7.46),
+        ("AAPL_2025", "total_assets", 2025, 359241),
+        ("AAPL_2025", "operating_cash_flow", 2025, 111482),
+        ("MSFT_2025", "revenue", 2025, 281724),
+        ("MSFT_2025", "net_income", 2025, 101832),
+        ("MSFT_2025", "eps_diluted", 2025, 13.64),
+        ("MSFT_2025", "total_assets", 2025, 619003),
+        ("C_2024", "revenue", 2024, 81139),
+        ("C_2024", "net_income", 2024, 12682),
+        ("C_2024", "eps_basic", 2024, 6.03),
+        ("C_2024", "total_assets", 2024, 2352945),
+        ("KKR_2024", "cash", 2024, 8535048),
+        ("KKR_2024", "operating_cash_flow", 2024, 6649878),
+    ],
+)
+def test_extracted_values(filing, concept, period, value):
+    assert concept_facts(filing)[(concept, period)][0] == pytest.approx(value)
+
+
+def test_per_share_table_rows_are_not_dollar_amounts():
+    # The selected financial data table lists "Diluted: Net income" (EPS) and
+    # "Diluted: Dividends declared per common share" under one group.
+    facts = concept_facts("C_2024")
+    assert facts[("net_income", 2024)][2] == "Citigroup’s net income"
+    assert facts.get(("eps_diluted", 2024), (None,))[0] != pytest.approx(2.18)
+
+
+def test_segment_rows_are_not_company_totals():
+    facts = concept_facts("KKR_2024")
+    assert ("total_assets", 2024) not in facts
+    assert ("revenue", 2024) not in facts
+
+
+@pytest.fixture(scope="module")
+def facts_index(tmp_path_factory) -> FinancialFacts:
+    sources = [
+        FilingSource(ticker=filing.split("_")[0], year=int(filing.split("_")[1]), uri=str(CORPUS_DIR / f"{filing}_10K.txt"))
+        for filing in ("AAPL_2025", "MSFT_2025", "C_2024", "KKR_2024")
+    ]
+    return build_facts_index(tmp_path_factory.mktemp("facts"), sources)
+
+
+def ask(index: FinancialFacts, ticker: str, concept: str, *years: int) -> str | None:
+    answer = index.answer(MetricQuestion(CONCEPTS_BY_NAME[concept], years), ticker)
+    return answer[0] if answer else None
+
+
+def test_answers(facts_index):
+    assert ask(facts_index, "AAPL", "revenue", 2025).startswith("AAPL reported revenue of $416,161 million for fiscal 2025")
+    assert ask(facts_index, "MSFT", "net_income", 2024, 2025).startswith(
+        "MSFT reported net income of $88,136 million for fiscal 2024 and $101,832 million for fiscal 2025"
+    )
+    assert ask(facts_index, "C", "net_income", 2024).startswith("C reported net income of $12,682 million")
+
+
+def test_no_answer_without_a_stated_scale(facts_index):
+    # KKR's net income is only found in a table without "(in thousands)".
+    assert ask(facts_index, "KKR", "net_income", 2024) is None
+    assert facts_index.stats["implausible"] >= 1
+
+
+def test_check_rejects_net_income_disagreeing_with_cash_flow(facts_index):
+    row = facts_index._rows[("C", "net_income", 2024)]
+    assert facts_index.check(row)
+    original = facts_index.columns["value"][row]
+    try:
+        facts_index.columns["value"][row] = 5.94
+        assert not facts_index.check(row)
+    finally:
+        facts_index.columns["value"][row] = original
+
+
+@pytest.mark.parametrize(
+    "question, concept, years",
+    [
+        ("What was AAPL's revenue in fiscal 2024?", "revenue", (2024,)),
+        ("Apple net income FY24", "net_income", (2024,)),
+        ("diluted EPS 2023 and 2024", "eps_diluted", (2023, 2024)),
+        ("How much cash did it hold?", "cash", ()),
+    ],
+)
+def test_parse_metric_question(question, concept, years):
+    parsed = parse_metric_question(question, {"aapl", "apple"})
+    assert parsed is not None
+    assert parsed.concept.name == concept
+    assert parsed.years == years
+
+
+@pytest.mark.parametrize(
+    "question",
+    ["Why did AAPL's revenue grow in 2024?", "Compare revenue and net income", "What are the main risk factors?"],
+)
+def test_parse_metric_question_leaves_other_questions_to_retrieval(question):
+    assert parse_metric_question(question, {"aapl"}) is None
+
+
+def test_normalize_label():
+    assert normalize_label("Total shareholders’ equity (1)") == "total shareholders equity"
+    assert normalize_label("Research & development:") == "research and development"
@@ -0,0 +1,76 @@
+import pytest
+
+from ingest_pipeline import FilingSource
+from lexical_index import LexicalIndex, build_lexical_index, tokenize
+
+FILINGS = {
+    "AAPL_2024": "Item 1. Business\nApple designs smartphones, tablets and wearables.\n\n"
+    "Item 7. Management's Discussion\nNet sales of wearables grew while smartphone sales declined.\n",
+    "MSFT_2024": "Item 1. Business\nMicrosoft sells cloud services and productivity software.\n\n"
+    "Item 7. Management's Discussion\nCloud revenue grew on Azure consumption.\n",
+}
+UPDATED_AAPL = "Item 1. Business\nApple designs smartphones and headsets.\n\n" "Item 7. Management's Discussion\nHeadset sales began this year.\n"
+
+
+def sources(*names: str) -> list[FilingSource]:
+    return [FilingSource(ticker=name.split("_")[0], year=int(name.split("_")[1]), uri=name) for name in names]
+
+
+def build(path, texts: dict[str, str]) -> LexicalIndex:
+    return build_lexical_index(path, sources(*texts), read=texts.__getitem__, chunk_size=80, chunk_overlap=0, workers=1)
+
+
+def hits(index: LexicalIndex, query: str, **kwargs) -> list[tuple[str, float]]:
+    return [(document.id, round(score, 5)) for document, score in index.search(query, k=10, **kwargs)]
+
+
+def test_tokenize():
+    assert tokenize("Apple’s net sales were $391,035.5 million in FY2024 (BRK-B)") == [
+        "apple", "net", "sales", "391,035.5", "million", "fy2024", "brk-b",
+    ]
+
+
+def test_search_and_filters(tmp_path):
+    index = build(tmp_path, FILINGS)
+    assert index.stats()["segments"] == 1
+    results = index.search("cloud revenue", k=3)
+    assert results and all(document.metadata["ticker"] == "MSFT" for document, _ in results)
+    assert hits(index, "grew", filter={"ticker": "AAPL"}) == [hit for hit in hits(index, "grew") if hit[0].startswith("AAPL:")]
+    assert index.search("grew", filter={"ticker": "GS"}) == []
+
+
+def test_changed_filing_tombstones_its_old_rows(tmp_path):
+    build(tmp_path, FILINGS)
+    updated = {**FILINGS, "AAPL_2024": UPDATED_AAPL}
+    index = build(tmp_path, updated)
+
+    stats = index.stats()
+    # MSFT is unchanged and skipped; only the new AAPL version is appended.
+    assert stats["segments"] == 2
+    assert stats["dead_chunks"] > 0
+    assert index.search("wearables") == []
+    assert {document.metadata["ticker"] for document, _ in index.search("headset headsets")} == {"AAPL"}
+    # Document frequencies only count live rows, as if the index was built from scratch.
+    assert hits(index, "smartphones grew") == hits(build(tmp_path / "fresh", updated), "smartphones grew")
+
+
+def test_compaction_keeps_results_and_drops_dead_rows(tmp_path):
+    build(tmp_path, FILINGS)
+    index = build(tmp_path, {**FILINGS, "AAPL_2024": UPDATED_AAPL})
+    queries = ["smartphones grew", "cloud azure", "headset sales"]
+    before = {query: hits(index, query) for query in queries}
+    live = index.stats()["live_chunks"]
+
+    index.compact()
+    stats = index.stats()
+    assert (stats["segments"], stats["dead_chunks"], stats["live_chunks"]) == (1, 0, live)
+    assert sorted(path.name for path in tmp_path.iterdir() if path.is_dir()) == list(index.segments)
+
+    reopened = LexicalIndex.open(tmp_path)
+    for query in queries:
+        assert hits(reopened, query) == before[query]
+
+
+def test_open_requires_an_index(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        LexicalIndex.open(tmp_path)
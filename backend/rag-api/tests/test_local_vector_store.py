@@ -0,0 +1,134 @@
+import numpy as np
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from embedding_profiles import EmbeddingProfile
+from local_vector_store import LocalVectorStore, write_index
+
+DIM = 32
+COUNT = 400
+
+
+class NoEmbeddings(Embeddings):
+    """Queries in these tests are passed as vectors."""
+
+    def embed_documents(self, texts):
+        raise NotImplementedError
+
+    def embed_query(self, text):
+        raise NotImplementedError
+
+
+def metadata(row: int) -> dict:
+    item = {"ticker": ("AAPL", "MSFT", "C", "KKR")[row % 4], "year": 2020 + row % 5, "chunk": row, "has_table": row % 3 == 0}
+    if row % 7:
+        item["section"] = "7" if row % 2 else "1A"
+    return item
+
+
+@pytest.fixture(scope="module")
+def vectors() -> np.ndarray:
+    return np.random.default_rng(7).normal(size=(COUNT, DIM)).astype(np.float32)
+
+
+def build(path, vectors, **kwargs) -> LocalVectorStore:
+    write_index(
+        path,
+        ids=[f"doc:{row}" for row in range(COUNT)],
+        embeddings=vectors,
+        texts=[f"text {row}" for row in range(COUNT)],
+        metadatas=[metadata(row) for row in range(COUNT)],
+        **kwargs,
+    )
+    return LocalVectorStore(path, NoEmbeddings(), nprobe=kwargs.get("ivf_lists") and 2)
+
+
+@pytest.fixture(scope="module")
+def store(tmp_path_factory, vectors) -> LocalVectorStore:
+    return build(tmp_path_factory.mktemp("exact"), vectors)
+
+
+def matching_rows(condition) -> set[int]:
+    return {row for row in range(COUNT) if condition(metadata(row))}
+
+
+@pytest.mark.parametrize(
+    "filter, condition",
+    [
+        ({"ticker": "AAPL"}, lambda m: m["ticker"] == "AAPL"),
+        ({"ticker": {"$in": ["C", "KKR", "GS"]}}, lambda m: m["ticker"] in ("C", "KKR")),
+        ({"ticker": {"$nin": ["AAPL"]}}, lambda m: m["ticker"] != "AAPL"),
+        ({"ticker": {"$ne": "GS"}}, lambda m: True),
+        ({"year": {"$gte": 2022, "$lt": 2024}}, lambda m: 2022 <= m["year"] < 2024),
+        ({"has_table": True}, lambda m: m["has_table"]),
+        ({"section": "7"}, lambda m: m.get("section") == "7"),
+        ({"section": {"$ne": "7"}}, lambda m: m.get("section") != "7"),
+        (
+            {"$or": [{"ticker": "MSFT"}, {"$and": [{"ticker": "C"}, {"year": 2024}]}]},
+            lambda m: m["ticker"] == "MSFT" or (m["ticker"] == "C" and m["year"] == 2024),
+        ),
+        ({"ticker": "AAPL", "year": 2021}, lambda m: m["ticker"] == "AAPL" and m["year"] == 2021),
+        ({"ticker": "GS"}, lambda m: False),
+        ({"segment": "cloud"}, lambda m: False),
+    ],
+)
+def test_filter_mask_matches_pinecone_semantics(store, filter, condition):
+    assert set(np.flatnonzero(store.filter_mask(filter))) == matching_rows(condition)
+
+
+def test_range_filter_on_a_category_field_is_rejected(store):
+    with pytest.raises(ValueError):
+        store.filter_mask({"ticker": {"$gt": "A"}})
+
+
+def test_metadata_round_trip(store):
+    document = store.similarity_search_by_vector(store.fetch_vectors(["doc:14"])["doc:14"], k=1)[0]
+    assert document.id == "doc:14"
+    assert document.page_content == "text 14"
+    assert document.metadata == metadata(14)
+
+
+@pytest.mark.parametrize("filter", [{"ticker": "MSFT"}, {"year": {"$in": [2020, 2023]}, "has_table": False}])
+def test_filtered_search_returns_the_best_matching_rows(store, vectors, filter):
+    query = vectors[5] + 0.5 * vectors[6]
+    unit = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    allowed = np.flatnonzero(store.filter_mask(filter))
+    expected = allowed[np.argsort(-(unit[allowed] @ (query / np.linalg.norm(query))), kind="stable")[:5]]
+
+    results = store.similarity_search_by_vector_with_score(query, k=5, filter=filter)
+    assert [document.id for document, _ in results] == [f"doc:{row}" for row in expected]
+
+
+def test_ivf_search_respects_filters_and_falls_back_to_exact(tmp_path, vectors):
+    ivf_store = build(tmp_path, vectors, ivf_lists=16)
+    filter = {"ticker": "KKR", "year": 2023}
+    allowed = {f"doc:{row}" for row in np.flatnonzero(ivf_store.filter_mask(filter))}
+    # Asking for every matching row needs more than the two probed lists hold,
+    # so the search has to fall back to an exact scan of the filtered rows.
+    results = ivf_store.similarity_search_by_vector_with_score(vectors[3], k=len(allowed), filter=filter)
+    assert {document.id for document, _ in results} == allowed
+
+
+# 32-dimensional sign bits are too coarse for the default binary shortlist, so
+# binary codes are checked with a shortlist that covers every row.
+@pytest.mark.parametrize("quantization, rescore_factor", [("int8", None), ("binary", COUNT)])
+def test_quantized_first_pass_rescores_to_exact_results(tmp_path, store, vectors, quantization, rescore_factor):
+    profile = EmbeddingProfile("test-embedding", DIM, quantization)
+    write_index(
+        tmp_path,
+        ids=[f"doc:{row}" for row in range(COUNT)],
+        embeddings=vectors,
+        texts=[f"text {row}" for row in range(COUNT)],
+        metadatas=[metadata(row) for row in range(COUNT)],
+        profile=profile,
+    )
+    quantized = LocalVectorStore(tmp_path, NoEmbeddings(), rescore_factor=rescore_factor)
+    assert quantized.codes is not None
+
+    for row, filter in ((11, None), (12, {"ticker": "C"}), (13, {"year": {"$lte": 2021}})):
+        query = vectors[row] + 0.8 * vectors[row + 1]
+        exact = store.similarity_search_by_vector_with_score(query, k=5, filter=filter)
+        approximate = quantized.similarity_search_by_vector_with_score(query, k=5, filter=filter)
+        assert [document.id for document, _ in approximate] == [document.id for document, _ in exact]
+        # Rescored against the stored full-precision vectors, so the scores match too.
+        assert [score for _, score in approximate] == pytest.approx([score for _, score in exact], abs=1e-6)
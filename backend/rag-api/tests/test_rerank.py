@@ -0,0 +1,47 @@
+import asyncio
+import threading
+
+from langchain_core.documents import Document
+
+from rerank import RerankStage
+
+
+class BlockingReranker:
+    """Scores by text length once ``release`` is set."""
+
+    name = "blocking"
+
+    def __init__(self):
+        self.release = threading.Event()
+
+    def score(self, query: str, texts: list[str]) -> list[float]:
+        self.release.wait(5)
+        return [float(len(text)) for text in texts]
+
+
+def docs(*texts: str) -> list[Document]:
+    return [Document(page_content=text) for text in texts]
+
+
+def test_timed_out_jobs_hold_workers_and_new_requests_skip():
+    reranker = BlockingReranker()
+    stage = RerankStage(reranker, budget_ms=20, retrieval_weight=0.0, workers=1)
+
+    async def run():
+        timed_out = await stage.rerank("q", docs("a", "bbb"), 2)
+        # The first job is still scoring, so this one is not queued behind it.
+        skipped = await stage.rerank("q", docs("a", "bbb"), 2)
+        return timed_out, skipped
+
+    timed_out, skipped = asyncio.run(run())
+    assert not timed_out.reranked and not skipped.reranked
+    assert stage.stats["timed_out"] == 1 and stage.stats["skipped"] == 1
+    assert stage.snapshot_stats()["in_flight"] == 1
+
+    reranker.release.set()
+    stage._executor.submit(lambda: None).result()
+    assert stage.snapshot_stats()["in_flight"] == 0
+    result = asyncio.run(stage.rerank("q", docs("a", "bbb"), 1))
+    assert result.reranked
+    assert [doc.page_content for doc in result.docs] == ["bbb"]
+    stage.close()
@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+from langchain_core.documents import Document
+
+from retrieval import document_key, fuse_results, orchestrate_retrieval
+
+
+def doc(chunk: int) -> Document:
+    return Document(page_content=f"chunk {chunk}", metadata={"ticker": "AAPL", "year": 2024, "chunk": chunk})
+
+
+def chunk_numbers(fused) -> list[int]:
+    return [fused_doc.metadata["chunk"] for fused_doc, _ in fused]
+
+
+def test_document_key():
+    assert document_key(Document(page_content="x", id="abc")) == "abc"
+    assert document_key(doc(3)) == "AAPL:2024:10K:3"
+    assert document_key(Document(page_content="x")).startswith("sha256:")
+
+
+def test_rrf_rewards_chunks_found_by_several_queries():
+    fused = fuse_results([[(doc(1), None), (doc(2), None)], [(doc(3), None), (doc(2), None)]], 3)
+    assert chunk_numbers(fused) == [2, 1, 3]
+    assert fused[0][1] == pytest.approx(2 / 62, abs=1e-6)
+
+
+def test_ties_keep_list_priority_order():
+    fused = fuse_results([[(doc(1), None)], [(doc(2), None)], [(doc(3), None)]], 2)
+    assert chunk_numbers(fused) == [1, 2]
+
+
+def test_score_fusion_uses_similarities():
+    fused = fuse_results([[(doc(1), 0.2), (doc(2), 0.9)], [(doc(2), 0.5)]], 2, method="score")
+    assert chunk_numbers(fused) == [2, 1]
+    assert fused[0][1] == pytest.approx(1.4)
+
+
+def test_unknown_fusion_method():
+    with pytest.raises(ValueError):
+        fuse_results([], 1, method="max")
+
+
+def test_cancelling_retrieval_cancels_its_stages():
+    cancelled = []
+
+    async def slow_search(query: str, n: int):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(query)
+            raise
+        return [(doc(0), None)]
+
+    async def slow_refine(query: str) -> str:
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append("refine")
+            raise
+        return query
+
+    async def run():
+        task = asyncio.create_task(orchestrate_retrieval("revenue", 4, search=slow_search, refine=slow_refine))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        # No stage task survives its caller.
+        others = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        return others
+
+    assert asyncio.run(run()) == []
+    assert sorted(cancelled) == ["refine", "revenue"]
+
+
+def test_total_timeout_returns_partial_results():
+    async def search(query: str, n: int):
+        return [(doc(1), None)]
+
+    async def stuck_refine(query: str) -> str:
+        await asyncio.sleep(10)
+        return query
+
+    result = asyncio.run(
+        orchestrate_retrieval("revenue", 4, search=search, refine=stuck_refine, llm_timeout=5, total_timeout=0.1)
+    )
+    assert [d.metadata["chunk"] for d in result.docs] == [1]
+    assert "total" in result.failed_stages
@@ -133,3 +133,101 @@ export const askQuestion = async (question, options = {}) => {
 };
 
 
+
+/**
+ * Calls the RAG API streaming endpoint and reports the answer as it is generated.
+ * The API sends Server-Sent Events: `sources`, then `token` events, then `done`
+ * (or a single `error`). Aborting `options.signal` closes the connection, which
+ * stops generation on the server.
+ * @param {string} question - The question to ask
+ * @param {Object} options - Optional parameters
+ * @param {string} options.retrieval_method - Retrieval method (default: 'llm_enhanced')
+ * @param {number} options.k - Number of documents to retrieve (default: 5)
+ * @param {Function} options.onSources - Called once with the retrieved source metadata
+ * @param {Function} options.onToken - Called with each answer text fragment
+ * @param {AbortSignal} options.signal - Optional signal to cancel the request
+ * @returns {Promise<{answer: string, sources: Array}>} - The full answer once streaming completes
+ * @throws {Error} - If the API call fails or the stream reports an error
+ */
+export const askQuestionStream = async (question, options = {}) => {
+  if (!question || !question.trim()) {
+    throw new Error('Question cannot be empty');
+  }
+
+  const {
+    retrieval_method = 'llm_enhanced',
+    k = 5,
+    onSources = () => {},
+    onToken = () => {},
+    signal,
+  } = options;
+
+  const response = await fetch(`${API_BASE_URL}/api/ask/stream`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+      Accept: 'text/event-stream',
+    },
+    body: JSON.stringify({
+      question: question.trim(),
+      retrieval_method: retrieval_method,
+      k: k,
+    }),
+    signal,
+  });
+
+  if (!response.ok || !response.body) {
+    const errorData = await response.json().catch(() => ({}));
+    throw new Error(
+      errorData.detail || `API request failed with status ${response.status}`
+    );
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  let answer = '';
+  let sources = [];
+
+  const handleEvent = (rawEvent) => {
+    let event = 'message';
+    const dataLines = [];
+    rawEvent.split('\n').forEach((line) => {
+      if (line.startsWith('event:')) {
+        event = line.slice(6).trim();
+      } else if (line.startsWith('data:')) {
+        dataLines.push(line.slice(5).trim());
+      }
+    });
+    const data = dataLines.length ? JSON.parse(dataLines.join('\n')) : {};
+
+    if (event === 'sources') {
+      sources = data;
+      onSources(data);
+    } else if (event === 'token') {
+      answer += data.text;
+      onToken(data.text, answer);
+    } else if (event === 'error') {
+      throw new Error(data.detail || 'The answer stream failed.');
+    }
+  };
+
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) {
+      break;
+    }
+    buffer += decoder.decode(value, { stream: true });
+    let boundary = buffer.indexOf('\n\n');
+    while (boundary !== -1) {
+      const rawEvent = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+      if (rawEvent.trim()) {
+        handleEvent(rawEvent);
+      }
+      boundary = buffer.indexOf('\n\n');
+    }
+  }
+
+  return { answer, sources };
+};
@@ -1,7 +1,7 @@
-import React, { createContext, useCallback, useContext, useState } from 'react';
+import React, { createContext, useCallback, useContext, useRef, useState } from 'react';
 import FinancialDataPopup from '../components/FinancialDataPopup';
 import { fetchFinancialData } from '../api/financialApi';
-import { askQuestion } from '../api/ragApi';
+import { askQuestionStream } from '../api/ragApi';
 
 const FinancialPopupContext = createContext(null);
 
@@ -16,8 +16,14 @@ export function FinancialPopupProvider({ children }) {
   const [chatLoading, setChatLoading] = useState(false);
   const [chatError, setChatError] = useState('');
   const [chatResponse, setChatResponse] = useState('');
+  const chatAbortRef = useRef(null);
 
   const closeFinancialPopup = useCallback(() => {
+    if (chatAbortRef.current) {
+      chatAbortRef.current.abort();
+      chatAbortRef.current = null;
+    }
+    setChatLoading(false);
     setShowFinancialPopup(false);
     setFinancialData(null);
     setFinancialPopupCompanyName('');
@@ -60,19 +66,33 @@ export function FinancialPopupProvider({ children }) {
       return;
     }
 
+    if (chatAbortRef.current) {
+      chatAbortRef.current.abort();
+    }
+    const controller = new AbortController();
+    chatAbortRef.current = controller;
+
     setChatLoading(true);
     setChatError('');
     setChatResponse('');
 
     try {
-      const result = await askQuestion(message.trim());
-      setChatResponse(result.answer);
+      await askQuestionStream(message.trim(), {
+        signal: controller.signal,
+        onToken: (_text, answerSoFar) => setChatResponse(answerSoFar),
+      });
       setChatMessage('');
     } catch (error) {
+      if (error.name === 'AbortError') {
+        return;
+      }
       console.error('Error calling chat API:', error);
       setChatError(error.message || 'Failed to get response. Please try again.');
     } finally {
-      setChatLoading(false);
+      if (chatAbortRef.current === controller) {
+        chatAbortRef.current = null;
+        setChatLoading(false);
+      }
     }
   }, []);
 